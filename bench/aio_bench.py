@@ -0,0 +1,51 @@
+"""
+Throughput and latency of TIIPStreamWriter/TIIPStreamReader over a local socketpair.
+
+Run from the repository root: python -m bench.aio_bench
+"""
+
+from __future__ import print_function
+
+import asyncio
+import socket
+import time
+
+from pytiip.aio import FRAMINGS, TIIPStreamReader, TIIPStreamWriter
+from pytiip.tiip import TIIPMessage
+
+COUNT = 50000
+
+
+async def run(framing):
+    a, b = socket.socketpair()
+    reader, peer = await asyncio.open_connection(sock=a)
+    _, writer = await asyncio.open_connection(sock=b)
+    sent = {}
+    latencies = []
+
+    async def produce():
+        tiipWriter = TIIPStreamWriter(writer, framing)
+        for i in range(COUNT):
+            mid = str(i)
+            sent[mid] = time.perf_counter()
+            await tiipWriter.send(TIIPMessage(mid=mid, type='pub', sig='temperature', pl=[21.5, 0.1]))
+        await tiipWriter.close()
+
+    start = time.perf_counter()
+    producer = asyncio.ensure_future(produce())
+    async for tiipMsg in TIIPStreamReader(reader, framing):
+        latencies.append(time.perf_counter() - sent[tiipMsg.mid])
+    await producer
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print('%-10s %10.0f msgs/s   latency p50 %7.2f ms  p99 %7.2f ms' % (
+        framing, COUNT / elapsed, latencies[len(latencies) // 2] * 1e3, latencies[int(len(latencies) * 0.99)] * 1e3))
+
+
+def main():
+    for framing in FRAMINGS:
+        asyncio.run(run(framing))
+
+
+if __name__ == '__main__':
+    main()
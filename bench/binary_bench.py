@@ -0,0 +1,45 @@
+"""
+Benchmark of the binary codec compared to the json representation: encoded size and encode/decode speed.
+
+Run from the repository root: python -m bench.binary_bench
+"""
+
+from __future__ import print_function
+
+import timeit
+
+from pytiip import binary
+from pytiip.tiip import TIIPMessage
+
+NUMBER = 5000
+
+
+def messages():
+    yield 'small', TIIPMessage(ts='2019-04-24T09:36:18.770000Z', type='pub', sig='temperature', pl=[21.5])
+    yield 'medium', TIIPMessage(
+        ts='2019-04-24T09:36:18.770000Z', lat=0.012, mid='a1b2c3', type='req', src=['gateway', 'device42'],
+        targ=['backend', 'store'], sig='readings', ch='sensors', arg={'unit': 'C', 'interval': 10},
+        pl=[21.5, 21.7, 21.6, 21.9], ok=True, ten='acme')
+    yield 'large', TIIPMessage(
+        ts='2019-04-24T09:36:18.770000Z', type='pub', src=['device42'], sig='waveform',
+        pl=[i * 0.001 for i in range(2000)])
+
+
+def perOp(func):
+    return min(timeit.repeat(func, number=NUMBER, repeat=3)) / NUMBER * 1e6
+
+
+def main():
+    print('%-8s %10s %10s %12s %12s %12s %12s' % (
+        '', 'json B', 'binary B', 'json enc us', 'bin enc us', 'json dec us', 'bin dec us'))
+    for name, tiipMsg in messages():
+        jsonStr = str(tiipMsg)
+        encoded = binary.encode(tiipMsg)
+        print('%-8s %10d %10d %12.2f %12.2f %12.2f %12.2f' % (
+            name, len(jsonStr.encode('utf-8')), len(encoded),
+            perOp(lambda: str(tiipMsg)), perOp(lambda: binary.encode(tiipMsg)),
+            perOp(lambda: TIIPMessage(tiipStr=jsonStr)), perOp(lambda: binary.decode(encoded))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark of tiip.2.0 <-> tiip.3.0 conversion compared to the previous datetime/dateutil based conversion.
+
+Run from the repository root: python -m bench.convert_bench
+"""
+
+from __future__ import print_function
+
+import io
+import json
+import timeit
+
+from datetime import datetime as dt
+
+import dateutil.parser as parser
+
+from pytiip.convert import convertMany, convertStream
+from pytiip.tiip import __version__, parseTimeStamp
+
+COUNT = 20000
+
+
+def legacyFromVersion2(tiipDict):
+    tiipDict = dict(tiipDict)
+    if 'ct' in tiipDict:
+        ct = float(tiipDict['ct'])
+        ts = float(tiipDict['ts'])
+        tiipDict['ts'] = str(ct)
+        tiipDict['lat'] = str(ts - ct)
+    tiipDict['ts'] = dt.utcfromtimestamp(float(tiipDict['ts'])).isoformat(timespec='microseconds') + 'Z'
+    return tiipDict
+
+
+def legacyToVersion2(tiipDict):
+    tiipDict = dict(tiipDict)
+    if 'lat' in tiipDict:
+        ct = parser.parse(tiipDict['ts']).timestamp()
+        tiipDict['ct'] = str(ct)
+        tiipDict['ts'] = str(ct + float(tiipDict.pop('lat')))
+    else:
+        tiipDict['ts'] = str(parser.parse(tiipDict['ts']).timestamp())
+    tiipDict['pv'] = 'tiip.2.0'
+    return tiipDict
+
+
+def run(name, func):
+    def loop():
+        parseTimeStamp.cache_clear()
+        func()
+    seconds = min(timeit.repeat(loop, number=1, repeat=3))
+    print('%-30s %10.0f msgs/s' % (name, COUNT / seconds))
+
+
+def main():
+    tiip2Dicts = [{'pv': 'tiip.2.0', 'ts': '%.3f' % (1556099778.77 + i * 0.013), 'ct': '%.3f' % (1556099734.255 + i * 0.013),
+                   'sig': 'temperature', 'pl': [21.5]} for i in range(COUNT)]
+    tiip3Dicts = convertMany(tiip2Dicts, __version__)
+    run('2.0 -> 3.0 legacy', lambda: [legacyFromVersion2(d) for d in tiip2Dicts])
+    run('2.0 -> 3.0 convertMany', lambda: convertMany(tiip2Dicts, __version__))
+    run('3.0 -> 2.0 legacy', lambda: [legacyToVersion2(d) for d in tiip3Dicts])
+    run('3.0 -> 2.0 convertMany', lambda: convertMany(tiip3Dicts, 'tiip.2.0'))
+    stream = '\n'.join(json.dumps(d) for d in tiip2Dicts).encode('utf-8')
+    run('2.0 -> 3.0 convertStream', lambda: convertStream(io.BytesIO(stream), io.BytesIO(), __version__))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark of request/reply correlation with many requests in flight: a dict swept for timeouts on every
+tick compared to a CorrelationTable, which only visits the requests that have timed out.
+
+Run from the repository root: python -m bench.correlation_bench
+"""
+
+from __future__ import print_function
+
+import time
+
+from pytiip.correlation import CorrelationTable
+from pytiip.tiip import TIIPMessage
+
+IN_FLIGHT = (1000, 10000, 100000)
+TICKS = 20  # Expiries measured per size, each with 10 requests timing out
+REPEAT = 3
+
+
+def handle(request, reply, roundTrip):
+    pass
+
+
+class SweptDict(object):
+    # What the table replaces: a dict of mid: (deadline, sentAt, request, callback) swept on a timer
+
+    def __init__(self):
+        self.pending = {}
+
+    def register(self, request, timeout, callback):
+        now = time.monotonic()
+        self.pending[request.mid] = (now + timeout, now, request, callback)
+
+    def resolve(self, reply):
+        entry = self.pending.pop(reply.mid, None)
+        if entry is not None:
+            roundTrip = time.monotonic() - entry[1]
+            entry[3](entry[2], reply, roundTrip)
+
+    def expire(self, now):
+        expired = [mid for mid, entry in self.pending.items() if entry[0] <= now]
+        for mid in expired:
+            entry = self.pending.pop(mid)
+            entry[3](entry[2], None, None)
+        return len(expired)
+
+
+def measure(cls, requests):
+    table = cls()
+    start = time.monotonic()
+    for i, request in enumerate(requests):
+        table.register(request, 1000.0 + i, handle)
+    registered = time.monotonic()
+    # Timeouts are rare, each tick expires the next 10 requests
+    step = 10
+    expireSeconds = 0.0
+    for tick in range(TICKS):
+        now = start + 1000.0 + (tick + 1) * step
+        before = time.monotonic()
+        table.expire(now)
+        expireSeconds += time.monotonic() - before
+    before = time.monotonic()
+    for request in requests:
+        table.resolve(request)
+    resolved = time.monotonic()
+    count = len(requests)
+    return (registered - start) / count * 1e6, expireSeconds / TICKS * 1e3, (resolved - before) / count * 1e6
+
+
+def main():
+    print('best of %d, expire ms per tick with 10 requests timing out' % REPEAT)
+    print('%-10s %-18s %14s %14s %14s' % ('in flight', '', 'register us', 'expire ms', 'resolve us'))
+    for count in IN_FLIGHT:
+        requests = [TIIPMessage(type=u'req', mid=u'mid%d' % i, sig=u'get') for i in range(count)]
+        for name, cls in (('swept dict', SweptDict), ('CorrelationTable', CorrelationTable)):
+            results = [measure(cls, requests) for _ in range(REPEAT)]
+            print('%-10d %-18s %14.2f %14.3f %14.2f' % ((count, name) + tuple(min(column) for column in zip(*results))))
+
+
+if __name__ == '__main__':
+    main()
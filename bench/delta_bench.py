@@ -0,0 +1,87 @@
+"""
+Benchmark of the delta stream encoding compared to NDJSON, with and without compression: encoded size,
+compression ratio and encode/decode throughput on a time series from a few sources.
+
+Run from the repository root: python -m bench.delta_bench
+"""
+
+from __future__ import print_function
+
+import io
+import random
+import time
+import zlib
+
+from pytiip import delta, ndjson
+from pytiip.tiip import TIIPMessage, formatTimeStamp
+
+COUNT = 20000
+
+
+def messages():
+    rnd = random.Random(42)
+    micros = 1556098578770000
+    values = dict((source, 20.0) for source in ('device1', 'device2', 'device3'))
+    tiipMsgs = []
+    for i in range(COUNT):
+        source = rnd.choice(sorted(values))
+        values[source] += rnd.uniform(-0.5, 0.5)
+        micros += rnd.randint(5000, 15000)
+        tiipMsgs.append(TIIPMessage(
+            ts=formatTimeStamp(micros), type='pub', src=[source], sig=('temperature', 'humidity')[i % 2],
+            ch='sensors', ten='acme', pl=[round(values[source], 2), i]))
+    return tiipMsgs
+
+
+def measure(encode, decode):
+    start = time.perf_counter()
+    data = encode()
+    encodeSeconds = time.perf_counter() - start
+    start = time.perf_counter()
+    decoded = decode(data)
+    decodeSeconds = time.perf_counter() - start
+    assert decoded == COUNT
+    return len(data), COUNT / encodeSeconds, COUNT / decodeSeconds
+
+
+def main():
+    tiipMsgs = messages()
+
+    def ndjsonEncode(compress=False):
+        out = io.BytesIO()
+        ndjson.writeMessages(out, tiipMsgs)
+        return zlib.compress(out.getvalue()) if compress else out.getvalue()
+
+    def ndjsonDecode(data, compressed=False):
+        data = zlib.decompress(data) if compressed else data
+        return sum(1 for _ in ndjson.readMessages(io.BytesIO(data)))
+
+    def deltaEncode(compression):
+        out = io.BytesIO()
+        delta.writeMessages(out, tiipMsgs, compression)
+        return out.getvalue()
+
+    def deltaDecode(data):
+        return sum(1 for _ in delta.readMessages(io.BytesIO(data)))
+
+    cases = [
+        ('ndjson', lambda: ndjsonEncode(), ndjsonDecode),
+        ('ndjson+zlib', lambda: ndjsonEncode(True), lambda data: ndjsonDecode(data, True)),
+        ('delta', lambda: deltaEncode(None), deltaDecode),
+        ('delta+zlib', lambda: deltaEncode('zlib'), deltaDecode),
+    ]
+    if delta.lzma is not None:
+        cases.append(('delta+lzma', lambda: deltaEncode('lzma'), deltaDecode))
+
+    print('%d messages' % COUNT)
+    print('%-12s %10s %8s %8s %12s %12s' % ('', 'bytes', 'B/msg', 'ratio', 'enc msg/s', 'dec msg/s'))
+    plainSize = None
+    for name, encode, decode in cases:
+        size, encodeRate, decodeRate = measure(encode, decode)
+        plainSize = plainSize or size
+        print('%-12s %10d %8.1f %8.2f %12.0f %12.0f' % (
+            name, size, size / float(COUNT), plainSize / float(size), encodeRate, decodeRate))
+
+
+if __name__ == '__main__':
+    main()
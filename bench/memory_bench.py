@@ -0,0 +1,79 @@
+"""
+Memory benchmark reporting bytes per decoded message for TIIPMessage compared to the previous
+layout, where the 14 protocol keys were stored in a per-instance __dict__.
+
+Run from the repository root: python -m bench.memory_bench
+"""
+
+from __future__ import print_function
+
+import json
+import sys
+import tracemalloc
+
+from pytiip.tiip import TIIPMessage, __version__
+
+COUNT = 20000
+
+
+class LegacyLayoutMessage(object):
+    """
+    Same attributes as TIIPMessage but stored in an instance __dict__.
+    """
+
+    def __init__(self, tiipStr):
+        tiipDict = json.loads(tiipStr)
+        self._pv = __version__
+        self._ts = tiipDict.get('ts')
+        self._lat = tiipDict.get('lat')
+        self._mid = tiipDict.get('mid')
+        self._sid = tiipDict.get('sid')
+        self._type = tiipDict.get('type')
+        self._src = tiipDict.get('src')
+        self._targ = tiipDict.get('targ')
+        self._sig = tiipDict.get('sig')
+        self._ch = tiipDict.get('ch')
+        self._arg = tiipDict.get('arg')
+        self._pl = tiipDict.get('pl')
+        self._ok = tiipDict.get('ok')
+        self._ten = tiipDict.get('ten')
+
+
+def corpus(count):
+    messages = []
+    for i in range(count):
+        messages.append(json.dumps({
+            'pv': __version__,
+            'ts': '2019-04-24T09:%02d:%02d.%06dZ' % (i // 60000000 % 60, i // 1000000 % 60, i % 1000000),
+            'mid': 'm%d' % i,
+            'type': 'pub',
+            'src': ['device%d' % (i % 50)],
+            'sig': 'temperature',
+            'ch': 'sensor%d' % (i % 8),
+            'pl': [20.0 + i % 10, 0.5]
+        }))
+    return messages
+
+
+def bytesPerMessage(factory, messages):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    decoded = [factory(tiipStr) for tiipStr in messages]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / float(len(decoded)), decoded[0]
+
+
+def main():
+    messages = corpus(COUNT)
+    legacy, legacyMsg = bytesPerMessage(LegacyLayoutMessage, messages)
+    current, currentMsg = bytesPerMessage(lambda tiipStr: TIIPMessage(tiipStr=tiipStr), messages)
+    legacyObj = sys.getsizeof(legacyMsg) + sys.getsizeof(legacyMsg.__dict__)
+    currentObj = sys.getsizeof(currentMsg)
+    print('%-30s %10s %10s' % ('', 'object', 'total'))
+    print('%-30s %10d %10.0f' % ('__dict__ layout', legacyObj, legacy))
+    print('%-30s %10d %10.0f' % ('TIIPMessage (__slots__)', currentObj, current))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Scaling of pytiip.parallel.decodeFile with the number of processes, aggregating in the workers.
+
+Run from the repository root: python -m bench.parallel_bench
+"""
+
+from __future__ import print_function
+
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from pytiip.parallel import decodeFile
+from pytiip.tiip import __version__
+
+COUNT = 400000
+
+
+def countMessages(count, tiipMsg):
+    return count + 1
+
+
+def add(a, b):
+    return a + b
+
+
+def main():
+    fd, path = tempfile.mkstemp(suffix='.ndjson')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for i in range(COUNT):
+                f.write(json.dumps({
+                    'pv': __version__,
+                    'ts': '2019-04-24T%02d:%02d:%02d.%06dZ' % (i // 3600000 % 24, i // 60000 % 60, i // 1000 % 60, i % 1000 * 1000),
+                    'type': 'pub', 'src': ['device%d' % (i % 50)], 'sig': 'temperature', 'pl': [21.5, 0.1]
+                }).encode('utf-8') + b'\n')
+        baseline = None
+        processes = 1
+        while processes <= multiprocessing.cpu_count():
+            start = time.perf_counter()
+            count = decodeFile(path, processes, reduce=countMessages, initial=0, combine=add)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print('%3d processes %10.0f msgs/s  speedup %5.2f' % (processes, count / elapsed, baseline / elapsed))
+            processes *= 2
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark of reading the routing keys of messages with large payloads: full decoding compared to
+LazyTIIPMessage with and without headerKeys, and forwarding with a changed targ.
+
+Run from the repository root: python -m bench.partial_bench
+"""
+
+from __future__ import print_function
+
+import json
+import timeit
+
+from pytiip.lazy import LazyTIIPMessage, ROUTING_KEYS
+from pytiip.tiip import TIIPMessage, __version__
+
+NUMBER = 500
+
+
+def corpus():
+    for size in (10, 1000, 10000):
+        yield size, json.dumps({
+            'pv': __version__, 'ts': '2019-04-24T09:36:18.770000Z', 'mid': 'm1', 'type': 'pub',
+            'src': ['device42'], 'targ': ['store'], 'sig': 'waveform', 'ch': 'sensors',
+            'arg': {'unit': 'V', 'rate': 1000, 'channels': ['x', 'y', 'z']},
+            'pl': [i * 0.001 for i in range(size)],
+        }).encode('utf-8')
+
+
+def route(tiipMsg):
+    return tiipMsg.type, tiipMsg.sig, tiipMsg.ch, tiipMsg.targ, tiipMsg.mid
+
+
+def forward(tiipMsg):
+    route(tiipMsg)
+    tiipMsg.targ = ['archive']
+    return tiipMsg.toBytes()
+
+
+def perOp(func):
+    return min(timeit.repeat(func, number=NUMBER, repeat=3)) / NUMBER * 1e6
+
+
+def main():
+    print('%-8s %10s %12s %12s %12s %14s %14s' % (
+        'pl size', 'bytes', 'full us', 'lazy us', 'header us', 'full fwd us', 'header fwd us'))
+    for size, raw in corpus():
+        print('%-8d %10d %12.1f %12.1f %12.1f %14.1f %14.1f' % (
+            size, len(raw),
+            perOp(lambda: route(TIIPMessage(raw))),
+            perOp(lambda: route(LazyTIIPMessage(raw))),
+            perOp(lambda: route(LazyTIIPMessage(raw, headerKeys=ROUTING_KEYS))),
+            perOp(lambda: forward(TIIPMessage(raw))),
+            perOp(lambda: forward(LazyTIIPMessage(raw, headerKeys=ROUTING_KEYS)))))
+
+
+if __name__ == '__main__':
+    main()
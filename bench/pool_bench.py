@@ -0,0 +1,106 @@
+"""
+Benchmark of decode loops that create a new TIIPMessage per message compared to loops that reuse messages
+with reload() or a MessagePool: throughput, garbage collections and time spent collecting per 100k messages.
+
+Run from the repository root: python -m bench.pool_bench
+"""
+
+from __future__ import print_function
+
+import gc
+import json
+import time
+
+from pytiip.pool import MessagePool
+from pytiip.tiip import TIIPMessage, __version__
+
+COUNT = 100000
+CHUNK = 1000
+REPEAT = 3
+
+
+def corpus(count):
+    return [json.dumps({
+        'pv': __version__,
+        'ts': '2019-04-24T09:%02d:%02d.%06dZ' % (i // 60000000 % 60, i // 1000000 % 60, i % 1000000),
+        'type': 'pub',
+        'src': ['device%d' % (i % 50)],
+        'sig': 'temperature',
+        'pl': [20.0 + i % 10],
+    }, separators=(',', ':')).encode('utf-8') for i in range(count)]
+
+
+def handle(tiipMsg):
+    return tiipMsg.pl
+
+
+def newMessages(lines):
+    for line in lines:
+        handle(TIIPMessage(line))
+
+
+def reloaded(lines):
+    tiipMsg = TIIPMessage()
+    for line in lines:
+        handle(tiipMsg.reload(line))
+
+
+def pooled(lines):
+    pool = MessagePool()
+    for line in lines:
+        tiipMsg = pool.decode(line)
+        handle(tiipMsg)
+        pool.release(tiipMsg)
+
+
+def decodeMany(lines):
+    for start in range(0, len(lines), CHUNK):
+        for tiipMsg in TIIPMessage.decodeMany(lines[start:start + CHUNK]):
+            handle(tiipMsg)
+
+
+def decodeManyPooled(lines):
+    pool = MessagePool(maxSize=CHUNK)
+    for start in range(0, len(lines), CHUNK):
+        for tiipMsg in TIIPMessage.decodeMany(lines[start:start + CHUNK], pool=pool):
+            handle(tiipMsg)
+            pool.release(tiipMsg)
+
+
+def measure(loop, lines):
+    gcSeconds = [0.0, None]
+
+    def onCollect(phase, info):
+        if phase == 'start':
+            gcSeconds[1] = time.perf_counter()
+        else:
+            gcSeconds[0] += time.perf_counter() - gcSeconds[1]
+
+    gc.collect()
+    before = [stats['collections'] for stats in gc.get_stats()]
+    gc.callbacks.append(onCollect)
+    start = time.perf_counter()
+    try:
+        loop(lines)
+    finally:
+        seconds = time.perf_counter() - start
+        gc.callbacks.remove(onCollect)
+    collections = [stats['collections'] - count for stats, count in zip(gc.get_stats(), before)]
+    return seconds, collections, gcSeconds[0]
+
+
+def main():
+    lines = corpus(COUNT)
+    scale = 100000.0 / COUNT
+    print('%d messages, best of %d, collections and gc time per 100k messages' % (COUNT, REPEAT))
+    print('%-20s %12s %8s %8s %8s %10s' % ('', 'msg/s', 'gen0', 'gen1', 'gen2', 'gc ms'))
+    for name, loop in (('new TIIPMessage', newMessages), ('reload', reloaded), ('MessagePool', pooled),
+                       ('decodeMany', decodeMany), ('decodeMany+pool', decodeManyPooled)):
+        seconds, collections, gcSeconds = min(measure(loop, lines) for _ in range(REPEAT))
+        print('%-20s %12.0f %8.0f %8.0f %8.0f %10.2f' % (
+            name, COUNT / seconds, collections[0] * scale, collections[1] * scale, collections[2] * scale,
+            gcSeconds * scale * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Dispatch cost of TIIPRouter with 10k subscriptions, compared to a linear scan over the same subscriptions.
+
+Run from the repository root: python -m bench.router_bench
+"""
+
+from __future__ import print_function
+
+import random
+import timeit
+
+from pytiip.router import TIIPRouter
+from pytiip.tiip import TIIPMessage
+
+SUBSCRIPTIONS = 10000
+MESSAGES = 2000
+
+
+def handler(tiipMsg):
+    pass
+
+
+def linearMatch(subscriptions, tiipMsg):
+    matched = []
+    for sig, ch, targ in subscriptions:
+        if sig is not None and sig != tiipMsg.sig:
+            continue
+        if ch is not None and ch != tiipMsg.ch:
+            continue
+        if targ and (tiipMsg.targ is None or tiipMsg.targ[:len(targ)] != targ):
+            continue
+        matched.append(handler)
+    return matched
+
+
+def main():
+    rng = random.Random(1)
+    subscriptions = []
+    router = TIIPRouter()
+    for i in range(SUBSCRIPTIONS):
+        sig = 'sig%d' % rng.randrange(1000) if rng.random() < 0.9 else None
+        ch = 'ch%d' % rng.randrange(10) if rng.random() < 0.5 else None
+        targ = ['node%d' % rng.randrange(100)] if rng.random() < 0.5 else None
+        subscriptions.append((sig, ch, targ))
+        router.subscribe(handler, sig=sig, ch=ch, targ=targ)
+    tiipMsgs = [TIIPMessage(sig='sig%d' % rng.randrange(1000), ch='ch%d' % rng.randrange(10),
+                            targ=['node%d' % rng.randrange(100), 'x']) for _ in range(MESSAGES)]
+    for tiipMsg in tiipMsgs[:100]:
+        assert len(router.match(tiipMsg)) == len(linearMatch(subscriptions, tiipMsg))
+    for name, func in [('linear scan', lambda: [linearMatch(subscriptions, m) for m in tiipMsgs]),
+                       ('TIIPRouter', lambda: [router.dispatch(m) for m in tiipMsgs])]:
+        seconds = min(timeit.repeat(func, number=1, repeat=3))
+        print('%-12s %10.2f us/msg' % (name, seconds / MESSAGES * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""
+Reproducible benchmark suite over the TIIPMessage hot paths, with small, medium and large payload corpora.
+
+Results are written as JSON and can be compared against a stored baseline:
+    python -m bench.suite --output results.json
+    python -m bench.suite --baseline bench/baseline.json
+Comparing exits with status 1 if any case is slower than the baseline by more than the threshold. Cases above
+the threshold are measured again, up to --confirm times, and their best result is compared, so that a
+single noisy measurement is not reported as a regression.
+Update the baseline with --output bench/baseline.json --runs 3 on the reference machine, the median of a
+few runs is less likely to be a lucky low than a single run.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+
+from pytiip import tiip
+from pytiip.tiip import TIIPMessage
+
+MESSAGES_PER_CORPUS = 200
+REPEAT = 5
+DEFAULT_THRESHOLD = 0.25  # Allowed slowdown relative to the baseline
+DEFAULT_CONFIRM = 3  # Times a case above the threshold is measured again before it is a regression
+
+
+def corpus(size):
+    """
+    @param size: 'small', 'medium' or 'large'
+    @return: A list of keyword argument dicts for distinct realistic messages
+    """
+    kwargsList = []
+    for i in range(MESSAGES_PER_CORPUS):
+        ts = '2019-04-24T09:%02d:%02d.%06dZ' % (i // 60 % 60, i % 60, i * 4567 % 1000000)
+        if size == 'small':
+            kwargs = dict(ts=ts, type='pub', sig='temperature', pl=[21.5 + i % 7])
+        elif size == 'medium':
+            kwargs = dict(
+                ts=ts, lat='0.0%d' % (i % 9 + 1), mid='m%d' % i, type='req', src=['gateway', 'device%d' % (i % 50)],
+                targ=['backend', 'store'], sig='readings', ch='sensors', arg={'unit': 'C', 'interval': 10},
+                pl=[21.5, 21.7, 21.6, 21.9, i], ok=True, ten='acme')
+        else:
+            kwargs = dict(
+                ts=ts, lat='0.012', mid='m%d' % i, type='pub', src=['device%d' % (i % 50)], sig='waveform',
+                arg={'rate': 1000, 'channels': ['x', 'y', 'z']}, pl=[(i + j) * 0.001 for j in range(1000)])
+        kwargsList.append(kwargs)
+    return kwargsList
+
+
+def cases(kwargsList):
+    tiipMsgs = [TIIPMessage(**kwargs) for kwargs in kwargsList]
+    tiipStrs = [str(tiipMsg) for tiipMsg in tiipMsgs]
+    tiipDicts = [json.loads(tiipStr) for tiipStr in tiipStrs]
+    tiip2Strs = [TIIPMessage(**dict(kwargs, lat=None)).asVersion('tiip.2.0') for kwargs in kwargsList]
+
+    def encode():
+        for tiipMsg in tiipMsgs:
+            tiipMsg.clearCache()
+            str(tiipMsg)
+
+    def strCached():
+        tiip.setEncodingCache(True)
+        try:
+            for tiipMsg in tiipMsgs:
+                str(tiipMsg)
+        finally:
+            tiip.setEncodingCache(False)
+
+    def asVersion2():
+        for tiipMsg in tiipMsgs:
+            tiipMsg.clearCache()
+            tiipMsg.asVersion('tiip.2.0')
+
+    def asVersion3():
+        for tiipMsg in tiipMsgs:
+            tiipMsg.clearCache()
+            tiipMsg.asVersion('tiip.3.0')
+
+    return [
+        ('init kwargs', lambda: [TIIPMessage(**kwargs) for kwargs in kwargsList]),
+        ('init tiipStr', lambda: [TIIPMessage(tiipStr=tiipStr) for tiipStr in tiipStrs]),
+        ('init tiipDict', lambda: [TIIPMessage(tiipDict=tiipDict) for tiipDict in tiipDicts]),
+        ('str', encode),
+        ('str cached', strCached),
+        ('dict', lambda: [dict(tiipMsg) for tiipMsg in tiipMsgs]),
+        ('asVersion tiip.2.0', asVersion2),
+        ('asVersion tiip.3.0', asVersion3),
+        ('tiip.2.0 ingest', lambda: [TIIPMessage(tiipStr=tiipStr, verifyVersion=False) for tiipStr in tiip2Strs]),
+    ]
+
+
+def measure(func):
+    """
+    @return: Microseconds per message, the best of REPEAT runs with the timestamp cache cleared before each
+    """
+    def run():
+        tiip.parseTimeStamp.cache_clear()
+        func()
+    number = 1
+    while min(timeit.repeat(run, number=number, repeat=1)) < 0.1:
+        number *= 2
+    return min(timeit.repeat(run, number=number, repeat=REPEAT)) / number / MESSAGES_PER_CORPUS * 1e6
+
+
+def measureCases(names=None):
+    """
+    @param names: The names of the cases to measure, None for all
+    @return: A dict of case name: microseconds per message
+    """
+    results = {}
+    for size in ('small', 'medium', 'large'):
+        for name, func in cases(corpus(size)):
+            if names is None or name + ' / ' + size in names:
+                results[name + ' / ' + size] = measure(func)
+    if names is None or 'getTimeStamp' in names:
+        results['getTimeStamp'] = min(
+            timeit.repeat(TIIPMessage.getTimeStamp, number=100000, repeat=REPEAT)) / 100000 * 1e6
+    return results
+
+
+def confirm(results, baseline, threshold, times):
+    """
+    Measures the cases slower than the baseline by more than threshold again, keeping the best result.
+    @param times: Most times a case is measured again
+    """
+    for _ in range(times):
+        slower = [name for name in results if name in baseline and results[name] > baseline[name] * (1 + threshold)]
+        if not slower:
+            return
+        for name, current in measureCases(slower).items():
+            results[name] = min(results[name], current)
+
+
+def runSuite(runs=1):
+    """
+    @param runs: Times the suite is run, the median result of each case is reported
+    """
+    measured = [measureCases() for _ in range(runs)]
+    results = dict((name, sorted(run[name] for run in measured)[runs // 2]) for name in measured[0])
+    return {
+        'meta': {
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'protocol': tiip.__version__,
+            'jsonBackend': tiip.getJSONBackend().name,
+            'unit': 'us per message'
+        },
+        'results': results
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints a comparison table.
+    @return: The names of the cases slower than the baseline by more than threshold
+    """
+    regressions = []
+    print('%-34s %12s %12s %8s' % ('case', 'baseline us', 'current us', 'ratio'))
+    for name in sorted(results):
+        current = results[name]
+        previous = baseline.get(name)
+        if previous is None:
+            print('%-34s %12s %12.3f %8s' % (name, '-', current, 'new'))
+            continue
+        ratio = current / previous
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print('%-34s %12.3f %12.3f %8.2f%s' % (name, previous, current, ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    argParser = argparse.ArgumentParser(description='TIIPMessage benchmark suite')
+    argParser.add_argument('--output', help='write the results as JSON to this file')
+    argParser.add_argument('--baseline', help='compare against the results in this JSON file')
+    argParser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                           help='allowed slowdown relative to the baseline, default %(default)s')
+    argParser.add_argument('--confirm', type=int, default=DEFAULT_CONFIRM,
+                           help='times a case above the threshold is measured again, default %(default)s')
+    argParser.add_argument('--runs', type=int, default=1,
+                           help='times the suite is run, the median of each case is reported, default %(default)s')
+    argParser.add_argument('--json-backend', help='json backend to benchmark, default the selected one')
+    args = argParser.parse_args(argv)
+
+    if args.json_backend:
+        tiip.setJSONBackend(args.json_backend)
+    report = runSuite(args.runs)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        confirm(report['results'], baseline['results'], args.threshold, args.confirm)
+        regressions = compare(report['results'], baseline['results'], args.threshold)
+        if regressions:
+            print('%d regression(s) above %d%%' % (len(regressions), args.threshold * 100))
+            return 1
+    elif not args.output:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
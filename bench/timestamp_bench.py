@@ -0,0 +1,84 @@
+"""
+Benchmark of the TIIPMessage.ts setter compared to the previous dateutil based validation, of default
+timestamps compared to the previous utcnow().isoformat() and of numeric access to ts.
+
+Run from the repository root: python -m bench.timestamp_bench
+"""
+
+from __future__ import print_function
+
+import timeit
+
+from datetime import datetime as dt
+from datetime import timedelta as td
+
+import dateutil.parser as parser
+
+from pytiip.tiip import TIIPMessage, parseTimeStamp, timeStampToMicros
+
+NUMBER = 20000
+
+
+def legacySetTs(value):
+    dateObj = parser.parse(value)
+    if dateObj.utcoffset() not in [None, td(0)]:
+        raise ValueError('timestamp string must be in utc timezone')
+    if value[-1] != 'Z' or value[19] != '.':
+        raise ValueError('seconds must be decimals and end with Z')
+    return value
+
+
+def legacyGetTimeStamp():
+    return dt.utcnow().isoformat(timespec='microseconds') + 'Z'
+
+
+def uniqueTimeStamps(count):
+    return ['2019-04-24T09:%02d:%02d.%06dZ' % (i // 60000000 % 60, i // 1000000 % 60, i % 1000000)
+            for i in range(count)]
+
+
+def nonCanonicalTimeStamps(count):
+    # Millisecond fractions, which take the slower fallback of the parser
+    return ['2019-04-24T09:%02d:%02d.%03dZ' % (i // 60000 % 60, i // 1000 % 60, i % 1000) for i in range(count)]
+
+
+def run(name, func, values):
+    def loop():
+        for value in values:
+            func(value)
+    seconds = min(timeit.repeat(loop, number=1, repeat=3))
+    print('%-40s %8.2f us/op' % (name, seconds / len(values) * 1e6))
+
+
+def main():
+    msg = TIIPMessage()
+
+    def setTs(value):
+        msg.ts = value
+
+    unique = uniqueTimeStamps(NUMBER)
+    burst = ['2019-04-24T09:36:18.770000Z'] * NUMBER
+    nonCanonical = nonCanonicalTimeStamps(NUMBER // 10)
+
+    run('dateutil setter, unique', legacySetTs, unique)
+    run('dateutil setter, burst', legacySetTs, burst)
+    parseTimeStamp.cache_clear()
+    run('ts setter, unique', setTs, unique)
+    parseTimeStamp.cache_clear()
+    run('ts setter, burst', setTs, burst)
+    run('dateutil setter, non-canonical', legacySetTs, nonCanonical)
+    parseTimeStamp.cache_clear()
+    run('ts setter, non-canonical', setTs, nonCanonical)
+
+    run('utcnow().isoformat()', lambda _: legacyGetTimeStamp(), unique)
+    run('getTimeStamp', lambda _: TIIPMessage.getTimeStamp(), unique)
+    run('TIIPMessage() with default ts', lambda _: TIIPMessage(), unique)
+
+    tiipMsgs = [TIIPMessage(ts=value) for value in unique]
+    parseTimeStamp.cache_clear()
+    run('timeStampToMicros(msg.ts), unique', lambda m: timeStampToMicros(m.ts), tiipMsgs)
+    run('msg.tsMicros, unique', lambda m: m.tsMicros, tiipMsgs)
+
+
+if __name__ == '__main__':
+    main()
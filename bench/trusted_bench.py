@@ -0,0 +1,48 @@
+"""
+Benchmark of decoding with and without per-key validation (trusted=True), and of validate().
+
+Run from the repository root: python -m bench.trusted_bench
+"""
+
+from __future__ import print_function
+
+import json
+import timeit
+
+from pytiip.tiip import TIIPMessage, __version__, parseTimeStamp
+
+COUNT = 20000
+
+
+def corpus(count):
+    return [json.dumps({
+        'pv': __version__,
+        'ts': '2019-04-24T09:%02d:%02d.%06dZ' % (i // 60000000 % 60, i // 1000000 % 60, i % 1000000),
+        'lat': '0.012',
+        'mid': 'm%d' % i,
+        'type': 'pub',
+        'src': ['device%d' % (i % 50)],
+        'sig': 'temperature',
+        'ch': 'sensor%d' % (i % 8),
+        'pl': [20.0 + i % 10, 0.5]
+    }) for i in range(count)]
+
+
+def run(name, func):
+    def loop():
+        parseTimeStamp.cache_clear()
+        func()
+    seconds = min(timeit.repeat(loop, number=1, repeat=3))
+    print('%-30s %10.0f msgs/s' % (name, COUNT / seconds))
+
+
+def main():
+    tiipStrs = corpus(COUNT)
+    trustedMsgs = TIIPMessage.decodeMany(tiipStrs, trusted=True)
+    run('validated', lambda: TIIPMessage.decodeMany(tiipStrs))
+    run('trusted', lambda: TIIPMessage.decodeMany(tiipStrs, trusted=True))
+    run('validate()', lambda: [tiipMsg.validate() for tiipMsg in trustedMsgs])
+
+
+if __name__ == '__main__':
+    main()
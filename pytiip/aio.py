@@ -0,0 +1,189 @@
+"""
+asyncio transport of TIIP messages over StreamReader/StreamWriter pairs, e.g. TCP or Unix sockets.
+
+Two framings are supported: NEWLINE, one json encoded message per line, and LENGTH_PREFIXED, each json
+encoded message preceded by its length as a 4 byte big-endian unsigned integer.
+"""
+
+import asyncio
+import struct
+
+from pytiip.tiip import TIIPMessage
+
+NEWLINE = 'newline'
+LENGTH_PREFIXED = 'length'
+FRAMINGS = (NEWLINE, LENGTH_PREFIXED)
+
+DEFAULT_MAX_FRAME_SIZE = 1 << 20  # Largest accepted encoded message in bytes
+DEFAULT_HIGH_WATER = 1 << 16  # Bytes buffered by TIIPStreamWriter.send before it drains
+
+_LENGTH = struct.Struct('>I')
+
+
+def _checkFraming(framing):
+    if framing not in FRAMINGS:
+        raise ValueError('framing must be one of ' + ', '.join(FRAMINGS))
+
+
+class TIIPStreamReader(object):
+    """
+    Reads TIIPMessages from an asyncio.StreamReader. Also an async iterator, ending when the stream ends:
+        async for tiipMsg in TIIPStreamReader(reader):
+            ...
+    With NEWLINE framing a line can not be longer than the limit of the StreamReader either.
+    """
+
+    def __init__(self, reader, framing=NEWLINE, maxFrameSize=DEFAULT_MAX_FRAME_SIZE, verifyVersion=True,
+                 backend=None):
+        """
+        @param reader: An asyncio.StreamReader
+        @param framing: NEWLINE or LENGTH_PREFIXED
+        @param maxFrameSize: Largest accepted encoded message in bytes, larger frames raise ValueError
+        @param verifyVersion: True to verify that every message has the right protocol
+        @param backend: Name of the json backend to use, None for the one selected with setJSONBackend
+        @raise: ValueError
+        """
+        _checkFraming(framing)
+        self.__reader = reader
+        self.__framing = framing
+        self.__maxFrameSize = maxFrameSize
+        self.__verifyVersion = verifyVersion
+        self.__backend = backend
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        tiipMsg = await self.read()
+        if tiipMsg is None:
+            raise StopAsyncIteration
+        return tiipMsg
+
+    async def read(self):
+        """
+        @raise: TypeError, ValueError
+        @return: The next TIIPMessage, None when the stream has ended
+        """
+        frame = await self.readFrame()
+        if frame is None:
+            return None
+        return TIIPMessage.decodeMany([frame], self.__verifyVersion, backend=self.__backend)[0]
+
+    async def readFrame(self):
+        """
+        @raise: ValueError
+        @return: The next encoded message as bytes, None when the stream has ended
+        """
+        if self.__framing == LENGTH_PREFIXED:
+            return await self.__readLengthPrefixed()
+        return await self.__readLine()
+
+    async def __readLine(self):
+        while True:
+            try:
+                line = await self.__reader.readuntil(b'\n')
+            except asyncio.IncompleteReadError as e:
+                line = e.partial
+                if not line or line.isspace():
+                    return None
+            except asyncio.LimitOverrunError:
+                raise ValueError('tiip frame exceeds the stream reader limit')
+            if len(line) > self.__maxFrameSize + 1:
+                raise ValueError('tiip frame of ' + str(len(line)) + ' bytes exceeds the maximum frame size')
+            if not line.isspace():
+                return line
+
+    async def __readLengthPrefixed(self):
+        try:
+            header = await self.__reader.readexactly(_LENGTH.size)
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise ValueError('truncated tiip frame')
+            return None
+        length = _LENGTH.unpack(header)[0]
+        if length > self.__maxFrameSize:
+            raise ValueError('tiip frame of ' + str(length) + ' bytes exceeds the maximum frame size')
+        try:
+            return await self.__reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            raise ValueError('truncated tiip frame')
+
+
+class TIIPStreamWriter(object):
+    """
+    Writes TIIPMessages to an asyncio.StreamWriter. Encoded messages are collected and handed to the
+    transport in batches, send() drains once highWater bytes are buffered so producers are held back by a
+    slow peer.
+    """
+
+    def __init__(self, writer, framing=NEWLINE, highWater=DEFAULT_HIGH_WATER, backend=None):
+        """
+        @param writer: An asyncio.StreamWriter
+        @param framing: NEWLINE or LENGTH_PREFIXED
+        @param highWater: Number of buffered bytes at which send() drains
+        @param backend: Name of the json backend to use, None for the one selected with setJSONBackend
+        @raise: ValueError
+        """
+        _checkFraming(framing)
+        self.__writer = writer
+        self.__framing = framing
+        self.__highWater = highWater
+        self.__backend = backend
+        self.__buffer = []
+        self.__buffered = 0
+
+    @property
+    def buffered(self):
+        """
+        Number of bytes written but not yet handed to the transport.
+        """
+        return self.__buffered
+
+    def write(self, tiipMsg):
+        """
+        Buffers a TIIPMessage without any I/O. Call drain() to send buffered messages.
+        @param tiipMsg: The TIIPMessage to write
+        """
+        self.writeFrame(tiipMsg.toBytes(self.__backend))
+
+    def writeFrame(self, frame):
+        """
+        Buffers an already encoded message without any I/O, e.g. LazyTIIPMessage.toBytes() when forwarding.
+        @param frame: The json encoded message as bytes, without framing
+        """
+        if self.__framing == LENGTH_PREFIXED:
+            self.__buffer.append(_LENGTH.pack(len(frame)))
+            self.__buffer.append(frame)
+            self.__buffered += _LENGTH.size + len(frame)
+        else:
+            self.__buffer.append(frame)
+            self.__buffer.append(b'\n')
+            self.__buffered += len(frame) + 1
+
+    async def send(self, tiipMsg):
+        """
+        Buffers a TIIPMessage and drains if highWater bytes are buffered.
+        @param tiipMsg: The TIIPMessage to send
+        """
+        self.write(tiipMsg)
+        if self.__buffered >= self.__highWater:
+            await self.drain()
+
+    async def drain(self):
+        """
+        Hands all buffered messages to the transport in one write and waits until the transport is below its
+        own high water mark.
+        """
+        if self.__buffer:
+            self.__writer.write(b''.join(self.__buffer))
+            self.__buffer = []
+            self.__buffered = 0
+        await self.__writer.drain()
+
+    async def close(self):
+        """
+        Drains buffered messages and closes the underlying StreamWriter.
+        """
+        await self.drain()
+        self.__writer.close()
+        await self.__writer.wait_closed()
@@ -0,0 +1,240 @@
+"""
+Append-only archive of TIIP messages with an index for time and signal range queries.
+
+An archive consists of three files:
+    path: the records, one json encoded TIIPMessage per line, so the archive is also a plain NDJSON log
+    path.idx: one fixed size entry per record with ts as int64 microseconds, the position of the record and
+        the ids of its sig, ch, src and ten
+    path.keys: the strings behind the ids, one json value per line
+Queries binary search the memory mapped index on ts, filter on ids and only read and decode the matching
+records, straight from a memory mapping of the records.
+"""
+
+import bisect
+import json
+import mmap
+import os
+import struct
+
+from datetime import datetime as dt
+
+from pytiip.tiip import TIIPMessage, PY3, _EPOCH, _MICROSECOND, timeStampToMicros
+
+if PY3:
+    unicode = str
+
+INDEX_SUFFIX = '.idx'
+KEYS_SUFFIX = '.keys'
+
+_ENTRY = struct.Struct('<qQIiiii')  # ts, offset, length, sig, ch, src, ten
+_TS = struct.Struct('<q')
+_KEYED = ('sig', 'ch', 'src', 'ten')
+
+
+class TIIPArchive(object):
+    """
+    Append-only archive of TIIPMessages, see the module documentation for the file layout.
+    Records may be appended out of time order, queries then use an in-memory ordering built on demand.
+    """
+
+    def __init__(self, path):
+        """
+        Opens the archive at path, creating it if it does not exist.
+        @param path: Path of the record file, the index and key files are stored next to it
+        """
+        self.__path = path
+        self.__data = open(path, 'ab')
+        self.__index = open(path + INDEX_SUFFIX, 'ab')
+        self.__keysFile = open(path + KEYS_SUFFIX, 'ab')
+        self.__keys = []
+        self.__keyIds = {}
+        with open(path + KEYS_SUFFIX, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    self.__addKey(json.loads(line.decode('utf-8')))
+        self.__dataSize = os.path.getsize(path)
+        self.__count = os.path.getsize(path + INDEX_SUFFIX) // _ENTRY.size
+        self.__dataMap = None
+        self.__indexMap = None
+        self.__mappedCount = 0
+        self.__lastTs = None
+        self.__order = None  # Record numbers sorted by ts, None when records are appended in time order
+        self.__sorted = True
+        self.__mapped()
+        for i in range(self.__count):
+            ts = _TS.unpack_from(self.__indexMap, i * _ENTRY.size)[0]
+            if self.__lastTs is not None and ts < self.__lastTs:
+                self.__sorted = False
+            self.__lastTs = ts if self.__lastTs is None else max(ts, self.__lastTs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.__count
+
+    def __iter__(self):
+        """
+        Iterates over all records as TIIPMessages in the order they were appended.
+        """
+        self.flush()
+        indexMap, dataMap = self.__mapped()
+        for i in range(self.__count):
+            entry = _ENTRY.unpack_from(indexMap, i * _ENTRY.size)
+            yield self.__decode(memoryview(dataMap)[entry[1]:entry[1] + entry[2]], False)
+
+    def append(self, tiipMsg):
+        """
+        Appends a TIIPMessage to the archive.
+        @param tiipMsg: The TIIPMessage to append
+        """
+        encoded = tiipMsg.toBytes()
+        ts = tiipMsg.tsMicros
+        ids = [self.__keyId(_keyValue(getattr(tiipMsg, key)), True) for key in _KEYED]
+        self.__data.write(encoded)
+        self.__data.write(b'\n')
+        self.__index.write(_ENTRY.pack(ts, self.__dataSize, len(encoded), *ids))
+        self.__dataSize += len(encoded) + 1
+        self.__count += 1
+        if self.__lastTs is not None and ts < self.__lastTs:
+            self.__sorted = False
+        self.__lastTs = ts if self.__lastTs is None else max(ts, self.__lastTs)
+        self.__order = None
+
+    def flush(self):
+        """
+        Writes buffered records to disk.
+        """
+        self.__keysFile.flush()
+        self.__data.flush()
+        self.__index.flush()
+
+    def close(self):
+        self.flush()
+        self.__data.close()
+        self.__index.close()
+        self.__keysFile.close()
+        for mapping in (self.__dataMap, self.__indexMap):
+            if mapping is not None:
+                try:
+                    mapping.close()
+                except BufferError:
+                    pass  # Still referenced by memoryviews from queryRaw, closed when they are released
+        self.__dataMap = self.__indexMap = None
+
+    def queryRaw(self, start=None, end=None, sig=None, ch=None, src=None, ten=None):
+        """
+        Generator yielding the json encoded records matching all given conditions, in time order, as
+        memoryviews into the memory mapped record file. Nothing is copied or decoded.
+        @param start: Only records with ts >= start, a timestamp string, datetime or int microseconds
+        @param end: Only records with ts < end, a timestamp string, datetime or int microseconds
+        @param sig: Only records with this sig
+        @param ch: Only records with this ch
+        @param src: Only records with this src, a list
+        @param ten: Only records with this ten
+        """
+        wanted = []
+        for position, value in enumerate((sig, ch, src, ten)):
+            if value is not None:
+                keyId = self.__keyId(_keyValue(value), False)
+                if keyId is None:
+                    return
+                wanted.append((position + 3, keyId))
+        self.flush()
+        indexMap, dataMap = self.__mapped()
+        if indexMap is None:
+            return
+        order = self.__timeOrder()
+        column = _TsColumn(indexMap, self.__count, order)
+        first = 0 if start is None else bisect.bisect_left(column, _toMicros(start))
+        last = self.__count if end is None else bisect.bisect_left(column, _toMicros(end))
+        view = memoryview(dataMap)
+        for i in range(first, last):
+            entry = _ENTRY.unpack_from(indexMap, (i if order is None else order[i]) * _ENTRY.size)
+            if all(entry[position] == keyId for position, keyId in wanted):
+                yield view[entry[1]:entry[1] + entry[2]]
+
+    def query(self, start=None, end=None, sig=None, ch=None, src=None, ten=None, trusted=False):
+        """
+        Generator yielding the TIIPMessages matching all given conditions in time order, see queryRaw.
+        @param trusted: True to skip type and value checks of the records, see TIIPMessage.loadFromDict
+        """
+        for record in self.queryRaw(start, end, sig, ch, src, ten):
+            yield self.__decode(record, trusted)
+
+    def __decode(self, record, trusted):
+        return TIIPMessage.decodeMany([record], trusted=trusted)[0]
+
+    def __mapped(self):
+        # (Re)maps the files when records have been appended since they were last mapped
+        if self.__count and self.__mappedCount != self.__count:
+            self.__indexMap = _map(self.__path + INDEX_SUFFIX)
+            self.__dataMap = _map(self.__path)
+            self.__mappedCount = self.__count
+        return self.__indexMap, self.__dataMap
+
+    def __timeOrder(self):
+        if self.__sorted:
+            return None
+        if self.__order is None:
+            indexMap = self.__indexMap
+            self.__order = sorted(
+                range(self.__count), key=lambda i: _TS.unpack_from(indexMap, i * _ENTRY.size)[0])
+        return self.__order
+
+    def __addKey(self, value):
+        self.__keyIds[value] = len(self.__keys)
+        self.__keys.append(value)
+
+    def __keyId(self, value, create):
+        if value is None:
+            return -1
+        keyId = self.__keyIds.get(value)
+        if keyId is None and create:
+            keyId = len(self.__keys)
+            self.__addKey(value)
+            self.__keysFile.write(json.dumps(value).encode('utf-8') + b'\n')
+        return keyId
+
+
+class _TsColumn(object):
+    # The ts of the index entries in time order, as a sequence for bisect
+    __slots__ = ('__indexMap', '__count', '__order')
+
+    def __init__(self, indexMap, count, order):
+        self.__indexMap = indexMap
+        self.__count = count
+        self.__order = order
+
+    def __len__(self):
+        return self.__count
+
+    def __getitem__(self, i):
+        if self.__order is not None:
+            i = self.__order[i]
+        return _TS.unpack_from(self.__indexMap, i * _ENTRY.size)[0]
+
+
+def _keyValue(value):
+    # src is a list, stored by its json representation
+    if isinstance(value, list):
+        return json.dumps(value, separators=(',', ':'))
+    return value
+
+
+def _toMicros(value):
+    if isinstance(value, (str, unicode)):
+        return timeStampToMicros(value)
+    if isinstance(value, dt):
+        if value.utcoffset() is not None:
+            value = value.replace(tzinfo=None) - value.utcoffset()
+        return (value - _EPOCH) // _MICROSECOND
+    return int(value)
+
+
+def _map(path):
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
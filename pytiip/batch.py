@@ -0,0 +1,244 @@
+"""
+Columnar batches of TIIP messages backed by NumPy arrays, for analytics over many messages.
+Requires numpy.
+"""
+
+from pytiip.tiip import TIIPMessage, PY3
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+if PY3:
+    unicode = str
+    long = int
+else:
+    # noinspection PyShadowingBuiltins
+    bytes = str
+
+_CATEGORICAL_KEYS = ('sig', 'ch', 'ten', 'type')
+_OBJECT_KEYS = ('mid', 'sid', 'src', 'targ', 'arg', 'ok')
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+
+
+class Categorical(object):
+    """
+    A dictionary encoded column of strings. codes holds an int32 index into categories per row, -1 for None.
+    """
+    __slots__ = ('codes', 'categories', '__lookup')
+
+    def __init__(self, codes, categories):
+        self.codes = codes
+        self.categories = categories
+        self.__lookup = None
+
+    @classmethod
+    def fromValues(cls, values):
+        lookup = {}
+        categories = []
+        codes = numpy.empty(len(values), dtype=numpy.int32)
+        for i, value in enumerate(values):
+            if value is None:
+                codes[i] = -1
+                continue
+            code = lookup.get(value)
+            if code is None:
+                code = lookup[value] = len(categories)
+                categories.append(value)
+            codes[i] = code
+        return cls(codes, categories)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def code(self, value):
+        """
+        @return: The code of value, -1 for None and None for values not in this column
+        """
+        if value is None:
+            return -1
+        if self.__lookup is None:
+            self.__lookup = dict((category, code) for code, category in enumerate(self.categories))
+        return self.__lookup.get(value)
+
+    def mask(self, *values):
+        """
+        @return: A boolean array, True for rows equal to any of values, None matching the rows without a value
+        """
+        codes = [code for code in (self.code(value) for value in values) if code is not None]
+        if not codes:
+            return numpy.zeros(len(self.codes), dtype=bool)
+        if len(codes) == 1:
+            return self.codes == codes[0]
+        return numpy.isin(self.codes, codes)
+
+    def take(self, indexes):
+        return Categorical(self.codes[indexes], self.categories)
+
+    def tolist(self):
+        categories = self.categories
+        return [categories[code] if code >= 0 else None for code in self.codes.tolist()]
+
+
+class TIIPBatch(object):
+    """
+    Many TIIP messages stored column by column:
+        ts: datetime64[us] array
+        lat: float64 array, NaN where lat is missing
+        sig, ch, ten, type: Categorical columns
+        pl: array of shape (rows, n) if every payload is a list or numeric array of n numbers, otherwise an object
+            array. int64 if every number is an int, otherwise float64
+    All other keys are kept in object arrays so that batches convert back to TIIPMessages.
+    """
+
+    def __init__(self, tiipMsgs=(), verifyVersion=True):
+        """
+        @param tiipMsgs: An iterable of TIIPMessages and/or their string, unicode or bytes representations
+        @param verifyVersion: True to verify the protocol of string representations
+        @raise: ImportError if numpy is not installed, TypeError, ValueError
+        """
+        if numpy is None:
+            raise ImportError('TIIPBatch requires numpy')
+        tiipMsgs = list(tiipMsgs)
+        encoded = [i for i, item in enumerate(tiipMsgs) if isinstance(item, (str, unicode, bytes))]
+        if encoded:
+            decoded = TIIPMessage.decodeMany([tiipMsgs[i] for i in encoded], verifyVersion)
+            for i, tiipMsg in zip(encoded, decoded):
+                tiipMsgs[i] = tiipMsg
+        for tiipMsg in tiipMsgs:
+            if not isinstance(tiipMsg, TIIPMessage):
+                raise TypeError('TIIPBatch can only be created from TIIPMessages or their representations')
+
+        self.ts = numpy.array([tiipMsg.tsMicros for tiipMsg in tiipMsgs], dtype=numpy.int64).astype('datetime64[us]')
+        self.lat = numpy.array(
+            [float(tiipMsg.lat) if tiipMsg.lat is not None else numpy.nan for tiipMsg in tiipMsgs],
+            dtype=numpy.float64)
+        self.sig = Categorical.fromValues([tiipMsg.sig for tiipMsg in tiipMsgs])
+        self.ch = Categorical.fromValues([tiipMsg.ch for tiipMsg in tiipMsgs])
+        self.ten = Categorical.fromValues([tiipMsg.ten for tiipMsg in tiipMsgs])
+        self.type = Categorical.fromValues([tiipMsg.type for tiipMsg in tiipMsgs])
+        self.pl = _payloadColumn([tiipMsg.pl for tiipMsg in tiipMsgs])
+        self.others = dict(
+            (key, _objectColumn([getattr(tiipMsg, key) for tiipMsg in tiipMsgs])) for key in _OBJECT_KEYS)
+
+    def __len__(self):
+        return len(self.ts)
+
+    def __getitem__(self, index):
+        """
+        @param index: A boolean mask, an integer index array or a slice
+        @return: A new TIIPBatch with the selected rows
+        """
+        if isinstance(index, slice):
+            index = numpy.arange(len(self))[index]
+        batch = TIIPBatch.__new__(TIIPBatch)
+        batch.ts = self.ts[index]
+        batch.lat = self.lat[index]
+        for key in _CATEGORICAL_KEYS:
+            setattr(batch, key, getattr(self, key).take(index))
+        batch.pl = self.pl[index]
+        batch.others = dict((key, column[index]) for key, column in self.others.items())
+        return batch
+
+    def where(self, start=None, end=None, **values):
+        """
+        Creates a boolean mask over the rows.
+        @param start: Only rows with ts >= start, a datetime, datetime64 or timestamp string
+        @param end: Only rows with ts < end, a datetime, datetime64 or timestamp string
+        @param values: sig, ch, ten and/or type to match, each a value or a list/tuple of accepted values
+        @raise: TypeError for other keys
+        @return: A boolean array
+        """
+        mask = numpy.ones(len(self), dtype=bool)
+        if start is not None:
+            mask &= self.ts >= _datetime64(start)
+        if end is not None:
+            mask &= self.ts < _datetime64(end)
+        for key, value in values.items():
+            if key not in _CATEGORICAL_KEYS:
+                raise TypeError('can only match on ' + ', '.join(_CATEGORICAL_KEYS))
+            if isinstance(value, (list, tuple)):
+                mask &= getattr(self, key).mask(*value)
+            else:
+                mask &= getattr(self, key).mask(value)
+        return mask
+
+    def filter(self, start=None, end=None, **values):
+        """
+        @return: A new TIIPBatch with the rows matching, see where()
+        """
+        return self[self.where(start, end, **values)]
+
+    def sortByTime(self):
+        """
+        @return: A new TIIPBatch sorted by ts, rows with equal ts keep their order
+        """
+        return self[numpy.argsort(self.ts, kind='stable')]
+
+    def toMessages(self):
+        """
+        Converts the batch back to TIIPMessages. Timestamps are formatted with microsecond precision and
+        latencies are formatted from their float value. Integer payloads stay integers, while the ints of a
+        payload column that also holds floats come back as floats, e.g. [1, 2] as [1.0, 2.0].
+        @return: A list of TIIPMessages
+        """
+        micros = self.ts.astype(numpy.int64).tolist()
+        lats = self.lat.tolist()
+        categorical = [(key, getattr(self, key).tolist()) for key in _CATEGORICAL_KEYS]
+        others = [(key, column.tolist()) for key, column in self.others.items()]
+        pls = self.pl.tolist()
+        tiipMsgs = []
+        for i, tsMicros in enumerate(micros):
+            tiipMsg = TIIPMessage(pl=pls[i])
+            tiipMsg.tsMicros = tsMicros
+            if lats[i] == lats[i]:  # Not NaN
+                tiipMsg.lat = lats[i]
+            for key, column in categorical:
+                setattr(tiipMsg, key, column[i])
+            for key, column in others:
+                setattr(tiipMsg, key, column[i])
+            tiipMsgs.append(tiipMsg)
+        return tiipMsgs
+
+
+def _objectColumn(values):
+    # Filled one by one, numpy.array() would turn lists of equal length into a 2-d array
+    column = numpy.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        column[i] = value
+    return column
+
+
+def _payloadColumn(pls):
+    width = None
+    integral = True
+    for pl in pls:
+        if pl is None or (width is not None and len(pl) != width):
+            return _objectColumn(pls)
+        width = len(pl)
+        if not isinstance(pl, list):
+            dtype = numpy.asarray(pl).dtype
+            if dtype.kind not in 'iuf':
+                return _objectColumn(pls)
+            # uint64 does not fit in int64
+            integral = integral and (dtype.kind == 'i' or dtype.kind == 'u' and dtype.itemsize < 8)
+            continue
+        for value in pl:
+            if isinstance(value, bool) or not isinstance(value, (int, long, float)):
+                return _objectColumn(pls)
+            if integral and isinstance(value, float):
+                integral = False
+            elif isinstance(value, (int, long)) and not _INT64_MIN <= value <= _INT64_MAX:
+                return _objectColumn(pls)
+    dtype = numpy.int64 if integral and width else numpy.float64
+    return numpy.array(pls, dtype=dtype).reshape(len(pls), width or 0)
+
+
+def _datetime64(value):
+    if isinstance(value, (str, unicode)) and value.endswith('Z'):
+        value = value[:-1]
+    elif hasattr(value, 'utcoffset') and value.utcoffset() is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    return numpy.datetime64(value, 'us')
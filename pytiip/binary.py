@@ -0,0 +1,268 @@
+"""
+Compact binary encoding of TIIP messages, an alternative to the json representation for constrained links.
+
+A message is encoded as the magic byte b'T' and a format version byte, followed by one tagged field per
+present protocol key. Protocol keys are identified by single byte tags, ts is stored as int64 microseconds
+since the epoch, lat as a float64 and ok as a single byte. All other values use a small self-describing
+encoding of None, bools, ints, floats, strings, bytes, lists and dicts. Values that can not be stored
+compactly without changing their representation (e.g. a timestamp with millisecond precision) are
+stored as strings, so decode(encode(msg)) always has the same dict() as msg. Numeric array payloads
+(array.array, memoryview or numpy arrays) are stored as their raw items and decoded as array.array.
+"""
+
+import struct
+
+from pytiip.tiip import TIIPMessage, PY3, _TS_PATTERN, _isNumericArray, _arrayLayout, _arrayFromLayout
+
+if PY3:
+    long = int
+    unicode = str
+else:
+    # noinspection PyShadowingBuiltins
+    bytes = str
+
+MAGIC = b'T'
+FORMAT_VERSION = 1
+
+# Field tags
+_TS_MICROS = 1
+_TS_STR = 2
+_LAT_FLOAT = 3
+_LAT_STR = 4
+_OK = 14
+_KEY_TAGS = (('mid', 5), ('sid', 6), ('type', 7), ('src', 8), ('targ', 9), ('sig', 10), ('ch', 11),
+             ('arg', 12), ('pl', 13), ('ten', 15))
+_TAG_KEYS = dict((tag, key) for key, tag in _KEY_TAGS)
+
+# Value types
+_NONE = 0
+_FALSE = 1
+_TRUE = 2
+_INT = 3
+_FLOAT = 4
+_STR = 5
+_BYTES = 6
+_LIST = 7
+_DICT = 8
+_BIGINT = 9
+_FLOAT_LIST = 10  # A list of floats only, packed as float64s
+_ARRAY = 11  # A numeric array, kept as its raw little-endian items and decoded as an array.array
+
+_INT64 = struct.Struct('<q')
+_FLOAT64 = struct.Struct('<d')
+_BYTE = [bytes(bytearray([i])) for i in range(256)]
+_HEADER = MAGIC + _BYTE[FORMAT_VERSION]
+
+
+def encode(tiipMsg):
+    """
+    Encodes a TIIPMessage in the binary format.
+    @param tiipMsg: The TIIPMessage to encode
+    @raise: TypeError for values that can not be encoded
+    @return: bytes
+    """
+    out = [_HEADER]
+    ts = tiipMsg.ts
+    if _TS_PATTERN.match(ts):
+        out.append(_BYTE[_TS_MICROS])
+        out.append(_INT64.pack(tiipMsg.tsMicros))
+    else:
+        out.append(_BYTE[_TS_STR])
+        _writeValue(out, ts)
+    lat = tiipMsg.lat
+    if lat is not None:
+        if isinstance(lat, (str, unicode)) and repr(float(lat)) == lat:
+            out.append(_BYTE[_LAT_FLOAT])
+            out.append(_FLOAT64.pack(float(lat)))
+        else:
+            out.append(_BYTE[_LAT_STR])
+            _writeValue(out, lat)
+    for key, tag in _KEY_TAGS:
+        value = getattr(tiipMsg, key)
+        if value is not None:
+            out.append(_BYTE[tag])
+            _writeValue(out, value)
+    if tiipMsg.ok is not None:
+        out.append(_BYTE[_OK])
+        out.append(_BYTE[1 if tiipMsg.ok else 0])
+    return b''.join(out)
+
+
+def decode(data):
+    """
+    Creates a TIIPMessage from its binary encoding. All values are validated by the TIIPMessage setters.
+    @param data: bytes, bytearray or memoryview
+    @raise: TypeError, ValueError
+    @return: A TIIPMessage
+    """
+    data = bytes(data) if not isinstance(data, bytes) else data
+    if data[:1] != MAGIC:
+        raise ValueError('not a binary tiip message')
+    if data[1:2] != _HEADER[1:2]:
+        raise ValueError('unsupported binary tiip format version')
+    kwargs = {}
+    micros = None
+    pos = 2
+    end = len(data)
+    try:
+        while pos < end:
+            tag = _byte(data, pos)
+            pos += 1
+            if tag == _TS_MICROS:
+                micros = _INT64.unpack_from(data, pos)[0]
+                pos += 8
+            elif tag == _LAT_FLOAT:
+                kwargs['lat'] = repr(_FLOAT64.unpack_from(data, pos)[0])
+                pos += 8
+            elif tag == _OK:
+                kwargs['ok'] = _byte(data, pos) == 1
+                pos += 1
+            elif tag == _TS_STR:
+                kwargs['ts'], pos = _readValue(data, pos)
+            elif tag == _LAT_STR:
+                kwargs['lat'], pos = _readValue(data, pos)
+            elif tag in _TAG_KEYS:
+                kwargs[_TAG_KEYS[tag]], pos = _readValue(data, pos)
+            else:
+                raise ValueError('unknown binary tiip field tag ' + str(tag))
+    except (struct.error, IndexError):
+        raise ValueError('truncated binary tiip message')
+    if pos != end:
+        raise ValueError('truncated binary tiip message')
+    tiipMsg = TIIPMessage(**kwargs)
+    if micros is not None:
+        tiipMsg.tsMicros = micros
+    return tiipMsg
+
+
+def _byte(data, pos):
+    if PY3:
+        return data[pos]
+    return ord(data[pos])
+
+
+def _writeLength(out, length):
+    while length >= 0x80:
+        out.append(_BYTE[(length & 0x7f) | 0x80])
+        length >>= 7
+    out.append(_BYTE[length])
+
+
+def _readLength(data, pos):
+    length = 0
+    shift = 0
+    while True:
+        byte = _byte(data, pos)
+        pos += 1
+        length |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return length, pos
+        shift += 7
+
+
+def _writeValue(out, value):
+    if value is None:
+        out.append(_BYTE[_NONE])
+    elif value is True:
+        out.append(_BYTE[_TRUE])
+    elif value is False:
+        out.append(_BYTE[_FALSE])
+    elif isinstance(value, (str, unicode)):
+        encoded = value.encode('utf-8')
+        out.append(_BYTE[_STR])
+        _writeLength(out, len(encoded))
+        out.append(encoded)
+    elif isinstance(value, float):
+        out.append(_BYTE[_FLOAT])
+        out.append(_FLOAT64.pack(value))
+    elif isinstance(value, (int, long)):
+        if -0x8000000000000000 <= value <= 0x7fffffffffffffff:
+            out.append(_BYTE[_INT])
+            out.append(_INT64.pack(value))
+        else:
+            encoded = str(value).encode('ascii')
+            out.append(_BYTE[_BIGINT])
+            _writeLength(out, len(encoded))
+            out.append(encoded)
+    elif isinstance(value, (list, tuple)):
+        if value and all(type(item) is float for item in value):
+            out.append(_BYTE[_FLOAT_LIST])
+            _writeLength(out, len(value))
+            out.append(struct.pack('<%dd' % len(value), *value))
+            return
+        out.append(_BYTE[_LIST])
+        _writeLength(out, len(value))
+        for item in value:
+            _writeValue(out, item)
+    elif isinstance(value, dict):
+        out.append(_BYTE[_DICT])
+        _writeLength(out, len(value))
+        for key, item in value.items():
+            _writeValue(out, key)
+            _writeValue(out, item)
+    elif isinstance(value, (bytes, bytearray)):
+        out.append(_BYTE[_BYTES])
+        _writeLength(out, len(value))
+        out.append(bytes(value))
+    elif _isNumericArray(value):
+        kind, itemsize, data = _arrayLayout(value)
+        out.append(_BYTE[_ARRAY])
+        out.append(kind.encode('ascii'))
+        out.append(_BYTE[itemsize])
+        _writeLength(out, len(data))
+        out.append(data)
+    else:
+        raise TypeError('can not encode values of type ' + type(value).__name__)
+
+
+def _readValue(data, pos):
+    kind = _byte(data, pos)
+    pos += 1
+    if kind == _STR:
+        length, pos = _readLength(data, pos)
+        if pos + length > len(data):
+            raise IndexError()
+        return data[pos:pos + length].decode('utf-8'), pos + length
+    elif kind == _FLOAT:
+        return _FLOAT64.unpack_from(data, pos)[0], pos + 8
+    elif kind == _INT:
+        return _INT64.unpack_from(data, pos)[0], pos + 8
+    elif kind == _FLOAT_LIST:
+        length, pos = _readLength(data, pos)
+        return list(struct.unpack_from('<%dd' % length, data, pos)), pos + 8 * length
+    elif kind == _LIST:
+        length, pos = _readLength(data, pos)
+        items = []
+        for _ in range(length):
+            item, pos = _readValue(data, pos)
+            items.append(item)
+        return items, pos
+    elif kind == _DICT:
+        length, pos = _readLength(data, pos)
+        items = {}
+        for _ in range(length):
+            key, pos = _readValue(data, pos)
+            items[key], pos = _readValue(data, pos)
+        return items, pos
+    elif kind == _NONE:
+        return None, pos
+    elif kind == _TRUE:
+        return True, pos
+    elif kind == _FALSE:
+        return False, pos
+    elif kind == _BYTES:
+        length, pos = _readLength(data, pos)
+        if pos + length > len(data):
+            raise IndexError()
+        return data[pos:pos + length], pos + length
+    elif kind == _ARRAY:
+        itemKind = data[pos:pos + 1].decode('ascii')
+        itemsize = _byte(data, pos + 1)
+        length, pos = _readLength(data, pos + 2)
+        if pos + length > len(data):
+            raise IndexError()
+        return _arrayFromLayout(itemKind, itemsize, data[pos:pos + length]), pos + length
+    elif kind == _BIGINT:
+        length, pos = _readLength(data, pos)
+        return long(data[pos:pos + length].decode('ascii')), pos + length
+    raise ValueError('unknown binary tiip value type ' + str(kind))
@@ -0,0 +1,76 @@
+"""
+Conversion of TIIP messages between protocol versions tiip.2.0 and tiip.3.0, for single dicts, batches and
+newline delimited streams. Input dicts are never modified.
+
+tiip.2.0 represents ts (and ct, the client time) as epoch seconds, tiip.3.0 represents ts as an ISO 8601
+string and the difference between ts and ct as lat.
+"""
+
+from pytiip.ndjson import DEFAULT_BUFFER_SIZE, DEFAULT_CHUNK_SIZE, readLineBlocks
+from pytiip.tiip import __version__, _fromVersion2, _toVersion2, getJSONBackend
+
+VERSIONS = ('tiip.2.0', __version__)
+
+
+def convert(tiipDict, version):
+    """
+    @param tiipDict: A dictionary representation of a tiip.2.0 or tiip.3.0 message
+    @param version: The protocol version to convert to
+    @raise: ValueError
+    @return: A new dict in the given version
+    """
+    pv = tiipDict.get('pv')
+    if version not in VERSIONS or pv not in VERSIONS:
+        raise ValueError('Incorrect tiip version. Can only handle versions: ' + ', '.join(VERSIONS))
+    if pv == version:
+        return dict(tiipDict)
+    if version == __version__:
+        return _fromVersion2(tiipDict)
+    return _toVersion2(tiipDict)
+
+
+def convertMany(tiipDicts, version):
+    """
+    @param tiipDicts: An iterable of dictionary representations of tiip.2.0 and/or tiip.3.0 messages
+    @param version: The protocol version to convert to
+    @raise: ValueError
+    @return: A list of new dicts in the given version
+    """
+    if version not in VERSIONS:
+        raise ValueError('Incorrect tiip version. Can only handle versions: ' + ', '.join(VERSIONS))
+    return [convert(tiipDict, version) for tiipDict in tiipDicts]
+
+
+def convertStream(infile, outfile, version, chunkSize=DEFAULT_CHUNK_SIZE, bufferSize=DEFAULT_BUFFER_SIZE,
+                  backend=None):
+    """
+    Converts a newline delimited stream of json encoded messages, e.g. a log file, in constant memory.
+    @param infile: A binary file-like object opened for reading
+    @param outfile: A binary file-like object opened for writing
+    @param version: The protocol version to convert to
+    @param chunkSize: Number of bytes to read at a time
+    @param bufferSize: Number of bytes to collect before each write
+    @param backend: Name of the json backend to use, None for the one selected with setJSONBackend
+    @raise: ValueError
+    @return: The number of messages converted
+    """
+    if version not in VERSIONS:
+        raise ValueError('Incorrect tiip version. Can only handle versions: ' + ', '.join(VERSIONS))
+    jsonBackend = getJSONBackend(backend)
+    block = []
+    size = 0
+    count = 0
+    for lines in readLineBlocks(infile, chunkSize):
+        for line in lines:
+            encoded = jsonBackend.dumpsBytes(convert(jsonBackend.loads(line), version))
+            block.append(encoded)
+            block.append(b'\n')
+            size += len(encoded) + 1
+        count += len(lines)
+        if size >= bufferSize:
+            outfile.write(b''.join(block))
+            block = []
+            size = 0
+    if block:
+        outfile.write(b''.join(block))
+    return count
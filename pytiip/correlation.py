@@ -0,0 +1,217 @@
+"""
+Matching of replies to requests by mid, with a deadline per request.
+
+    table = CorrelationTable()
+    table.register(request, 5.0, onReply)  # onReply(request, reply, roundTrip), reply None on timeout
+    ...
+    table.resolve(reply)  # For every received message
+    table.expire()  # Periodically, or at table.nextDeadline()
+
+Replies are looked up in a dict and deadlines are kept in a heap, so resolving is O(1) and expiring is
+O(log n) per expired request, however many requests are in flight. Resolved requests are left in the heap
+and skipped when they reach the top of it, or dropped when they outnumber the requests in flight.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+
+DEFAULT_RESOLUTION = 0.05  # Seconds between expiries in CorrelationTable.runExpiry
+_COMPACT_MIN = 1024  # Completed heap entries tolerated before the heap is rebuilt
+
+
+class _Pending(object):
+    __slots__ = ('mid', 'request', 'sentAt', 'deadline', 'callback', 'future')
+
+    def __init__(self, mid, request, sentAt, deadline, callback, future):
+        self.mid = mid
+        self.request = request
+        self.sentAt = sentAt
+        self.deadline = deadline
+        self.callback = callback
+        self.future = future
+
+
+class CorrelationTable(object):
+    """
+    Requests in flight, keyed by their mid. A request is completed once, by its reply, its deadline or
+    cancel. Callbacks are called as callback(request, reply, roundTrip), where reply and roundTrip are None
+    if the request timed out. Futures get (reply, roundTrip) as result or asyncio.TimeoutError.
+    Not thread safe, use one table per thread or event loop.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        """
+        @param clock: Function returning the current time in seconds, used for deadlines and round trip times
+        """
+        self.__clock = clock
+        self.__pending = {}
+        self.__deadlines = []  # Heap of (deadline, sequence number, _Pending), including completed ones
+        self.__sequence = itertools.count()
+        self.__resolved = 0
+        self.__expired = 0
+
+    def __len__(self):
+        return len(self.__pending)
+
+    def __contains__(self, mid):
+        return mid in self.__pending
+
+    @property
+    def resolved(self):
+        """
+        Number of requests completed by a reply.
+        """
+        return self.__resolved
+
+    @property
+    def expired(self):
+        """
+        Number of requests completed by their deadline.
+        """
+        return self.__expired
+
+    def register(self, request, timeout, callback=None):
+        """
+        Adds a request that has been, or is about to be, sent. The round trip time is counted from now.
+        @param request: A TIIPMessage with a mid
+        @param timeout: Seconds to wait for the reply
+        @param callback: Function called as callback(request, reply, roundTrip) when the request is completed
+        @raise: ValueError if request has no mid or a request with the same mid is in flight
+        @return: The deadline of the request, in seconds of the clock
+        """
+        return self.__add(request, timeout, callback, None).deadline
+
+    def registerFuture(self, request, timeout, loop=None):
+        """
+        Adds a request like register and returns a future for its reply. Cancelling the future removes the
+        request. The table must be expired for the future to time out, e.g. by running runExpiry.
+        @param loop: The event loop of the future, None for the running loop
+        @raise: ValueError, see register
+        @return: An asyncio.Future with the result (reply, roundTrip), or asyncio.TimeoutError
+        """
+        future = (loop or asyncio.get_running_loop()).create_future()
+        entry = self.__add(request, timeout, None, future)
+        future.add_done_callback(lambda done: self.__discard(entry) if done.cancelled() else None)
+        return future
+
+    async def request(self, request, timeout, send):
+        """
+        Registers request, sends it and waits for its reply.
+        @param send: Coroutine function sending a TIIPMessage, e.g. TIIPStreamWriter.send
+        @raise: asyncio.TimeoutError, ValueError
+        @return: A tuple of the reply and the round trip time in seconds
+        """
+        future = self.registerFuture(request, timeout)
+        try:
+            await send(request)
+        except BaseException:
+            future.cancel()
+            raise
+        return await future
+
+    def resolve(self, reply):
+        """
+        Completes the request with the same mid as reply, if it is in flight.
+        @param reply: A received TIIPMessage
+        @return: The round trip time in seconds, None if reply does not match a request in flight
+        """
+        entry = self.__pending.pop(reply.mid, None)
+        if entry is None:
+            return None
+        roundTrip = self.__clock() - entry.sentAt
+        self.__resolved += 1
+        self.__compact()
+        self.__complete(entry, reply, roundTrip)
+        return roundTrip
+
+    def cancel(self, mid):
+        """
+        Removes a request without completing it. Its callback is not called and its future is cancelled.
+        @return: True if a request with mid was in flight
+        """
+        entry = self.__pending.get(mid)
+        if entry is None:
+            return False
+        self.__discard(entry)
+        if entry.future is not None:
+            entry.future.cancel()
+        return True
+
+    def expire(self, now=None):
+        """
+        Completes the requests whose deadline has passed, as timed out.
+        @param now: The current time in seconds of the clock, None to read the clock
+        @return: The number of requests that timed out
+        """
+        if now is None:
+            now = self.__clock()
+        deadlines = self.__deadlines
+        pending = self.__pending
+        count = 0
+        while deadlines and deadlines[0][0] <= now:
+            entry = heapq.heappop(deadlines)[2]
+            if pending.get(entry.mid) is entry:
+                del pending[entry.mid]
+                count += 1
+                self.__complete(entry, None, None)
+        self.__expired += count
+        return count
+
+    def nextDeadline(self):
+        """
+        @return: The earliest deadline of the requests in flight, in seconds of the clock, or None
+        """
+        deadlines = self.__deadlines
+        while deadlines and self.__pending.get(deadlines[0][2].mid) is not deadlines[0][2]:
+            heapq.heappop(deadlines)
+        return deadlines[0][0] if deadlines else None
+
+    async def runExpiry(self, resolution=DEFAULT_RESOLUTION):
+        """
+        Coroutine expiring the table until it is cancelled. Timeouts are reported at most resolution seconds
+        late, when the event loop keeps up.
+        @param resolution: Longest sleep between expiries, in seconds
+        """
+        while True:
+            deadline = self.nextDeadline()
+            delay = resolution if deadline is None else min(resolution, max(0.0, deadline - self.__clock()))
+            await asyncio.sleep(delay)
+            self.expire()
+
+    def __add(self, request, timeout, callback, future):
+        mid = request.mid
+        if mid is None:
+            raise ValueError('request must have a mid')
+        if mid in self.__pending:
+            raise ValueError('a request with mid "' + str(mid) + '" is already in flight')
+        now = self.__clock()
+        entry = _Pending(mid, request, now, now + timeout, callback, future)
+        self.__pending[mid] = entry
+        heapq.heappush(self.__deadlines, (entry.deadline, next(self.__sequence), entry))
+        return entry
+
+    def __discard(self, entry):
+        if self.__pending.get(entry.mid) is entry:
+            del self.__pending[entry.mid]
+            self.__compact()
+
+    def __compact(self):
+        # Rebuilding is O(n) but done after at least n completions, so it is O(1) per completion
+        if len(self.__deadlines) > 2 * len(self.__pending) + _COMPACT_MIN:
+            pending = self.__pending
+            # In place, since expire may be iterating over the heap while a callback completes requests
+            self.__deadlines[:] = [item for item in self.__deadlines if pending.get(item[2].mid) is item[2]]
+            heapq.heapify(self.__deadlines)
+
+    def __complete(self, entry, reply, roundTrip):
+        if entry.future is not None:
+            if not entry.future.done():
+                if reply is None:
+                    entry.future.set_exception(asyncio.TimeoutError(
+                        'no reply to "' + str(entry.mid) + '" within the timeout'))
+                else:
+                    entry.future.set_result((reply, roundTrip))
+        elif entry.callback is not None:
+            entry.callback(entry.request, reply, roundTrip)
@@ -0,0 +1,372 @@
+"""
+Compact encoding of TIIP message streams, e.g. time series logged from a few sources, where consecutive
+messages mostly differ in ts and pl only.
+
+A stream is the magic bytes b'TD', a format version byte, a compression byte and the dictionary size as a 4
+byte big-endian unsigned integer, followed by length prefixed records, one per message, compressed as one
+stream if zlib or lzma compression is selected.
+A record holds a flags varint, ts and the payload. ts is stored as the signed difference in microseconds
+to the previous message (or as a string, if not canonical). The other keys are only stored when they differ
+from the previous message, as a reference into a per key dictionary of values seen before or as a literal
+value that is added to the dictionary. Values use the encoding of pytiip.binary.
+
+Resync records clear the dictionaries and the previous message, so decoding state never reaches back past
+them. zlib compression writes raw deflate data and is fully flushed before each resync record, so a decoder
+fed the 8 byte stream header and the data from a resync record on decodes the rest of the stream.
+Dictionaries hold at most the dictionary size values per key, in both the encoder and the decoder, so the
+memory of either is bounded even without resync records.
+"""
+
+import struct
+import zlib
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+from pytiip.binary import _writeLength, _readLength, _writeValue, _readValue
+from pytiip.tiip import TIIPMessage, PY3, _TS_PATTERN
+
+if PY3:
+    unicode = str
+
+MAGIC = b'TD'
+FORMAT_VERSION = 2
+COMPRESSIONS = (None, 'zlib', 'lzma')
+DEFAULT_RESYNC_INTERVAL = 1000  # Messages between resync records
+DEFAULT_DICTIONARY_SIZE = 4096  # Values remembered per key between resync records
+DEFAULT_CHUNK_SIZE = 1 << 16  # Bytes read from the file at a time
+
+# Keys stored only when changed, the order defines their bit in the record flags
+_KEYS = ('lat', 'mid', 'sid', 'type', 'src', 'targ', 'sig', 'ch', 'arg', 'ok', 'ten')
+_RESYNC = 1
+_TS_STR = 2
+_KEY_BITS = tuple((key, 4 << i) for i, key in enumerate(_KEYS))
+_HEADER = struct.Struct('>2sBBI')  # Magic, format version, compression, dictionary size
+
+# Value codes of changed keys, larger codes are dictionary references
+_ABSENT = 0
+_LITERAL = 1
+_REFERENCE = 2
+
+
+class DeltaEncoder(object):
+    """
+    Stateful encoder of a stream of TIIPMessages.
+    """
+
+    def __init__(self, compression=None, level=None, resyncInterval=DEFAULT_RESYNC_INTERVAL,
+                 dictionarySize=DEFAULT_DICTIONARY_SIZE):
+        """
+        @param compression: None, 'zlib' or 'lzma'
+        @param level: Compression level (zlib) or preset (lzma), None for the default
+        @param resyncInterval: Number of messages between resync records, None for only the first record
+        @param dictionarySize: Maximum number of values remembered per key between resync records, stored in
+            the stream header so that the decoder keeps no more
+        @raise: ValueError for an unknown or unavailable compression or an invalid dictionarySize
+        """
+        if not 0 <= dictionarySize < 1 << 32:
+            raise ValueError('dictionarySize must be within 0 and 2 ** 32 - 1')
+        self.__compressor = _compressor(compression, level)
+        self.__resyncInterval = resyncInterval
+        self.__dictionarySize = dictionarySize
+        self.__header = _HEADER.pack(MAGIC, FORMAT_VERSION, COMPRESSIONS.index(compression), dictionarySize)
+        self.__compression = compression
+        self.__sinceResync = None
+        self.__resyncPending = True
+        self.__closed = False
+
+    def resync(self):
+        """
+        Makes the next encoded message a resync record.
+        """
+        self.__resyncPending = True
+
+    def encode(self, tiipMsg):
+        """
+        @param tiipMsg: The next TIIPMessage of the stream
+        @raise: TypeError for values that can not be encoded, ValueError if the encoder is closed
+        @return: The next bytes of the stream, possibly empty when compressing
+        """
+        if self.__closed:
+            raise ValueError('encoder is closed')
+        out = []
+        if self.__header is not None:
+            out.append(self.__header)
+            self.__header = None
+        record, flushed = self.__record(tiipMsg)
+        if self.__compressor is None:
+            out.append(record)
+        else:
+            if flushed is not None:
+                out.append(flushed)
+            out.append(self.__compressor.compress(record))
+        return b''.join(out)
+
+    def flush(self):
+        """
+        Makes everything encoded so far decodable by the receiver. Only has an effect with zlib compression,
+        lzma output becomes available when the encoder is closed.
+        @return: The next bytes of the stream
+        """
+        if self.__compression == 'zlib' and not self.__closed:
+            return self.__compressor.flush(zlib.Z_SYNC_FLUSH)
+        return b''
+
+    def close(self):
+        """
+        Ends the stream, no messages can be encoded afterwards.
+        @return: The last bytes of the stream
+        """
+        if self.__closed:
+            return b''
+        self.__closed = True
+        out = b'' if self.__header is None else self.__header
+        self.__header = None
+        if self.__compressor is not None:
+            out += self.__compressor.flush()
+        return out
+
+    def __record(self, tiipMsg):
+        # A length prefixed record for tiipMsg and, when compressing, the output of flushing before it
+        flushed = None
+        if self.__resyncPending or (
+                self.__resyncInterval is not None and self.__sinceResync >= self.__resyncInterval):
+            if self.__sinceResync is not None and self.__compression == 'zlib':
+                flushed = self.__compressor.flush(zlib.Z_FULL_FLUSH)
+            self.__resyncPending = False
+            self.__sinceResync = 0
+            self.__micros = 0
+            self.__previous = dict((key, None) for key in _KEYS)
+            self.__dictionaries = dict((key, {}) for key in _KEYS)
+            flags = _RESYNC
+        else:
+            flags = 0
+        self.__sinceResync += 1
+
+        body = []
+        ts = tiipMsg.ts
+        if _TS_PATTERN.match(ts):
+            micros = tiipMsg.tsMicros
+            delta = micros - self.__micros
+            self.__micros = micros
+            _writeLength(body, delta * 2 if delta >= 0 else -delta * 2 - 1)
+        else:
+            flags |= _TS_STR
+            _writeValue(body, ts)
+        previous = self.__previous
+        for key, bit in _KEY_BITS:
+            value = getattr(tiipMsg, key)
+            token = _token(value)
+            if token == previous[key]:
+                continue
+            previous[key] = token
+            flags |= bit
+            if value is None:
+                _writeLength(body, _ABSENT)
+                continue
+            dictionary = self.__dictionaries[key]
+            index = dictionary.get(token)
+            if index is not None:
+                _writeLength(body, _REFERENCE + index)
+                continue
+            _writeLength(body, _LITERAL)
+            _writeValue(body, value)
+            if len(dictionary) < self.__dictionarySize:
+                dictionary[token] = len(dictionary)
+        _writeValue(body, tiipMsg.pl)
+
+        out = []
+        _writeLength(out, flags)
+        out.extend(body)
+        record = b''.join(out)
+        out = []
+        _writeLength(out, len(record))
+        out.append(record)
+        return b''.join(out), flushed
+
+
+class DeltaDecoder(object):
+    """
+    Stateful decoder of a stream written by DeltaEncoder. Data may be fed in pieces of any size.
+    """
+
+    def __init__(self, trusted=False):
+        """
+        @param trusted: True to create the messages without type and value checks, see
+            TIIPMessage.loadFromDict
+        """
+        self.__trusted = trusted
+        self.__header = b''
+        self.__decompressor = None
+        self.__buffer = b''
+        self.__micros = 0
+        self.__previous = None
+        self.__dictionaries = None
+        self.__dictionarySize = None
+
+    def feed(self, data):
+        """
+        @param data: The next bytes of the stream
+        @raise: ValueError for data that is not a valid stream, TypeError, ValueError for invalid messages
+        @return: A list of the TIIPMessages completed by data
+        """
+        if self.__header is not None:
+            data = self.__header + bytes(data)
+            if len(data) < _HEADER.size:
+                self.__header = data
+                return []
+            self.__readHeader(data[:_HEADER.size])
+            data = data[_HEADER.size:]
+        if self.__decompressor is not None:
+            data = self.__decompressor.decompress(data)
+        buf = self.__buffer + data if self.__buffer else bytes(data)
+        messages = []
+        pos = 0
+        end = len(buf)
+        while pos < end:
+            try:
+                length, start = _readLength(buf, pos)
+            except IndexError:
+                break
+            if start + length > end:
+                break
+            messages.append(self.__decodeRecord(buf, start, start + length))
+            pos = start + length
+        self.__buffer = buf[pos:]
+        return messages
+
+    def close(self):
+        """
+        @raise: ValueError if the stream ended within a record
+        """
+        if self.__buffer or self.__header:
+            raise ValueError('truncated delta tiip stream')
+
+    def __readHeader(self, header):
+        magic, version, compression, dictionarySize = _HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError('not a delta tiip stream')
+        if version != FORMAT_VERSION:
+            raise ValueError('unsupported delta tiip format version')
+        if compression >= len(COMPRESSIONS):
+            raise ValueError('unknown delta tiip compression ' + str(compression))
+        if COMPRESSIONS[compression] == 'zlib':
+            self.__decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        elif COMPRESSIONS[compression] == 'lzma':
+            if lzma is None:
+                raise ValueError('lzma compression is not available')
+            self.__decompressor = lzma.LZMADecompressor()
+        self.__dictionarySize = dictionarySize
+        self.__header = None
+
+    def __decodeRecord(self, data, pos, end):
+        try:
+            flags, pos = _readLength(data, pos)
+            if flags & _RESYNC:
+                self.__micros = 0
+                self.__previous = dict((key, None) for key in _KEYS)
+                self.__dictionaries = dict((key, []) for key in _KEYS)
+            elif self.__previous is None:
+                raise ValueError('delta tiip stream does not start with a resync record')
+            if flags & _TS_STR:
+                ts, pos = _readValue(data, pos)
+                tiipDict = {'ts': ts}
+            else:
+                zigzag, pos = _readLength(data, pos)
+                self.__micros += zigzag >> 1 if not zigzag & 1 else -((zigzag + 1) >> 1)
+                tiipDict = {}
+            previous = self.__previous
+            for key, bit in _KEY_BITS:
+                if flags & bit:
+                    code, pos = _readLength(data, pos)
+                    if code == _ABSENT:
+                        previous[key] = None
+                    elif code == _LITERAL:
+                        start = pos
+                        value, pos = _readValue(data, pos)
+                        entry = (value, None if isinstance(value, (str, unicode)) else data[start:pos])
+                        previous[key] = entry
+                        dictionary = self.__dictionaries[key]
+                        if len(dictionary) < self.__dictionarySize:
+                            dictionary.append(entry)
+                    else:
+                        previous[key] = self.__dictionaries[key][code - _REFERENCE]
+                entry = previous[key]
+                if entry is not None:
+                    # Values other than strings are decoded again, so that messages never share them
+                    tiipDict[key] = entry[0] if entry[1] is None else _readValue(entry[1], 0)[0]
+            pl, pos = _readValue(data, pos)
+        except (struct.error, IndexError):
+            raise ValueError('corrupt delta tiip record')
+        if pos != end:
+            raise ValueError('corrupt delta tiip record')
+        if pl is not None:
+            tiipDict['pl'] = pl
+        tiipMsg = TIIPMessage(tiipDict=tiipDict, verifyVersion=False, trusted=self.__trusted)
+        if not flags & _TS_STR:
+            tiipMsg.tsMicros = self.__micros
+        return tiipMsg
+
+
+def writeMessages(fileobj, tiipMsgs, compression=None, level=None, resyncInterval=DEFAULT_RESYNC_INTERVAL,
+                  dictionarySize=DEFAULT_DICTIONARY_SIZE):
+    """
+    Writes TIIPMessages to a binary file-like object as one delta encoded stream.
+    @param fileobj: A binary file-like object opened for writing
+    @param tiipMsgs: An iterable of TIIPMessages
+    @param compression: None, 'zlib' or 'lzma', see DeltaEncoder
+    @param level: Compression level, see DeltaEncoder
+    @param resyncInterval: Number of messages between resync records, see DeltaEncoder
+    @param dictionarySize: Maximum number of values remembered per key, see DeltaEncoder
+    @return: The number of messages written
+    """
+    encoder = DeltaEncoder(compression, level, resyncInterval, dictionarySize)
+    count = 0
+    for tiipMsg in tiipMsgs:
+        data = encoder.encode(tiipMsg)
+        if data:
+            fileobj.write(data)
+        count += 1
+    fileobj.write(encoder.close())
+    return count
+
+
+def readMessages(fileobj, chunkSize=DEFAULT_CHUNK_SIZE, trusted=False):
+    """
+    Generator yielding the TIIPMessages of a delta encoded stream read from a binary file-like object.
+    @param fileobj: A binary file-like object opened for reading
+    @param chunkSize: Number of bytes to read at a time
+    @param trusted: True to skip type and value checks, see DeltaDecoder
+    @raise: TypeError, ValueError
+    """
+    decoder = DeltaDecoder(trusted)
+    while True:
+        chunk = fileobj.read(chunkSize)
+        if not chunk:
+            break
+        for tiipMsg in decoder.feed(chunk):
+            yield tiipMsg
+    decoder.close()
+
+
+def _compressor(compression, level):
+    if compression is None:
+        return None
+    if compression == 'zlib':
+        return zlib.compressobj(-1 if level is None else level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    if compression == 'lzma':
+        if lzma is None:
+            raise ValueError('lzma compression is not available')
+        return lzma.LZMACompressor(preset=level)
+    raise ValueError('Unknown compression "' + str(compression) + '"')
+
+
+def _token(value):
+    # A hashable key identifying value by type and content
+    if value is None or isinstance(value, (str, unicode)):
+        return value
+    out = []
+    _writeValue(out, value)
+    return b''.join(out)
@@ -0,0 +1,263 @@
+"""
+Opt-in instrumentation of TIIPMessage decoding, encoding, validation and version conversion.
+
+    sink = MemorySink()
+    enable(sink)
+    ...
+    print(sink.toPrometheus())
+    disable()
+
+enable() wraps the relevant TIIPMessage methods and property setters and disable() restores the originals,
+so nothing is measured, and nothing costs anything, while instrumentation is disabled.
+
+Recorded metrics, all timings in seconds:
+    decode_seconds: loadFromStr and decodeMany calls, json decoding included, and the decoding of a
+        LazyTIIPMessage when its first key is read. Keys that a LazyTIIPMessage with headerKeys decodes one by
+        one later on are not recorded.
+    decoded_messages_total: messages decoded by those calls
+    load_dict_seconds: loadFromDict calls, i.e. version conversion and all field setters without json
+    validate_ts_seconds: the ts setter, i.e. timestamp validation
+    validation_failures_total{key}: setters raising TypeError or ValueError, per key
+    encode_seconds{format}: toStr and toBytes calls, of LazyTIIPMessages too, cache hits included
+    convert_seconds{version}: asVersion calls
+    version_conversion_seconds{to}: conversions of dicts between tiip.2.0 and tiip.3.0, including those of
+        pytiip.convert
+"""
+
+import threading
+import time
+
+from pytiip import convert, tiip
+from pytiip.lazy import LazyTIIPMessage
+from pytiip.tiip import TIIPMessage
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 1e-2, 1e-1, 1.0)
+
+_KEYS = ('ts', 'lat', 'mid', 'sid', 'type', 'src', 'targ', 'sig', 'ch', 'arg', 'pl', 'ok', 'ten')
+
+_originals = None
+_sink = None
+
+
+class MemorySink(object):
+    """
+    Keeps counters and histograms in memory. Thread-safe.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        """
+        @param buckets: Ascending histogram bucket upper bounds in seconds
+        """
+        self.__buckets = tuple(buckets)
+        self.__lock = threading.Lock()
+        self.__counters = {}
+        self.__histograms = {}
+
+    def count(self, name, value=1, labels=None):
+        key = (name, _labelKey(labels))
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def observe(self, name, seconds, labels=None):
+        key = (name, _labelKey(labels))
+        with self.__lock:
+            histogram = self.__histograms.get(key)
+            if histogram is None:
+                histogram = self.__histograms[key] = [0, 0.0, [0] * len(self.__buckets)]
+            histogram[0] += 1
+            histogram[1] += seconds
+            for i, bound in enumerate(self.__buckets):
+                if seconds <= bound:
+                    histogram[2][i] += 1
+                    break
+
+    def snapshot(self):
+        """
+        @return: A dict with 'counters', mapping (name, labels) to a value, and 'histograms', mapping
+            (name, labels) to a dict with count, sum and the non-cumulative count per bucket upper bound.
+            labels is a sorted tuple of (label, value) pairs.
+        """
+        with self.__lock:
+            return {
+                'counters': dict(self.__counters),
+                'histograms': dict(
+                    (key, {'count': count, 'sum': total, 'buckets': list(zip(self.__buckets, buckets))})
+                    for key, (count, total, buckets) in self.__histograms.items())
+            }
+
+    def reset(self):
+        with self.__lock:
+            self.__counters.clear()
+            self.__histograms.clear()
+
+    def toPrometheus(self, prefix='pytiip'):
+        """
+        @param prefix: Prefix of every metric name
+        @return: All metrics in the Prometheus text exposition format
+        """
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+        for (name, labels), value in sorted(snapshot['counters'].items()):
+            name = prefix + '_' + name
+            if name not in typed:
+                typed.add(name)
+                lines.append('# TYPE ' + name + ' counter')
+            lines.append(name + _formatLabels(labels) + ' ' + repr(value))
+        for (name, labels), histogram in sorted(snapshot['histograms'].items()):
+            name = prefix + '_' + name
+            if name not in typed:
+                typed.add(name)
+                lines.append('# TYPE ' + name + ' histogram')
+            cumulative = 0
+            for bound, count in histogram['buckets']:
+                cumulative += count
+                lines.append(name + '_bucket' + _formatLabels(labels + (('le', repr(bound)),)) + ' ' + str(cumulative))
+            lines.append(name + '_bucket' + _formatLabels(labels + (('le', '+Inf'),)) + ' ' + str(histogram['count']))
+            lines.append(name + '_sum' + _formatLabels(labels) + ' ' + repr(histogram['sum']))
+            lines.append(name + '_count' + _formatLabels(labels) + ' ' + str(histogram['count']))
+        return ''.join(line + '\n' for line in lines)
+
+
+class CallbackSink(object):
+    """
+    Forwards every measurement to functions, e.g. to feed an existing metrics client.
+    """
+
+    def __init__(self, onCount=None, onObserve=None):
+        """
+        @param onCount: Function(name, value, labels) called for counters
+        @param onObserve: Function(name, seconds, labels) called for timings
+        """
+        self.__onCount = onCount
+        self.__onObserve = onObserve
+
+    def count(self, name, value=1, labels=None):
+        if self.__onCount is not None:
+            self.__onCount(name, value, labels)
+
+    def observe(self, name, seconds, labels=None):
+        if self.__onObserve is not None:
+            self.__onObserve(name, seconds, labels)
+
+
+def enable(sink):
+    """
+    Starts recording metrics to sink, replacing any sink enabled before.
+    @param sink: A MemorySink, CallbackSink or any object with count(name, value, labels) and
+        observe(name, seconds, labels) methods
+    """
+    global _originals, _sink
+    disable()
+    _originals = []
+    _sink = sink
+
+    _patch(TIIPMessage, 'loadFromStr', _timed(TIIPMessage.loadFromStr, 'decode_seconds', messages=1))
+    decodeMany = TIIPMessage.__dict__['decodeMany'].__func__
+    _patch(TIIPMessage, 'decodeMany', classmethod(_timed(decodeMany, 'decode_seconds', messages=len)))
+    _patch(TIIPMessage, 'loadFromDict', _timed(TIIPMessage.loadFromDict, 'load_dict_seconds'))
+    # LazyTIIPMessage.toStr and toBytes may call those of TIIPMessage, which then must not record the call again
+    _patch(TIIPMessage, 'toStr', _timed(
+        TIIPMessage.toStr, 'encode_seconds', {'format': 'str'}, exclude=LazyTIIPMessage))
+    _patch(TIIPMessage, 'toBytes', _timed(
+        TIIPMessage.toBytes, 'encode_seconds', {'format': 'bytes'}, exclude=LazyTIIPMessage))
+    _patch(TIIPMessage, 'asVersion', _timedAsVersion(TIIPMessage.asVersion))
+    _patch(LazyTIIPMessage, '_decode', _timed(LazyTIIPMessage._decode, 'decode_seconds', messages=1))
+    _patch(LazyTIIPMessage, 'toStr', _timed(LazyTIIPMessage.toStr, 'encode_seconds', {'format': 'str'}))
+    _patch(LazyTIIPMessage, 'toBytes', _timed(LazyTIIPMessage.toBytes, 'encode_seconds', {'format': 'bytes'}))
+    fromVersion2 = _timed(tiip._fromVersion2, 'version_conversion_seconds', {'to': tiip.__version__})
+    toVersion2 = _timed(tiip._toVersion2, 'version_conversion_seconds', {'to': 'tiip.2.0'})
+    for module in (tiip, convert):  # convert imports the functions themselves
+        _patch(module, '_fromVersion2', fromVersion2)
+        _patch(module, '_toVersion2', toVersion2)
+    for key in _KEYS:
+        prop = TIIPMessage.__dict__[key]
+        _patch(TIIPMessage, key, property(prop.fget, _checkedSetter(prop.fset, key), prop.fdel, prop.__doc__))
+
+
+def disable():
+    """
+    Stops recording metrics and restores the uninstrumented methods.
+    """
+    global _originals, _sink
+    if _originals is not None:
+        for owner, name, original in reversed(_originals):
+            setattr(owner, name, original)
+    _originals = None
+    _sink = None
+
+
+def isEnabled():
+    return _originals is not None
+
+
+def _patch(owner, name, replacement):
+    _originals.append((owner, name, owner.__dict__[name]))
+    setattr(owner, name, replacement)
+
+
+def _timed(func, name, labels=None, messages=None, exclude=None):
+    # exclude: a class whose instances are passed through to func unrecorded
+    sink = _sink
+    perfCounter = time.perf_counter
+
+    def wrapper(*args, **kwargs):
+        if exclude is not None and isinstance(args[0], exclude):
+            return func(*args, **kwargs)
+        start = perfCounter()
+        result = func(*args, **kwargs)
+        sink.observe(name, perfCounter() - start, labels)
+        if messages == 1:
+            sink.count('decoded_messages_total', 1)
+        elif messages is not None:
+            sink.count('decoded_messages_total', messages(result))
+        return result
+
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+def _timedAsVersion(func):
+    sink = _sink
+    perfCounter = time.perf_counter
+
+    def asVersion(self, version, *args, **kwargs):
+        start = perfCounter()
+        result = func(self, version, *args, **kwargs)
+        sink.observe('convert_seconds', perfCounter() - start, {'version': version})
+        return result
+
+    asVersion.__doc__ = func.__doc__
+    return asVersion
+
+
+def _checkedSetter(fset, key):
+    sink = _sink
+    perfCounter = time.perf_counter
+    labels = {'key': key}
+
+    def setter(self, value):
+        start = perfCounter()
+        try:
+            fset(self, value)
+        except (TypeError, ValueError):
+            sink.count('validation_failures_total', 1, labels)
+            raise
+        finally:
+            if key == 'ts':
+                sink.observe('validate_ts_seconds', perfCounter() - start)
+
+    return setter
+
+
+def _labelKey(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _formatLabels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join('%s="%s"' % (label, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for label, value in labels) + '}'
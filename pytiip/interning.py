@@ -0,0 +1,102 @@
+"""
+Bounded pool of strings used to deduplicate repeated header values of decoded TIIP messages.
+"""
+
+import sys
+import threading
+
+from collections import OrderedDict
+
+if sys.version_info > (3,):
+    unicode = str
+else:
+    # noinspection PyShadowingBuiltins
+    bytes = str
+
+DEFAULT_MAX_SIZE = 4096
+
+
+class InternPool(object):
+    """
+    A thread-safe pool of strings. intern() returns the pooled equal string if there is one, so equal values
+    share a single object. When the pool is full the least recently used string is evicted.
+    """
+
+    def __init__(self, maxSize=DEFAULT_MAX_SIZE):
+        """
+        @param maxSize: Maximum number of pooled strings
+        @raise: ValueError
+        """
+        if maxSize < 1:
+            raise ValueError('maxSize must be at least 1')
+        self.__maxSize = maxSize
+        self.__strings = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__bytesSaved = 0
+
+    def __len__(self):
+        return len(self.__strings)
+
+    def intern(self, value):
+        """
+        @param value: A unicode, str or bytes value, other values are returned unchanged
+        @return: The pooled value equal to value
+        """
+        if not isinstance(value, (str, unicode, bytes)):
+            return value
+        with self.__lock:
+            pooled = self.__strings.get(value)
+            if pooled is not None:
+                self.__strings.move_to_end(value)
+                self.__hits += 1
+                if pooled is not value:
+                    self.__bytesSaved += sys.getsizeof(value)
+                return pooled
+            self.__misses += 1
+            self.__strings[value] = value
+            if len(self.__strings) > self.__maxSize:
+                self.__strings.popitem(last=False)
+                self.__evictions += 1
+            return value
+
+    def internList(self, values):
+        """
+        @param values: A list of values
+        @return: A new list with every value interned
+        """
+        return [self.intern(value) for value in values]
+
+    @property
+    def hitRate(self):
+        """
+        The fraction of intern() calls that returned a pooled string, 0.0 before the first call.
+        """
+        lookups = self.__hits + self.__misses
+        return self.__hits / float(lookups) if lookups else 0.0
+
+    def stats(self):
+        """
+        @return: A dict with size, maxSize, hits, misses, evictions, hitRate and bytesSaved, the total size of
+            the duplicate strings that were replaced by pooled ones
+        """
+        with self.__lock:
+            return {
+                'size': len(self.__strings),
+                'maxSize': self.__maxSize,
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'evictions': self.__evictions,
+                'hitRate': self.hitRate,
+                'bytesSaved': self.__bytesSaved
+            }
+
+    def clear(self):
+        """
+        Empties the pool and resets the statistics.
+        """
+        with self.__lock:
+            self.__strings.clear()
+            self.__hits = self.__misses = self.__evictions = self.__bytesSaved = 0
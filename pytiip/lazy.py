@@ -0,0 +1,362 @@
+"""
+Lazily decoded TIIP messages for routing and pass-through forwarding.
+"""
+
+import re
+
+from pytiip.tiip import TIIPMessage, __version__, PY3, getJSONBackend, _encodeArray
+
+_KEYS = ('ts', 'lat', 'mid', 'sid', 'type', 'src', 'targ', 'sig', 'ch', 'arg', 'pl', 'ok', 'ten')
+
+# The keys a router typically needs, see LazyTIIPMessage
+ROUTING_KEYS = ('type', 'sig', 'ch', 'targ', 'mid')
+# Strings shorter than this are decoded whole even with headerKeys, since scanning costs about 30 us
+HEADER_KEYS_MIN_SIZE = 8192
+
+
+def _scanPatterns(pattern):
+    # The same pattern compiled for unicode/str and for bytes
+    return re.compile(pattern), re.compile(pattern.encode('ascii'))
+
+
+_WS = r'[ \t\n\r]*'
+_STR = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+# A key and its value if it is a string or a scalar, including the following separator, or the first
+# character of a nested value
+_MEMBER = _scanPatterns(
+    _WS + '(' + _STR + ')' + _WS + ':' + _WS + r'(?:(' + _STR + r'|[^,}\]\[{ \t\n\r"]+)' + _WS + r'([,}])|([\[{]))')
+_OPEN = _scanPatterns(_WS + r'\{' + _WS + r'(\})?')
+_SEPARATOR = _scanPatterns(_WS + r'([,}])')
+# Everything up to and including the next bracket that is not within a string
+_BRACKET = _scanPatterns(r'[^"\[\]{}]*(?:' + _STR + r'[^"\[\]{}]*)*([\[\]{}])')
+_OPENING = frozenset('[{') | frozenset(b'[{')
+# Per opening bracket: the characters that make a value nested and the closing bracket
+_BRACKETS = ({'[': ('"', '[', '{', ']'), '{': ('"', '[', '{', '}')},
+             {b'[': (b'"', b'[', b'{', b']'), b'{': (b'"', b'[', b'{', b'}')})
+
+
+def scanTopLevel(tiipStr):
+    """
+    Finds where the values of the top level keys of a json object are, without decoding them. Strings and
+    nested values are skipped with regular expressions, so the cost hardly depends on the size of the values.
+    Values are not validated, only their extent is determined.
+    @param tiipStr: A json object as unicode/str or bytes
+    @raise: ValueError if tiipStr is not a json object
+    @return: A dict of key: (start, end), where tiipStr[start:end] is the json text of the value of key
+    """
+    isBytes = isinstance(tiipStr, (bytes, bytearray))
+    member, separator = _MEMBER[isBytes], _SEPARATOR[isBytes]
+    match = _OPEN[isBytes].match(tiipStr)
+    if match is None:
+        raise ValueError('tiip message must be a json object')
+    spans = {}
+    if match.group(1) is not None:
+        return spans
+    pos = match.end()
+    while True:
+        match = member.match(tiipStr, pos)
+        if match is None:
+            raise ValueError('invalid json object member at ' + str(pos))
+        key, value, end, nested = match.groups()
+        key = key[1:-1].decode('utf-8') if isBytes else key[1:-1]
+        if '\\' in key:
+            key = getJSONBackend('json').loads('"' + key + '"')
+        if nested is None:
+            spans[key] = match.span(2)
+            pos = match.end()
+        else:
+            start = match.start(4)
+            pos = _nestedEnd(tiipStr, start, isBytes)
+            spans[key] = (start, pos)
+            match = separator.match(tiipStr, pos)
+            if match is None:
+                raise ValueError('expected "," or "}" at ' + str(pos))
+            end = match.group(1)
+            pos = match.end()
+        if end in ('}', b'}'):
+            return spans
+
+
+def _nestedEnd(tiipStr, start, isBytes):
+    # The end of the array or object starting at start
+    quote, arrayOpening, objectOpening, closing = _BRACKETS[isBytes][tiipStr[start:start + 1]]
+    end = tiipStr.find(closing, start + 1)
+    if (end >= 0 and tiipStr.find(quote, start + 1, end) < 0 and tiipStr.find(arrayOpening, start + 1, end) < 0 and
+            tiipStr.find(objectOpening, start + 1, end) < 0):
+        return end + 1  # Flat, e.g. an array of numbers
+    depth = 1
+    for match in iter(_BRACKET[isBytes].scanner(tiipStr, start + 1).match, None):
+        depth += 1 if tiipStr[match.end() - 1] in _OPENING else -1
+        if not depth:
+            return match.end()
+    raise ValueError('unterminated json value at ' + str(start))
+
+
+def _lazyProperty(key):
+    def fget(self):
+        if self._pending is None:
+            self._decode()
+        if key in self._pending:
+            getattr(TIIPMessage, key).fset(self, self._pending.pop(key))
+        elif self._slices and key in self._slices:
+            getattr(TIIPMessage, key).fset(self, self._loadSlice(key))
+        return getattr(TIIPMessage, key).fget(self)
+
+    def fset(self, value):
+        if self._pending is None:
+            self._decode()
+        self._pending.pop(key, None)
+        if self._slices:
+            self._slices.pop(key, None)
+        self._modified = True
+        getattr(TIIPMessage, key).fset(self, value)
+
+    return property(fget, fset)
+
+
+def _derivedProperty(name):
+    # A property of TIIPMessage computed from ts
+    def fget(self):
+        self.ts
+        return getattr(TIIPMessage, name).fget(self)
+
+    def fset(self, value):
+        if self._pending is None:
+            self._decode()
+        self._pending.pop('ts', None)
+        if self._slices:
+            self._slices.pop('ts', None)
+        self._modified = True
+        getattr(TIIPMessage, name).fset(self, value)
+
+    return property(fget, fset)
+
+
+class LazyTIIPMessage(TIIPMessage):
+    """
+    A TIIPMessage that keeps the string it was created from and defers all decoding until a key is read.
+    Each key is validated the first time it is read and str() returns the original string as long as
+    nothing has been modified. The string is decoded before it is returned, so that its protocol version is
+    verified, or an older version converted, as when a key is read.
+
+    With headerKeys, only the top level of the string is scanned (see scanTopLevel), and only pv and the
+    header keys are decoded when the first key is read. All other keys are kept as slices of the original
+    string and decoded one by one when read. Keys that are still undecoded when a modified message is
+    encoded are copied verbatim from the original string, so forwarding a message with e.g. a changed targ
+    never decodes or encodes its pl and arg.
+
+    The scan is pure Python and costs about 30 us whatever the size of the string, against about 5 us for
+    fully decoding a typical 300 byte message. Strings shorter than HEADER_KEYS_MIN_SIZE are therefore
+    decoded whole, with or without headerKeys; bench/partial_bench.py shows the crossover, which is at
+    about 8 KB.
+    """
+    __slots__ = ('_raw', '_verifyVersion', '_backend', '_headerKeys', '_pending', '_spans', '_slices', '_modified')
+
+    def __init__(self, tiipStr=None, verifyVersion=True, backend=None, headerKeys=None):
+        """
+        @param tiipStr: A string or bytes representation of a TIIPMessage. A bytearray or memoryview is copied to
+            bytes, since the message keeps it to re-emit it. None for an empty message, as TIIPMessage().
+        @param verifyVersion: True to verify that tiipStr has the right protocol
+        @param backend: Name of the json backend to decode with, None for the one selected with setJSONBackend
+        @param headerKeys: None to decode the whole string when the first key is read, or the keys to decode
+            then, e.g. ROUTING_KEYS
+        Decoding errors, including an incorrect protocol version, are raised when the first key is accessed
+        or the message is encoded.
+        """
+        TIIPMessage.__init__(self)
+        if isinstance(tiipStr, memoryview):
+            tiipStr = tiipStr.tobytes()
+        elif isinstance(tiipStr, bytearray):
+            tiipStr = bytes(tiipStr)
+        self._raw = tiipStr
+        self._verifyVersion = verifyVersion
+        self._backend = backend
+        self._headerKeys = headerKeys
+        self._pending = None if tiipStr is not None else {}  # Decoded but not yet validated values, None until decoded
+        self._spans = None  # Positions of the top level values in _raw, None until scanned
+        self._slices = None  # Positions of the values not decoded yet, only with headerKeys
+        self._modified = tiipStr is None
+
+    def reset(self):
+        TIIPMessage.reset(self)
+        self._raw = None
+        self._pending = {}
+        self._spans = None
+        self._slices = None
+        self._modified = True
+
+    def reload(self, tiipStr=None, tiipDict=None, verifyVersion=True, backend=None, trusted=False, headerKeys=None):
+        """
+        Replaces the contents of this message with the lazily decoded tiipStr, see __init__, and/or the keys of
+        tiipDict, like TIIPMessage.reload. tiipStr is decoded right away if tiipDict is given too.
+        @param trusted: True to load tiipDict without type and value checks, see TIIPMessage.loadFromDict. The
+            keys of tiipStr are always checked when they are read.
+        @raise: TypeError, ValueError when loading tiipDict
+        @return: This LazyTIIPMessage
+        """
+        LazyTIIPMessage.__init__(self, tiipStr, verifyVersion, backend, headerKeys)
+        if tiipDict is not None:
+            if self._pending is None:
+                self._materialize()
+            self._modified = True
+            TIIPMessage.loadFromDict(self, tiipDict, verifyVersion, trusted)
+        return self
+
+    def toStr(self, backend=None):
+        if self._pending is None:
+            self._decode()  # Raises for an incorrect version, or converts and sets _modified
+        if self._modified:
+            if self._slices:
+                return self._spliced(backend)
+            return TIIPMessage.toStr(self, backend)
+        if isinstance(self._raw, bytes) and PY3:
+            return self._raw.decode('utf-8')
+        return self._raw
+
+    def toBytes(self, backend=None):
+        if self._pending is None:
+            self._decode()
+        if self._modified:
+            if self._slices:
+                return self._spliced(backend).encode('utf-8')
+            return TIIPMessage.toBytes(self, backend)
+        if isinstance(self._raw, bytes) and PY3:
+            return self._raw
+        return self._raw.encode('utf-8')
+
+    def __iter__(self):
+        self._materialize()
+        return TIIPMessage.__iter__(self)
+
+    def validate(self):
+        """
+        Runs the checks of every key like TIIPMessage.validate, without marking the message as modified, so
+        that str() still returns the original string.
+        @raise: TypeError, ValueError
+        @return: None
+        """
+        modified = self._modified
+        try:
+            TIIPMessage.validate(self)
+        finally:
+            self._modified = modified
+
+    @property
+    def raw(self):
+        """
+        The string or bytes this message was created from, untouched.
+        """
+        return self._raw
+
+    @property
+    def modified(self):
+        """
+        True if any key has been set since this message was created.
+        """
+        return self._modified
+
+    def rawField(self, key):
+        """
+        @param key: A top level key
+        @raise: ValueError if the original string is not a json object
+        @return: The json text of the value of key in the original string, as unicode/str or bytes like raw,
+            or None if the key is missing. Setting a key does not change what is returned.
+        """
+        if self._raw is None:
+            return None
+        if self._spans is None:
+            self._spans = scanTopLevel(self._raw)
+        span = self._spans.get(key)
+        if span is None:
+            return None
+        return self._raw[span[0]:span[1]]
+
+    def _decode(self):
+        if self._headerKeys is not None and len(self._raw) >= HEADER_KEYS_MIN_SIZE:
+            if self._spans is None:
+                self._spans = scanTopLevel(self._raw)
+            pv = self._loadSpan('pv') if 'pv' in self._spans else None
+            if pv == __version__:
+                self._decodeHeader()
+                return
+            if self._verifyVersion:
+                raise ValueError('Incorrect tiip version "' + str(pv) + '" expected "' + __version__ + '"')
+        tiipDict = getJSONBackend(self._backend).loads(self._raw)
+        if not isinstance(tiipDict, dict):
+            raise TypeError('tiip message must be a json object')
+        if self._verifyVersion:
+            if 'pv' not in tiipDict or tiipDict['pv'] != __version__:
+                raise ValueError('Incorrect tiip version "' + str(tiipDict.get('pv')) + '" expected "' + __version__ + '"')
+        if tiipDict.get('pv') != __version__:
+            # Older protocol versions are converted eagerly and can not be forwarded verbatim
+            self._pending = {}
+            self._modified = True
+            TIIPMessage.loadFromDict(self, tiipDict, False)
+        else:
+            tiipDict.pop('pv', None)
+            self._pending = tiipDict
+
+    def _decodeHeader(self):
+        # Decodes the header keys with one json call and keeps the other keys as slices
+        raw = self._raw
+        spans = self._spans
+        header = [key for key in self._headerKeys if key in spans]
+        self._slices = dict((key, spans[key]) for key in _KEYS if key in spans and key not in header)
+        if not header:
+            self._pending = {}
+        elif isinstance(raw, bytes):
+            parts = [b'"' + key.encode('utf-8') + b'":' + raw[spans[key][0]:spans[key][1]] for key in header]
+            self._pending = getJSONBackend(self._backend).loads(b'{' + b','.join(parts) + b'}')
+        else:
+            parts = ['"' + key + '":' + raw[spans[key][0]:spans[key][1]] for key in header]
+            self._pending = getJSONBackend(self._backend).loads('{' + ','.join(parts) + '}')
+
+    def _loadSpan(self, key):
+        start, end = self._spans[key]
+        return getJSONBackend(self._backend).loads(self._raw[start:end])
+
+    def _loadSlice(self, key):
+        del self._slices[key]
+        return self._loadSpan(key)
+
+    def _materialize(self):
+        if self._pending is None:
+            self._decode()
+        for key in _KEYS:
+            if key in self._pending:
+                getattr(TIIPMessage, key).fset(self, self._pending.pop(key))
+            elif self._slices and key in self._slices:
+                getattr(TIIPMessage, key).fset(self, self._loadSlice(key))
+
+    def _spliced(self, backend):
+        # The json representation with the decoded keys encoded and the undecoded ones copied from _raw
+        for key in _KEYS:
+            if key in self._pending:
+                getattr(TIIPMessage, key).fset(self, self._pending.pop(key))
+        tiipDict = dict((key, value) for key, value in TIIPMessage.__iter__(self) if key not in self._slices)
+        if 'pl' in tiipDict and not isinstance(tiipDict['pl'], list):
+            tiipDict['pl'] = _encodeArray(tiipDict['pl'])
+        parts = [getJSONBackend(backend).dumps(tiipDict)[:-1]]
+        for key, (start, end) in self._slices.items():
+            value = self._raw[start:end]
+            if isinstance(value, bytes) and PY3:
+                value = value.decode('utf-8')
+            parts.append(',"' + key + '":' + value)
+        parts.append('}')
+        return ''.join(parts)
+
+    ts = _lazyProperty('ts')
+    lat = _lazyProperty('lat')
+    mid = _lazyProperty('mid')
+    sid = _lazyProperty('sid')
+    type = _lazyProperty('type')
+    src = _lazyProperty('src')
+    targ = _lazyProperty('targ')
+    sig = _lazyProperty('sig')
+    ch = _lazyProperty('ch')
+    arg = _lazyProperty('arg')
+    pl = _lazyProperty('pl')
+    ok = _lazyProperty('ok')
+    ten = _lazyProperty('ten')
+    tsMicros = _derivedProperty('tsMicros')
+    tsDatetime = _derivedProperty('tsDatetime')
@@ -0,0 +1,127 @@
+"""
+Streaming reader and writer for newline delimited TIIP logs (one json encoded TIIPMessage per line).
+"""
+
+from pytiip.tiip import TIIPMessage
+
+DEFAULT_CHUNK_SIZE = 1 << 16  # Bytes read from the file at a time
+DEFAULT_BUFFER_SIZE = 1 << 16  # Bytes collected before writing to the file
+
+
+def readMessages(fileobj, verifyVersion=True, chunkSize=DEFAULT_CHUNK_SIZE, errors=None, backend=None, pool=None):
+    """
+    Generator yielding TIIPMessages from a binary file-like object with one message per line.
+    Memory use is bounded by the chunk size and the longest line, blank lines are skipped.
+    @param fileobj: A binary file-like object opened for reading
+    @param verifyVersion: True to verify that every message has the right protocol
+    @param chunkSize: Number of bytes to read at a time
+    @param errors: An optional list, see TIIPMessage.decodeMany. Indexes are line numbers counted from 0
+        among the non-blank lines.
+    @param backend: Name of the json backend to use, None for the one selected with setJSONBackend
+    @param pool: An optional pytiip.pool.MessagePool to take the messages from, see TIIPMessage.decodeMany.
+        Messages are taken from the pool a chunk at a time, so the pool should hold at least as many
+        messages as a chunk contains lines.
+    @raise: TypeError, ValueError
+    """
+    index = 0
+    for lines in readLineBlocks(fileobj, chunkSize):
+        for tiipMsg in _decodeLines(lines, index, verifyVersion, errors, backend, pool):
+            yield tiipMsg
+        index += len(lines)
+
+
+def readLineBlocks(fileobj, chunkSize=DEFAULT_CHUNK_SIZE):
+    """
+    Generator yielding the non-blank lines of a binary file-like object as lists of bytes, one list per
+    chunk read. Line endings are not included.
+    @param fileobj: A binary file-like object opened for reading
+    @param chunkSize: Number of bytes to read at a time
+    """
+    pending = []
+    while True:
+        chunk = fileobj.read(chunkSize)
+        if not chunk:
+            break
+        end = chunk.rfind(b'\n')
+        if end < 0:
+            pending.append(chunk)
+            continue
+        pending.append(chunk[:end])
+        lines = _nonBlank(b''.join(pending).split(b'\n'))
+        pending = [chunk[end + 1:]]
+        if lines:
+            yield lines
+    lines = _nonBlank([b''.join(pending)])
+    if lines:
+        yield lines
+
+
+def writeMessages(fileobj, tiipMsgs, bufferSize=DEFAULT_BUFFER_SIZE, backend=None):
+    """
+    Writes TIIPMessages to a binary file-like object, one json encoded message per line.
+    Encoded messages are collected and written in blocks of about bufferSize bytes.
+    @param fileobj: A binary file-like object opened for writing
+    @param tiipMsgs: An iterable of TIIPMessages
+    @param bufferSize: Number of bytes to collect before each write
+    @param backend: Name of the json backend to use, None for the one selected with setJSONBackend
+    @return: The number of messages written
+    """
+    block = []
+    size = 0
+    count = 0
+    for tiipMsg in tiipMsgs:
+        line = tiipMsg.toBytes(backend)
+        block.append(line)
+        block.append(b'\n')
+        size += len(line) + 1
+        count += 1
+        if size >= bufferSize:
+            fileobj.write(b''.join(block))
+            block = []
+            size = 0
+    if block:
+        fileobj.write(b''.join(block))
+    return count
+
+
+def writeMessagesInto(buffer, tiipMsgs, offset=0, backend=None):
+    """
+    Writes as many TIIPMessages as fit into a caller supplied buffer, one json encoded message per line, e.g.
+    to fill a preallocated send buffer. Only whole lines are written.
+    @param buffer: A writable bytearray, memoryview or other contiguous buffer
+    @param tiipMsgs: A sequence of TIIPMessages
+    @param offset: Position in buffer, in bytes, to start writing at
+    @param backend: Name of the json backend to use, None for the one selected with setJSONBackend
+    @raise: TypeError if buffer is read-only
+    @return: A tuple of the number of messages written and the position in buffer after the last line. The
+        remaining messages, tiipMsgs[count:], can be written once the buffer has been sent.
+    """
+    view = memoryview(buffer)
+    if view.readonly:
+        raise TypeError('buffer is read-only')
+    if view.format != 'B' or view.ndim != 1:
+        view = view.cast('B')
+    size = len(view)
+    count = 0
+    for tiipMsg in tiipMsgs:
+        line = tiipMsg.toBytes(backend)
+        end = offset + len(line) + 1
+        if end > size:
+            break
+        view[offset:end - 1] = line
+        view[end - 1] = 10  # b'\n'
+        offset = end
+        count += 1
+    return count, offset
+
+
+def _nonBlank(lines):
+    return [line for line in lines if line and not line.isspace()]
+
+
+def _decodeLines(lines, index, verifyVersion, errors, backend, pool):
+    lineErrors = None if errors is None else []
+    tiipMsgs = TIIPMessage.decodeMany(lines, verifyVersion, lineErrors, backend, pool=pool)
+    if lineErrors:
+        errors.extend((index + lineIndex, e) for lineIndex, e in lineErrors)
+    return tiipMsgs
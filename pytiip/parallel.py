@@ -0,0 +1,107 @@
+"""
+Parallel decoding of large newline delimited TIIP files (one json encoded TIIPMessage per line) in a process
+pool. The file is split into newline aligned byte ranges which workers read through mmap.
+"""
+
+import copy
+import functools
+import itertools
+import mmap
+import multiprocessing
+import os
+
+from pytiip.tiip import TIIPMessage
+
+DEFAULT_CHUNKS_PER_PROCESS = 4  # More chunks than processes evens out the load
+BLOCK_SIZE = 1 << 22  # Bytes a worker decodes at a time
+
+
+def splitRanges(path, parts):
+    """
+    Splits a file into at most parts byte ranges of about equal size, each ending after a newline or at the
+    end of the file.
+    @param path: Path of the file to split
+    @param parts: Number of ranges to split into
+    @return: A list of (start, end) tuples, end exclusive
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return []
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            bounds = [0]
+            for i in range(1, parts):
+                newline = mm.find(b'\n', max(size * i // parts, bounds[-1] + 1) - 1)
+                bounds.append(size if newline < 0 else newline + 1)
+            bounds.append(size)
+        finally:
+            mm.close()
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def decodeFile(path, processes=None, reduce=None, initial=None, combine=None, verifyVersion=True, trusted=False,
+               backend=None, chunksPerProcess=DEFAULT_CHUNKS_PER_PROCESS):
+    """
+    Decodes every line of a newline delimited TIIP file in a process pool. Blank lines are skipped.
+    Without reduce all TIIPMessages are returned in file order. Since sending messages back from the workers
+    costs about as much as decoding them, aggregating in the workers with reduce scales much better.
+    @param path: Path of the file to decode
+    @param processes: Number of worker processes, None for the number of CPUs
+    @param reduce: Optional function(accumulated, tiipMsg) returning the new accumulated value, applied to the
+        messages of each chunk in order, starting from initial. Must be picklable, e.g. a module level function.
+    @param initial: The initial accumulated value of each chunk, used with reduce. Each chunk starts from its own
+        deep copy, so a mutable accumulator such as a dict is never shared between chunks.
+    @param combine: Optional function(accumulatedA, accumulatedB) merging the results of two chunks, used
+        with reduce. Without it the list of chunk results is returned in file order.
+    @param verifyVersion: True to verify that every message has the right protocol
+    @param trusted: True to skip type and value checks, see TIIPMessage.loadFromDict
+    @param backend: Name of the json backend to use, None for the one selected with setJSONBackend
+    @param chunksPerProcess: Number of ranges the file is split into per process
+    @raise: TypeError, ValueError
+    @return: A list of TIIPMessages, a list of chunk results or the combined result
+    """
+    processes = processes or multiprocessing.cpu_count()
+    ranges = splitRanges(path, processes * chunksPerProcess)
+    tasks = [(path, start, end, verifyVersion, trusted, backend, reduce, initial) for start, end in ranges]
+    if not tasks:
+        results = []
+    elif processes == 1 or len(tasks) == 1:
+        results = [_decodeRange(task) for task in tasks]
+    else:
+        pool = multiprocessing.Pool(min(processes, len(tasks)))
+        try:
+            results = pool.map(_decodeRange, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+    if reduce is None:
+        return list(itertools.chain.from_iterable(results))
+    if combine is None:
+        return results
+    return functools.reduce(combine, results) if results else initial
+
+
+def _decodeRange(task):
+    path, start, end, verifyVersion, trusted, backend, reduce, initial = task
+    tiipMsgs = []
+    accumulated = copy.deepcopy(initial)
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            while start < end:
+                blockEnd = min(start + BLOCK_SIZE, end)
+                if blockEnd < end:
+                    newline = mm.rfind(b'\n', start, blockEnd)
+                    blockEnd = mm.find(b'\n', blockEnd, end) + 1 if newline < 0 else newline + 1
+                    blockEnd = blockEnd or end
+                lines = [line for line in mm[start:blockEnd].split(b'\n') if line and not line.isspace()]
+                decoded = TIIPMessage.decodeMany(lines, verifyVersion, backend=backend, trusted=trusted)
+                if reduce is None:
+                    tiipMsgs.extend(decoded)
+                else:
+                    accumulated = functools.reduce(reduce, decoded, accumulated)
+                start = blockEnd
+        finally:
+            mm.close()
+    return tiipMsgs if reduce is None else accumulated
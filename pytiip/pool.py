@@ -0,0 +1,82 @@
+"""
+Bounded pool of reusable TIIPMessages for decode loops, to avoid allocating a new message per decoded one.
+
+    pool = MessagePool()
+    for line in lines:
+        tiipMsg = pool.decode(line)
+        handle(tiipMsg)
+        pool.release(tiipMsg)
+
+A message must not be used after it has been released, nor be released more than once.
+"""
+
+from pytiip.tiip import TIIPMessage
+
+DEFAULT_MAX_SIZE = 1024  # Released messages kept for reuse
+
+
+class MessagePool(object):
+    """
+    A bounded free list of TIIPMessages. Messages are created when the pool is empty and dropped when they
+    are released to a full pool.
+    """
+
+    def __init__(self, maxSize=DEFAULT_MAX_SIZE, cls=TIIPMessage):
+        """
+        @param maxSize: Maximum number of released messages kept for reuse
+        @param cls: The TIIPMessage class to create messages of, e.g. LazyTIIPMessage
+        """
+        self.__maxSize = maxSize
+        self.__cls = cls
+        self.__free = []
+        self.__created = 0
+
+    def __len__(self):
+        return len(self.__free)
+
+    @property
+    def maxSize(self):
+        return self.__maxSize
+
+    @property
+    def created(self):
+        """
+        Number of messages created because the pool was empty.
+        """
+        return self.__created
+
+    def acquire(self, reset=True):
+        """
+        @param reset: False to skip resetting a reused message, for callers that reload it anyway
+        @return: A released message, reset to the initial values of a new message, or a new message
+        """
+        try:
+            tiipMsg = self.__free.pop()
+        except IndexError:
+            self.__created += 1
+            return self.__cls()
+        if reset:
+            tiipMsg.reset()
+        return tiipMsg
+
+    def release(self, tiipMsg):
+        """
+        Returns a message to the pool. Its values are kept until the message is reused, so a pool of large
+        messages keeps up to maxSize of them alive.
+        @param tiipMsg: A message that is no longer used
+        """
+        if len(self.__free) < self.__maxSize:
+            self.__free.append(tiipMsg)
+
+    def decode(self, tiipStr, verifyVersion=True, backend=None, trusted=False):
+        """
+        Loads a message from the pool with tiipStr, see TIIPMessage.reload.
+        @raise: TypeError, ValueError
+        @return: A TIIPMessage
+        """
+        tiipMsg = self.acquire(False)
+        try:
+            return tiipMsg.reload(tiipStr, verifyVersion=verifyVersion, backend=backend, trusted=trusted)
+        except (TypeError, ValueError):
+            self.release(tiipMsg)
+            raise
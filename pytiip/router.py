@@ -0,0 +1,158 @@
+"""
+Dispatching of TIIP messages to handlers subscribed with patterns over type, sig, ch, targ and src.
+"""
+
+WILDCARD = '*'
+
+
+class _Trie(object):
+    # A node per path element, '*' children match any single element
+    __slots__ = ('children', 'value')
+
+    def __init__(self):
+        self.children = {}
+        self.value = None
+
+    def node(self, path):
+        node = self
+        for element in path:
+            child = node.children.get(element)
+            if child is None:
+                child = node.children[element] = _Trie()
+            node = child
+        return node
+
+    def prefixNodes(self, path):
+        # All nodes whose path is a prefix of path, with wildcards
+        found = [self]
+        nodes = [self]
+        for element in path:
+            nextNodes = []
+            for node in nodes:
+                child = node.children.get(element)
+                if child is not None:
+                    nextNodes.append(child)
+                if element != WILDCARD:
+                    child = node.children.get(WILDCARD)
+                    if child is not None:
+                        nextNodes.append(child)
+            if not nextNodes:
+                break
+            found.extend(nextNodes)
+            nodes = nextNodes
+        return found
+
+
+class TIIPRouter(object):
+    """
+    Routes TIIPMessages to subscribed handlers. Subscriptions are indexed by type, sig and ch in a hash table
+    and by targ and src in tries, so dispatch cost depends on the message and the number of matches rather
+    than on the number of subscriptions.
+
+    Patterns for type, sig and ch match the value exactly, None or '*' matches anything. Patterns for targ
+    and src are lists matching as a prefix of the message's list, where a '*' element matches any single
+    element. None or an empty list matches anything.
+    """
+
+    def __init__(self):
+        self.__buckets = {}  # (type, sig, ch) -> targ trie -> src trie -> subscription ids
+        self.__subscriptions = {}  # id -> (handler, key, targ, src)
+        self.__nextId = 0
+
+    def __len__(self):
+        return len(self.__subscriptions)
+
+    # noinspection PyShadowingBuiltins
+    def subscribe(self, handler, type=None, sig=None, ch=None, targ=None, src=None):
+        """
+        @param handler: Function called with each matching TIIPMessage
+        @param type: Pattern for type
+        @param sig: Pattern for sig
+        @param ch: Pattern for ch
+        @param targ: Prefix pattern for targ, a list
+        @param src: Prefix pattern for src, a list
+        @raise: TypeError
+        @return: A subscription id for unsubscribe
+        """
+        if not callable(handler):
+            raise TypeError('handler must be callable')
+        for path in (targ, src):
+            if path is not None and not isinstance(path, list):
+                raise TypeError('targ and src patterns can only be of types list or None')
+        key = (_scalar(type), _scalar(sig), _scalar(ch))
+        targ = targ or []
+        src = src or []
+        subscriptionId = self.__nextId
+        self.__nextId += 1
+        bucket = self.__buckets.get(key)
+        if bucket is None:
+            bucket = self.__buckets[key] = _Trie()
+        targNode = bucket.node(targ)
+        if targNode.value is None:
+            targNode.value = _Trie()
+        srcNode = targNode.value.node(src)
+        if srcNode.value is None:
+            srcNode.value = []
+        srcNode.value.append(subscriptionId)
+        self.__subscriptions[subscriptionId] = (handler, key, targ, src)
+        return subscriptionId
+
+    def unsubscribe(self, subscriptionId):
+        """
+        @param subscriptionId: An id returned by subscribe
+        @return: True if the subscription existed
+        """
+        subscription = self.__subscriptions.pop(subscriptionId, None)
+        if subscription is None:
+            return False
+        _, key, targ, src = subscription
+        self.__buckets[key].node(targ).value.node(src).value.remove(subscriptionId)
+        return True
+
+    def match(self, tiipMsg):
+        """
+        @param tiipMsg: The TIIPMessage to match
+        @return: A list of the handlers subscribed to tiipMsg, in subscription order
+        """
+        buckets = self.__buckets
+        if not buckets:
+            return []
+        types = (None,) if tiipMsg.type is None else (tiipMsg.type, None)
+        sigs = (None,) if tiipMsg.sig is None else (tiipMsg.sig, None)
+        chs = (None,) if tiipMsg.ch is None else (tiipMsg.ch, None)
+        targ = tiipMsg.targ or ()
+        src = tiipMsg.src or ()
+        ids = []
+        for type in types:
+            for sig in sigs:
+                for ch in chs:
+                    bucket = buckets.get((type, sig, ch))
+                    if bucket is None:
+                        continue
+                    for targNode in bucket.prefixNodes(targ):
+                        if targNode.value is None:
+                            continue
+                        for srcNode in targNode.value.prefixNodes(src):
+                            if srcNode.value:
+                                ids.extend(srcNode.value)
+        if len(ids) > 1:
+            ids.sort()
+        subscriptions = self.__subscriptions
+        return [subscriptions[subscriptionId][0] for subscriptionId in ids]
+
+    def dispatch(self, tiipMsg):
+        """
+        Calls every handler subscribed to tiipMsg, in subscription order.
+        @param tiipMsg: The TIIPMessage to dispatch
+        @return: The number of handlers called
+        """
+        handlers = self.match(tiipMsg)
+        for handler in handlers:
+            handler(tiipMsg)
+        return len(handlers)
+
+
+def _scalar(pattern):
+    if pattern == WILDCARD:
+        return None
+    return pattern
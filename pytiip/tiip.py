@@ -2,10 +2,18 @@
 Python implementation of the TIIP (Thin Industrial Internet Protocol) protocol.
 """
 
+import array
+import base64
 import json
+import math
+import re
+import threading
+import time
 
 from datetime import datetime as dt
 from datetime import timedelta as td
+from datetime import timezone
+from functools import lru_cache
 
 import dateutil.parser as parser
 
@@ -22,41 +30,446 @@ else:
 
 __version__ = 'tiip.3.0'  # TIIP protocol version
 
+# Canonical TIIP timestamp, e.g. 2000-01-01T01:23:45.678901Z
+_TS_PATTERN = re.compile(r'(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)\.(\d{6})Z\Z')
+_TS_CACHE_SIZE = 1024  # Recently parsed timestamps, bursts often share the same one
+
+
+@lru_cache(maxsize=_TS_CACHE_SIZE)
+def parseTimeStamp(value):
+    """
+    Parses a timestamp string according to the TIIP-specification for timestamps.
+    The canonical format (YYYY-MM-DDTHH:MM:SS.ffffffZ) is handled without dateutil, other representations
+    fall back to dateutil. Results for recently seen timestamps are cached.
+    @param value: A unicode or string representation of a timestamp
+    @raise: ValueError
+    @return: A naive datetime in UTC
+    """
+    if isinstance(value, bytes) and PY3:
+        try:
+            value = value.decode('ascii')
+        except UnicodeDecodeError:
+            raise ValueError('timestamp string must be parseable to datetime')
+    match = _TS_PATTERN.match(value)
+    if match is not None:
+        try:
+            return dt(*[int(part) for part in match.groups()])
+        except ValueError:
+            raise ValueError('timestamp string must be parseable to datetime')
+    try:
+        dateObj = parser.parse(value)
+    except (ValueError, OverflowError):
+        raise ValueError('timestamp string must be parseable to datetime')
+    if dateObj.utcoffset() not in [None, td(0)]:
+        raise ValueError('timestamp string must be in utc timezone')
+    if len(value) < 20 or value[-1] != 'Z' or value[19] != '.':
+        raise ValueError('seconds must be decimals and end with Z')
+    return dateObj.replace(tzinfo=None)
+
+
+_EPOCH = dt(1970, 1, 1)
+_EPOCH_UTC = dt(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = td(microseconds=1)
+# Microseconds since the epoch that a datetime can represent
+_MIN_MICROS = (dt.min - _EPOCH) // _MICROSECOND
+_MAX_MICROS = (dt.max - _EPOCH) // _MICROSECOND
+
+
+@lru_cache(maxsize=_TS_CACHE_SIZE)
+def _secondPrefix(seconds):
+    # Consecutive timestamps mostly fall within the same second
+    return (_EPOCH + td(seconds=seconds)).isoformat() + '.'
+
+
+def formatTimeStamp(micros):
+    """
+    Creates a timestamp string according to the TIIP-specification from microseconds since the epoch.
+    Everything up to the second is cached, only the fraction is formatted per call.
+    @param micros: Integer microseconds since 1970-01-01T00:00:00Z
+    @return: A unicode/str timestamp in the canonical format
+    """
+    seconds, micros = divmod(micros, 1000000)
+    return '%s%06dZ' % (_secondPrefix(seconds), micros)
+
+
+def timeStampToMicros(value):
+    """
+    @param value: A unicode or string timestamp according to the TIIP-specification
+    @raise: ValueError
+    @return: Integer microseconds since 1970-01-01T00:00:00Z
+    """
+    return (parseTimeStamp(value) - _EPOCH) // _MICROSECOND
+
+
+_lastMicros = 0
+_clockLock = threading.Lock()
+
+
+def currentMicros():
+    """
+    The clock of default timestamps, strictly increasing within the process: a call in the same microsecond
+    as the previous one returns the previous value plus one.
+    @return: Integer microseconds since 1970-01-01T00:00:00Z
+    """
+    global _lastMicros
+    micros = time.time_ns() // 1000
+    # acquire/release instead of with, which costs more than the rest of the call, nothing in between raises
+    _clockLock.acquire()
+    if micros <= _lastMicros:
+        micros = _lastMicros + 1
+    _lastMicros = micros
+    _clockLock.release()
+    return micros
+
+
+def _fromVersion2(tiipDict):
+    # A new tiip.3.0 dict from a tiip.2.0 dict, where ts and ct are epoch seconds
+    tiipDict = dict(tiipDict)
+    ct = tiipDict.pop('ct', None)
+    if 'ts' in tiipDict:
+        ts = float(tiipDict['ts'])
+        if ct is not None:
+            ct = float(ct)
+            tiipDict['lat'] = str(ts - ct)
+            ts = ct
+        try:
+            micros = int(round(ts * 1000000))
+        except (ValueError, OverflowError):  # NaN and infinity
+            micros = None
+        if micros is None or not _MIN_MICROS <= micros <= _MAX_MICROS:
+            raise ValueError('tiip.2.0 timestamps must be within the years 1 and 9999')
+        tiipDict['ts'] = formatTimeStamp(micros)
+    tiipDict['pv'] = __version__
+    return tiipDict
+
+
+def _toVersion2(tiipDict):
+    # A new tiip.2.0 dict from a tiip.3.0 dict
+    tiipDict = dict(tiipDict)
+    if 'ts' in tiipDict:
+        ct = timeStampToMicros(tiipDict['ts']) / 1000000.0
+        if 'lat' in tiipDict:
+            tiipDict['ct'] = str(ct)
+            tiipDict['ts'] = str(ct + float(tiipDict.pop('lat')))
+        else:
+            tiipDict['ts'] = str(ct)
+    tiipDict['pv'] = 'tiip.2.0'
+    return tiipDict
+
+
+_internPool = None
+_INTERNED_KEYS = ('type', 'src', 'targ', 'sig', 'ch', 'ten')
+
+
+def setInternPool(pool):
+    """
+    Selects a pytiip.interning.InternPool that loadFromDict and loadFromStr use to deduplicate the values of type, src, targ,
+    sig, ch and ten, so that decoded messages share equal header strings.
+    @param pool: An InternPool, or None to stop interning
+    """
+    global _internPool
+    _internPool = pool
+
+
+def getInternPool():
+    """
+    @return: The InternPool selected with setInternPool, or None
+    """
+    return _internPool
+
+
+def _internHeaders(tiipDict, pool):
+    # A new dict with the header values replaced by pooled ones
+    tiipDict = dict(tiipDict)
+    for key in _INTERNED_KEYS:
+        value = tiipDict.get(key)
+        if isinstance(value, list):
+            tiipDict[key] = pool.internList(value)
+        elif value is not None:
+            tiipDict[key] = pool.intern(value)
+    return tiipDict
+
+
+# Numeric arrays accepted as pl: array.array, 1-dimensional memoryviews and numpy arrays of ints and floats.
+# They are kept as given and encoded as json lists, or with ARRAY_BASE64 as {"@array": "<f8", "b64": "..."},
+# i.e. the kind, i (signed), u (unsigned) or f (float), and size in bytes of the little-endian items.
+ARRAY_LIST = 'list'
+ARRAY_BASE64 = 'base64'
+_arrayEncoding = ARRAY_LIST
+_ARRAY_KEY = '@array'
+_ARRAY_FORMAT = re.compile(r'<([iuf])(\d+)\Z')
+_TYPECODE_KINDS = {}
+_KIND_TYPECODES = {}
+for _typecode in 'bBhHiIlLqQfd':
+    _TYPECODE_KINDS[_typecode] = 'f' if _typecode in 'fd' else ('u' if _typecode.isupper() else 'i')
+    _KIND_TYPECODES.setdefault((_TYPECODE_KINDS[_typecode], array.array(_typecode).itemsize), _typecode)
+
+
+def setArrayEncoding(name):
+    """
+    Selects how numeric array payloads are represented by toStr, toBytes and asVersion. Payloads that are
+    lists are always represented as lists.
+    @param name: ARRAY_LIST for plain json lists, readable by any TIIP implementation, or ARRAY_BASE64 for
+        compact base64 blocks that only pytiip decodes
+    @raise: ValueError
+    """
+    global _arrayEncoding
+    if name not in (ARRAY_LIST, ARRAY_BASE64):
+        raise ValueError('Unknown array encoding "' + str(name) + '"')
+    _arrayEncoding = name
+
+
+def getArrayEncoding():
+    """
+    @return: The array encoding selected with setArrayEncoding
+    """
+    return _arrayEncoding
+
+
+def _isNumericArray(value):
+    if isinstance(value, array.array):
+        return value.typecode in _TYPECODE_KINDS
+    if isinstance(value, memoryview):
+        return value.ndim == 1 and value.format.lstrip('@') in _TYPECODE_KINDS
+    numpy = sys.modules.get('numpy')  # Only set if numpy arrays can exist at all
+    return (numpy is not None and isinstance(value, numpy.ndarray) and value.ndim == 1 and
+            (value.dtype.kind, value.dtype.itemsize) in _KIND_TYPECODES)
+
+
+def _arrayLayout(value):
+    # (kind, item size, little-endian item bytes) of a numeric array
+    if isinstance(value, (array.array, memoryview)):
+        typecode = value.typecode if isinstance(value, array.array) else value.format.lstrip('@')
+        items = array.array(typecode, value.tobytes())
+        if sys.byteorder == 'big':
+            items.byteswap()
+        return _TYPECODE_KINDS[typecode], items.itemsize, items.tobytes()
+    dtype = value.dtype.newbyteorder('<')
+    return dtype.kind, dtype.itemsize, value.astype(dtype, copy=False).tobytes()
+
+
+def _arrayFromLayout(kind, itemsize, data):
+    # An array.array from the output of _arrayLayout
+    typecode = _KIND_TYPECODES.get((kind, itemsize))
+    if typecode is None:
+        raise ValueError('unsupported numeric array items "' + str(kind) + str(itemsize) + '"')
+    if len(data) % itemsize:
+        raise ValueError('numeric array data is not a whole number of items')
+    items = array.array(typecode)
+    items.frombytes(data)
+    if sys.byteorder == 'big':
+        items.byteswap()
+    return items
+
+
+def _encodeArray(value):
+    if _arrayEncoding == ARRAY_LIST:
+        return value.tolist()
+    kind, itemsize, data = _arrayLayout(value)
+    return {_ARRAY_KEY: '<' + kind + str(itemsize), 'b64': base64.b64encode(data).decode('ascii')}
+
+
+def _decodeArray(value):
+    match = _ARRAY_FORMAT.match(value[_ARRAY_KEY]) if isinstance(value[_ARRAY_KEY], (str, unicode)) else None
+    if match is None or set(value) != set((_ARRAY_KEY, 'b64')) or not isinstance(value['b64'], (str, unicode)):
+        raise ValueError('invalid numeric array payload')
+    return _arrayFromLayout(match.group(1), int(match.group(2)), base64.b64decode(value['b64'], validate=True))
+
+
+class JSONBackend(object):
+    """
+    A json encoder/decoder pair used by TIIPMessage for its string and bytes representations.
+    """
+    __slots__ = ('name', '__dumps', '__loads', '__bytesOutput', '__bufferInput')
+
+    def __init__(self, name, dumps, loads, bytesOutput=False, bufferInput=False):
+        """
+        @param name: The name to register the backend under
+        @param dumps: Function encoding a dict to json
+        @param loads: Function decoding json, given unicode, str or bytes
+        @param bytesOutput: True if dumps returns bytes instead of unicode/str
+        @param bufferInput: True if loads also accepts bytearray and memoryview
+        """
+        self.name = name
+        self.__dumps = dumps
+        self.__loads = loads
+        self.__bytesOutput = bytesOutput
+        self.__bufferInput = bufferInput
+
+    def dumps(self, obj):
+        """
+        @return: The json representation of obj as unicode/str
+        """
+        if self.__bytesOutput:
+            return self.__dumps(obj).decode('utf-8')
+        return self.__dumps(obj)
+
+    def dumpsBytes(self, obj):
+        """
+        @return: The json representation of obj as utf-8 encoded bytes
+        """
+        if self.__bytesOutput:
+            return self.__dumps(obj)
+        return self.__dumps(obj).encode('utf-8')
+
+    def loads(self, data):
+        """
+        @param data: unicode, str, bytes, bytearray or memoryview
+        @raise: ValueError
+        @return: The decoded object
+        """
+        if not self.__bufferInput and isinstance(data, (bytearray, memoryview)):
+            data = bytes(data)
+        return self.__loads(data)
+
+
+_jsonBackends = {}
+_jsonBackend = None
+_PREFERRED_JSON_BACKENDS = ('orjson', 'rapidjson', 'ujson', 'json')
+
+
+def registerJSONBackend(backend):
+    """
+    Makes a JSONBackend available to getJSONBackend and setJSONBackend, replacing any backend with the same name.
+    @param backend: The JSONBackend to register
+    """
+    _jsonBackends[backend.name] = backend
+
+
+def getJSONBackend(name=None):
+    """
+    @param name: Name of a registered backend, None for the backend currently in use
+    @raise: ValueError if no backend is registered under name
+    @return: A JSONBackend
+    """
+    if name is None:
+        return _jsonBackend
+    try:
+        return _jsonBackends[name]
+    except KeyError:
+        raise ValueError('Unknown json backend "' + str(name) + '", available: ' + ', '.join(sorted(_jsonBackends)))
+
+
+def availableJSONBackends():
+    """
+    @return: A sorted list with the names of all registered json backends
+    """
+    return sorted(_jsonBackends)
+
+
+def setJSONBackend(name):
+    """
+    Selects the json backend used by all TIIPMessages unless another one is given per call.
+    By default the fastest installed of orjson, rapidjson, ujson and the standard library json is used.
+    @param name: Name of a registered backend
+    @raise: ValueError if no backend is registered under name
+    """
+    global _jsonBackend
+    _jsonBackend = getJSONBackend(name)
+
+
+def _hasNonFinite(value):
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(_hasNonFinite(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(_hasNonFinite(item) for item in value)
+    return False
+
+
+def _orjsonDumps(obj):
+    try:
+        encoded = orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    except TypeError:
+        # E.g. integers outside 64 bits, which the standard library can encode
+        return json.dumps(obj).encode('utf-8')
+    if b'null' in encoded and _hasNonFinite(obj):
+        # orjson writes NaN and Infinity as null, the standard library keeps them
+        return json.dumps(obj).encode('utf-8')
+    return encoded
+
+
+def _orjsonLoads(data):
+    try:
+        return orjson.loads(data)
+    except ValueError:
+        # orjson rejects the NaN and Infinity tokens that the standard library writes for non-finite floats
+        if isinstance(data, (bytearray, memoryview)):
+            data = bytes(data)
+        return json.loads(data)
+
+
+registerJSONBackend(JSONBackend('json', json.dumps, json.loads))
+try:
+    import orjson
+except ImportError:
+    orjson = None
+else:
+    registerJSONBackend(JSONBackend('orjson', _orjsonDumps, _orjsonLoads, bytesOutput=True, bufferInput=True))
+try:
+    import rapidjson
+except ImportError:
+    rapidjson = None
+else:
+    registerJSONBackend(JSONBackend('rapidjson', rapidjson.dumps, rapidjson.loads))
+try:
+    import ujson
+except ImportError:
+    ujson = None
+else:
+    registerJSONBackend(JSONBackend('ujson', ujson.dumps, ujson.loads))
+setJSONBackend([name for name in _PREFERRED_JSON_BACKENDS if name in _jsonBackends][0])
+
+_encodingCache = False
+
+
+def setEncodingCache(enabled):
+    """
+    Selects whether TIIPMessages keep their json representations until a key is set, so that re-sending an
+    unchanged message does not encode it again. Off by default: a list, dict or array value that is modified in
+    place (e.g. msg.targ.pop(0) or msg.pl.append(1)) is not noticed and the cached representation goes stale.
+    Only enable it if such values are replaced instead, or modified and followed by a call to clearCache.
+    @param enabled: True to cache representations, False to encode on every call
+    """
+    global _encodingCache
+    _encodingCache = bool(enabled)
+
+
+def getEncodingCache():
+    """
+    @return: True if representations are cached, see setEncodingCache
+    """
+    return _encodingCache
+
 
 class TIIPMessage(object):
+    __slots__ = (
+        '__pv', '__tsStr', '__tsUs', '__lat', '__mid', '__sid', '__type', '__src', '__targ', '__sig', '__ch', '__arg', '__pl',
+        '__ok', '__ten', '__encoded', '__weakref__')
+
     # noinspection PyShadowingBuiltins
     def __init__(
             self, tiipStr=None, tiipDict=None, ts=None, lat=None, mid=None, sid=None, type=None,
             src=None, targ=None, sig=None, ch=None, arg=None, pl=None, ok=None,
-            ten=None, verifyVersion=True):
+            ten=None, verifyVersion=True, trusted=False):
         """
         @param tiipStr: A string representation of a TIIPMessage to load on init
         @param tiipDict: A dictionary representation of a TIIPMessage to load on init
+        @param verifyVersion: True to verify that tiipStr/tiipDict has the right protocol
+        @param trusted: True to load tiipStr/tiipDict without type and value checks, see loadFromDict
         @raise: TypeError, ValueError
         All other arguments are keys to set in the TIIPMessage, see TIIP specification for more details:
             https://github.com/whitelizard/tiip
         """
         # Protocol keys
-        self.__pv = __version__
-        self.__ts = self.getTimeStamp()
-        self.__lat = None
-        self.__mid = None
-        self.__sid = None
-        self.__type = None
-        self.__src = None
-        self.__targ = None
-        self.__sig = None
-        self.__ch = None
-        self.__arg = None
-        self.__pl = None
-        self.__ok = None
-        self.__ten = None
+        self.__clear()
 
         # Parse constructor arguments
         if tiipStr is not None:
-            self.loadFromStr(tiipStr, verifyVersion)
+            self.loadFromStr(tiipStr, verifyVersion, trusted=trusted)
         if tiipDict is not None:
-            self.loadFromDict(tiipDict, verifyVersion)
+            self.loadFromDict(tiipDict, verifyVersion, trusted)
         if ts is not None:
             self.ts = ts
         if lat is not None:
@@ -83,13 +496,75 @@ class TIIPMessage(object):
             self.ok = ok
         if ten is not None:
             self.ten = ten
+        if self.__tsStr is None and self.__tsUs is None:
+            self.__tsUs = currentMicros()
+
+    def reset(self):
+        """
+        Sets all keys to their initial values and ts to the current time, as in a new TIIPMessage().
+        """
+        self.__clear()
+        self.__tsUs = currentMicros()
+
+    def reload(self, tiipStr=None, tiipDict=None, verifyVersion=True, backend=None, trusted=False):
+        """
+        Replaces all keys with those loaded from tiipStr and/or tiipDict, so that one object can be reused
+        instead of creating a new TIIPMessage per decoded message. Keys that are not loaded get their initial
+        values and ts is only set to the current time if none is loaded. If loading fails, the message is
+        left partially loaded, with ts set.
+        @param tiipStr: A string, unicode or bytes representation of a TIIPMessage to load
+        @param tiipDict: A dictionary representation of a TIIPMessage to load
+        @param verifyVersion: True to verify that tiipStr/tiipDict has the right protocol
+        @param backend: Name of the json backend to use, None for the one selected with setJSONBackend
+        @param trusted: True to skip type and value checks, see loadFromDict
+        @raise: TypeError, ValueError
+        @return: This TIIPMessage
+        """
+        self.__clear()
+        try:
+            if tiipStr is not None:
+                self.loadFromStr(tiipStr, verifyVersion, backend, trusted)
+            if tiipDict is not None:
+                self.loadFromDict(tiipDict, verifyVersion, trusted)
+        finally:
+            # Also when loading fails, so that the message can still be encoded
+            if self.__tsStr is None and self.__tsUs is None:
+                self.__tsUs = currentMicros()
+        return self
+
+    def __clear(self):
+        """
+        Sets all protocol keys to their initial value, leaving ts unset.
+        """
+        self.__pv = __version__
+        self.__tsStr = None  # ts as set, or formatted from __tsUs when first read
+        self.__tsUs = None  # ts as integer microseconds since the epoch, or parsed from __tsStr when first read
+        self.__lat = None
+        self.__mid = None
+        self.__sid = None
+        self.__type = None
+        self.__src = None
+        self.__targ = None
+        self.__sig = None
+        self.__ch = None
+        self.__arg = None
+        self.__pl = None
+        self.__ok = None
+        self.__ten = None
+        self.__encoded = None  # Cached representations, cleared by every setter
 
     def __str__(self):
-        return json.dumps(dict(self))
+        return self.toStr()
+
+    def __bytes__(self):
+        return self.toBytes()
 
     def __iter__(self):
         yield 'pv', self.__pv
-        yield 'ts', self.__ts
+        tsStr = self.__tsStr
+        if tsStr is None:
+            tsStr = self.__tsStr = formatTimeStamp(self.__tsUs)
+        yield 'ts', tsStr
         if self.__lat is not None:
             yield 'lat', self.__lat
         if self.__mid is not None:
@@ -115,13 +590,81 @@ class TIIPMessage(object):
         if self.__ten is not None:
             yield 'ten', self.__ten
 
+    def toStr(self, backend=None):
+        """
+        With setEncodingCache(True) the representation is cached until a key is set, see clearCache.
+        @param backend: Name of the json backend to use, None for the one selected with setJSONBackend
+        @return: The json representation of this TIIPMessage as unicode/str
+        """
+        jsonBackend = getJSONBackend(backend)
+        return self.__cached((jsonBackend.name, 'str', _arrayEncoding), jsonBackend.dumps)
+
+    def toBytes(self, backend=None):
+        """
+        With setEncodingCache(True) the representation is cached until a key is set, see clearCache.
+        @param backend: Name of the json backend to use, None for the one selected with setJSONBackend
+        @return: The json representation of this TIIPMessage as utf-8 encoded bytes
+        """
+        jsonBackend = getJSONBackend(backend)
+        return self.__cached((jsonBackend.name, 'bytes', _arrayEncoding), jsonBackend.dumpsBytes)
+
+    def writeInto(self, buffer, offset=0, backend=None):
+        """
+        Writes the utf-8 encoded json representation of this TIIPMessage into a caller supplied buffer, e.g. to
+        batch several messages in one buffer before sending it.
+        @param buffer: A writable bytearray, memoryview or other contiguous buffer
+        @param offset: Position in buffer, in bytes, to write at
+        @param backend: Name of the json backend to use, None for the one selected with setJSONBackend
+        @raise: TypeError if buffer is read-only, ValueError if the representation does not fit at offset
+        @return: The number of bytes written
+        """
+        encoded = self.toBytes(backend)
+        view = memoryview(buffer)
+        if view.readonly:
+            raise TypeError('buffer is read-only')
+        if view.format != 'B' or view.ndim != 1:
+            view = view.cast('B')
+        end = offset + len(encoded)
+        if offset < 0 or end > len(view):
+            raise ValueError('buffer too small: ' + str(len(encoded)) + ' bytes do not fit at offset ' + str(offset) +
+                             ' of ' + str(len(view)))
+        view[offset:end] = encoded
+        return len(encoded)
+
+    def clearCache(self):
+        """
+        Drops the cached representations of this TIIPMessage, see setEncodingCache. Setting a key does this
+        automatically, but modifying a list, dict or array value in place (e.g. msg.pl.append(1)) does not and
+        must be followed by a call to this method.
+        """
+        self.__encoded = None
+
+    def __cached(self, key, encode):
+        if not _encodingCache:
+            return encode(self.__encodable())
+        encoded = self.__encoded
+        if encoded is None:
+            encoded = self.__encoded = {}
+        elif key in encoded:
+            return encoded[key]
+        value = encoded[key] = encode(self.__encodable())
+        return value
+
+    def __encodable(self):
+        # The dict that is encoded to json, with numeric array payloads in the selected array encoding
+        tiipDict = dict(self)
+        if self.__pl is not None and not isinstance(self.__pl, list):
+            tiipDict['pl'] = _encodeArray(self.__pl)
+        return tiipDict
+
     @staticmethod
     def getTimeStamp():
         """
         Creates a timestamp string representation according to the TIIP-specification for timestamps.
-        @return:
+        @return: The current time from currentMicros as a unicode/str timestamp in the canonical format
         """
-        return dt.utcnow().isoformat(timespec='microseconds') + 'Z'
+        seconds, micros = divmod(currentMicros(), 1000000)  # formatTimeStamp inlined
+        return '%s%06dZ' % (_secondPrefix(seconds), micros)
 
     @property
     def pv(self):
@@ -129,36 +672,61 @@ class TIIPMessage(object):
 
     @property
     def ts(self):
-        return self.__ts
+        if self.__tsStr is None:
+            self.__tsStr = formatTimeStamp(self.__tsUs)
+        return self.__tsStr
 
     @ts.setter
     def ts(self, value):
+        self.__encoded = None
         if isinstance(value, str) or isinstance(value, unicode) or isinstance(value, bytes):
-            try:
-                dateObj = parser.parse(value)
-            except ValueError:
-                raise ValueError('timestamp string must be parseable to datetime')
-            if dateObj.utcoffset() not in [None, td(0)]:
-                raise ValueError('timestamp string must be in utc timezone')
-            if value[-1] != 'Z' or value[19] != '.':
-                raise ValueError('seconds must be decimals and end with Z')
-            self.__ts = value
+            parseTimeStamp(value)
+            if isinstance(value, bytes) and PY3:
+                value = value.decode('ascii')
+            self.__tsStr = value
+            self.__tsUs = None
         elif isinstance(value, dt):
             if value.utcoffset() not in [None, td(0)]:
                 raise ValueError('timestamp string must be in utc timezone')
-            iso = value.isoformat(timespec='microseconds')
-            if iso.endswith("+00:00"):
-                iso = iso[:-6]
-            self.__ts = iso + 'Z'
+            self.__tsUs = (value.replace(tzinfo=None) - _EPOCH) // _MICROSECOND
+            self.__tsStr = None
         else:
             raise TypeError('timestamp can only be of types datetime or a valid unicode or string representation of a iso 6801')
 
+    @property
+    def tsMicros(self):
+        """
+        ts as integer microseconds since 1970-01-01T00:00:00Z, without formatting or parsing a string more than
+        once per value.
+        """
+        if self.__tsUs is None:
+            self.__tsUs = timeStampToMicros(self.__tsStr)
+        return self.__tsUs
+
+    @tsMicros.setter
+    def tsMicros(self, value):
+        self.__encoded = None
+        if isinstance(value, bool) or not isinstance(value, (int, long)):
+            raise TypeError('timestamp microseconds can only be of type int')
+        if not _MIN_MICROS <= value <= _MAX_MICROS:
+            raise ValueError('timestamp microseconds must be within the years 1 and 9999')
+        self.__tsUs = value
+        self.__tsStr = None
+
+    @property
+    def tsDatetime(self):
+        """
+        ts as a timezone aware datetime in UTC.
+        """
+        return _EPOCH_UTC + td(microseconds=self.tsMicros)
+
     @property
     def lat(self):
         return self.__lat
 
     @lat.setter
     def lat(self, value):
+        self.__encoded = None
         if value is None:
             self.__lat = None
         elif isinstance(value, str) or isinstance(value, unicode) or isinstance(value, bytes):
@@ -179,6 +747,7 @@ class TIIPMessage(object):
 
     @mid.setter
     def mid(self, value):
+        self.__encoded = None
         if value is None:
             self.__mid = None
         elif isinstance(value, str) or isinstance(value, unicode) or isinstance(value, bytes):
@@ -192,6 +761,7 @@ class TIIPMessage(object):
 
     @sid.setter
     def sid(self, value):
+        self.__encoded = None
         if value is None:
             self.__sid = None
         elif isinstance(value, str) or isinstance(value, unicode) or isinstance(value, bytes):
@@ -205,6 +775,7 @@ class TIIPMessage(object):
 
     @type.setter
     def type(self, value):
+        self.__encoded = None
         if value is None:
             self.__type = None
         elif isinstance(value, str) or isinstance(value, unicode) or isinstance(value, bytes):
@@ -218,6 +789,7 @@ class TIIPMessage(object):
 
     @src.setter
     def src(self, value):
+        self.__encoded = None
         if value is None:
             self.__src = None
         elif isinstance(value, list):
@@ -231,6 +803,7 @@ class TIIPMessage(object):
 
     @targ.setter
     def targ(self, value):
+        self.__encoded = None
         if value is None:
             self.__targ = None
         elif isinstance(value, list):
@@ -244,6 +817,7 @@ class TIIPMessage(object):
 
     @sig.setter
     def sig(self, value):
+        self.__encoded = None
         if value is None:
             self.__sig = None
         elif isinstance(value, str) or isinstance(value, unicode) or isinstance(value, bytes):
@@ -257,6 +831,7 @@ class TIIPMessage(object):
 
     @ch.setter
     def ch(self, value):
+        self.__encoded = None
         if value is None:
             self.__ch = None
         elif isinstance(value, str) or isinstance(value, unicode) or isinstance(value, bytes):
@@ -270,6 +845,7 @@ class TIIPMessage(object):
 
     @arg.setter
     def arg(self, value):
+        self.__encoded = None
         if value is None:
             self.__arg = None
         elif isinstance(value, dict):
@@ -283,12 +859,15 @@ class TIIPMessage(object):
 
     @pl.setter
     def pl(self, value):
+        self.__encoded = None
         if value is None:
             self.__pl = None
-        elif isinstance(value, list):
+        elif isinstance(value, list) or _isNumericArray(value):
             self.__pl = value
+        elif isinstance(value, dict) and _ARRAY_KEY in value:
+            self.__pl = _decodeArray(value)
         else:
-            raise TypeError('payload can only be of types list or None')
+            raise TypeError('payload can only be of types list, numeric array or None')
 
     @property
     def ok(self):
@@ -296,6 +875,7 @@ class TIIPMessage(object):
 
     @ok.setter
     def ok(self, value):
+        self.__encoded = None
         if value is None:
             self.__ok = None
         elif isinstance(value, bool):
@@ -309,6 +889,7 @@ class TIIPMessage(object):
 
     @ten.setter
     def ten(self, value):
+        self.__encoded = None
         if value is None:
             self.__ten = None
         elif isinstance(value, str) or isinstance(value, unicode) or isinstance(value, bytes):
@@ -316,39 +897,47 @@ class TIIPMessage(object):
         else:
             raise TypeError('tenant can only be of types unicode, str or None')
 
-    def loadFromStr(self, tiipStr, verifyVersion=True):
+    def loadFromStr(self, tiipStr, verifyVersion=True, backend=None, trusted=False):
         """
-        Loads this object with values from a string or unicode representation of a TIIPMessage.
+        Loads this object with values from a string, unicode or bytes representation of a TIIPMessage.
         @param tiipStr: The string to load properties from.
         @param verifyVersion: True to verify that tiipDict has the right protocol
+        @param backend: Name of the json backend to use, None for the one selected with setJSONBackend
+        @param trusted: True to skip type and value checks, see loadFromDict
         @raise: TypeError, ValueError
         @return: None
         """
-        tiipDict = json.loads(tiipStr)
-        self.loadFromDict(tiipDict, verifyVersion)
+        tiipDict = getJSONBackend(backend).loads(tiipStr)
+        self.loadFromDict(tiipDict, verifyVersion, trusted)
 
-    def loadFromDict(self, tiipDict, verifyVersion=True):
+    def loadFromDict(self, tiipDict, verifyVersion=True, trusted=False):
         """
         Loads this object with values from a dictionary representation of a TIIPMessage.
         @param tiipDict: The dictionary to load properties from.
         @param verifyVersion: True to verify that tiipDict has the right protocol
+        @param trusted: True to assign values without type and value checks. Only for messages that are known
+            to be valid, e.g. from internal producers. Use validate() to check such messages on demand.
         @raise: TypeError, ValueError
         @return: None
         """
 
+        if not isinstance(tiipDict, dict):
+            raise TypeError('tiip message must be a json object')
+
         if verifyVersion:
             if 'pv' not in tiipDict or tiipDict['pv'] != self.__pv:
-                raise ValueError('Incorrect tiip version "' + str(tiipDict['pv']) + '" expected "' + self.__pv + '"')
+                raise ValueError('Incorrect tiip version "' + str(tiipDict.get('pv')) + '" expected "' + self.__pv + '"')
 
         if 'pv' not in tiipDict or tiipDict['pv'] != self.__pv:
-            if tiipDict['pv'] == "tiip.2.0":
-                if 'ct' in tiipDict:
-                    ct = float(tiipDict['ct'])
-                    ts = float(tiipDict['ts'])
-                    tiipDict['ts'] = str(ct)
-                    tiipDict['lat'] = str(ts - ct)
-                tiipDict['ts'] = dt.utcfromtimestamp(float(tiipDict['ts'])).isoformat(timespec='microseconds') + 'Z'
+            if tiipDict.get('pv') == "tiip.2.0":
+                tiipDict = _fromVersion2(tiipDict)
+
+        if _internPool is not None:
+            tiipDict = _internHeaders(tiipDict, _internPool)
 
+        if trusted:
+            self.__loadTrusted(tiipDict)
+            return
         if 'ts' in tiipDict:
             self.ts = tiipDict['ts']
         if 'lat' in tiipDict:
@@ -376,21 +965,120 @@ class TIIPMessage(object):
         if 'ten' in tiipDict:
             self.ten = tiipDict['ten']
 
-    def asVersion(self, version):
+    def __loadTrusted(self, tiipDict):
+        self.__encoded = None
+        if 'ts' in tiipDict:
+            self.__tsStr = tiipDict['ts']
+            self.__tsUs = None
+        if 'lat' in tiipDict:
+            self.__lat = tiipDict['lat']
+        if 'mid' in tiipDict:
+            self.__mid = tiipDict['mid']
+        if 'sid' in tiipDict:
+            self.__sid = tiipDict['sid']
+        if 'type' in tiipDict:
+            self.__type = tiipDict['type']
+        if 'src' in tiipDict:
+            self.__src = tiipDict['src']
+        if 'targ' in tiipDict:
+            self.__targ = tiipDict['targ']
+        if 'sig' in tiipDict:
+            self.__sig = tiipDict['sig']
+        if 'ch' in tiipDict:
+            self.__ch = tiipDict['ch']
+        if 'arg' in tiipDict:
+            self.__arg = tiipDict['arg']
+        if 'pl' in tiipDict:
+            pl = tiipDict['pl']
+            self.__pl = _decodeArray(pl) if isinstance(pl, dict) and _ARRAY_KEY in pl else pl
+        if 'ok' in tiipDict:
+            self.__ok = tiipDict['ok']
+        if 'ten' in tiipDict:
+            self.__ten = tiipDict['ten']
+
+    def validate(self):
+        """
+        Runs the type and value checks of every key, e.g. on a sample of messages loaded with trusted=True.
+        Values are normalized the same way as when they are set, e.g. a numeric lat becomes a string.
+        @raise: TypeError, ValueError
+        @return: None
+        """
+        self.ts = self.ts
+        self.lat = self.lat
+        self.mid = self.mid
+        self.sid = self.sid
+        self.type = self.type
+        self.src = self.src
+        self.targ = self.targ
+        self.sig = self.sig
+        self.ch = self.ch
+        self.arg = self.arg
+        self.pl = self.pl
+        self.ok = self.ok
+        self.ten = self.ten
+
+    @classmethod
+    def decodeMany(cls, tiipStrs, verifyVersion=True, errors=None, backend=None, trusted=False, pool=None):
+        """
+        Creates TIIPMessages from many string, unicode or bytes representations of TIIPMessages.
+        Cheaper than creating them one by one, since the version check is done up front and no default
+        timestamp is generated for messages that carry their own. Subclasses that override __init__ or
+        reload, e.g. LazyTIIPMessage, are created with cls() and loaded with reload.
+        @param tiipStrs: An iterable of representations to load, e.g. a list or a generator
+        @param verifyVersion: True to verify that every message has the right protocol
+        @param errors: An optional list. If given, items that fail to load are skipped and appended to it as
+            (index, exception) tuples instead of raising.
+        @param backend: Name of the json backend to use, None for the one selected with setJSONBackend
+        @param trusted: True to skip type and value checks, see loadFromDict
+        @param pool: An optional pytiip.pool.MessagePool to take the messages from instead of creating new ones
+        @raise: TypeError, ValueError
+        @return: A list of TIIPMessages
+        """
+        loads = getJSONBackend(backend).loads
+        # Skipping __init__ is only safe if the class initializes nothing more than TIIPMessage
+        bare = cls.__init__ is TIIPMessage.__init__ and cls.reload is TIIPMessage.reload
+        messages = []
+        for index, tiipStr in enumerate(tiipStrs):
+            try:
+                tiipDict = loads(tiipStr)
+                if not isinstance(tiipDict, dict):
+                    raise TypeError('tiip message must be a json object')
+                if verifyVersion and tiipDict.get('pv') != __version__:
+                    raise ValueError('Incorrect tiip version "' + str(tiipDict.get('pv')) + '" expected "' + __version__ + '"')
+                if pool is None and bare:
+                    tiipMsg = cls.__new__(cls)
+                    tiipMsg.__clear()
+                    tiipMsg.loadFromDict(tiipDict, False, trusted)
+                    if tiipMsg.__tsStr is None and tiipMsg.__tsUs is None:
+                        tiipMsg.__tsUs = currentMicros()
+                elif pool is None:
+                    tiipMsg = cls().reload(tiipDict=tiipDict, verifyVersion=False, trusted=trusted)
+                else:
+                    tiipMsg = pool.acquire(False)
+                    try:
+                        tiipMsg.reload(tiipDict=tiipDict, verifyVersion=False, trusted=trusted)
+                    except (TypeError, ValueError):
+                        pool.release(tiipMsg)
+                        raise
+            except (TypeError, ValueError) as e:
+                if errors is None:
+                    raise
+                errors.append((index, e))
+            else:
+                messages.append(tiipMsg)
+        return messages
+
+    def asVersion(self, version, backend=None):
+        """
+        @param version: The protocol version to represent this TIIPMessage in, tiip.2.0 or tiip.3.0
+        @param backend: Name of the json backend to use, None for the one selected with setJSONBackend
+        @raise: ValueError
+        @return: The json representation as unicode/str
+        """
         if version == self.__pv:
-            return str(self)
+            return self.toStr(backend)
         elif version == "tiip.2.0":
-            tiipDict = {}
-            for key, val in self:
-                tiipDict[key] = val
-            if "lat" in tiipDict:
-                ct = parser.parse(tiipDict["ts"]).timestamp()
-                tiipDict["ct"] = str(ct)
-                tiipDict["ts"] = str(ct + float(tiipDict["lat"]))
-                tiipDict.pop("lat")
-            else:
-                tiipDict["ts"] = str(parser.parse(tiipDict["ts"]).timestamp())
-            tiipDict["pv"] = version
-            return json.dumps(tiipDict)
+            jsonBackend = getJSONBackend(backend)
+            return self.__cached((version, jsonBackend.name, _arrayEncoding), lambda tiipDict: jsonBackend.dumps(_toVersion2(tiipDict)))
         else:
             raise ValueError('Incorrect tiip version. Can only handle versions: tiip.2.0 and tiip.3.0')
@@ -46,6 +46,10 @@ setup(
     install_requires=[
         'python-dateutil'
     ],
+    extras_require={
+        'batch': ['numpy'],
+        'orjson': ['orjson']
+    },
     classifiers=[
         'Development Status :: 5 - Production/Stable',
         'Intended Audience :: Developers',
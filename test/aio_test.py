@@ -0,0 +1,90 @@
+import asyncio
+import socket
+import struct
+import unittest
+
+from pytiip.aio import LENGTH_PREFIXED, NEWLINE, TIIPStreamReader, TIIPStreamWriter
+from pytiip.tiip import TIIPMessage
+
+
+async def connectedPair():
+    """
+    @return: reader, writer and the unused writer of the reading side, which must be kept referenced since
+        garbage collecting a StreamWriter closes its transport
+    """
+    a, b = socket.socketpair()
+    reader, readerSideWriter = await asyncio.open_connection(sock=a)
+    _, writer = await asyncio.open_connection(sock=b)
+    return reader, writer, readerSideWriter
+
+
+class TestAio(unittest.TestCase):
+
+    def generateMessages(self, count):
+        return [TIIPMessage(mid=u'mid%d' % i, sig=u'testSignal', pl=[i, u'åäö']) for i in range(count)]
+
+    def roundTrip(self, framing):
+        tiipMsgs = self.generateMessages(200)
+
+        async def run():
+            reader, writer, peer = await connectedPair()
+            tiipWriter = TIIPStreamWriter(writer, framing, highWater=512)
+
+            async def produce():
+                for tiipMsg in tiipMsgs:
+                    await tiipWriter.send(tiipMsg)
+                await tiipWriter.close()
+
+            producer = asyncio.ensure_future(produce())
+            received = [tiipMsg async for tiipMsg in TIIPStreamReader(reader, framing)]
+            await producer
+            return received
+
+        received = asyncio.run(run())
+        self.assertEqual([dict(m) for m in received], [dict(m) for m in tiipMsgs])
+
+    def test000_newline(self):
+        self.roundTrip(NEWLINE)
+
+    def test001_lengthPrefixed(self):
+        self.roundTrip(LENGTH_PREFIXED)
+
+    def test002_buffering(self):
+        async def run():
+            reader, writer, peer = await connectedPair()
+            tiipWriter = TIIPStreamWriter(writer)
+            tiipWriter.write(self.generateMessages(1)[0])
+            self.assertGreater(tiipWriter.buffered, 0)
+            await tiipWriter.drain()
+            self.assertEqual(tiipWriter.buffered, 0)
+            tiipWriter.writeFrame(b'{"pv": "tiip.3.0", "sig": "forwarded"}')
+            await tiipWriter.close()
+            return [tiipMsg.sig async for tiipMsg in TIIPStreamReader(reader)]
+
+        self.assertEqual(asyncio.run(run()), [u'testSignal', u'forwarded'])
+
+    def test003_maxFrameSize(self):
+        async def run(framing, data):
+            reader, writer, peer = await connectedPair()
+            writer.write(data)
+            writer.close()
+            return await TIIPStreamReader(reader, framing, maxFrameSize=64).read()
+
+        with self.assertRaises(ValueError):
+            asyncio.run(run(NEWLINE, b'{"pv": "tiip.3.0", "sig": "' + b'x' * 100 + b'"}\n'))
+        with self.assertRaises(ValueError):
+            asyncio.run(run(LENGTH_PREFIXED, struct.pack('>I', 100) + b'x' * 100))
+        with self.assertRaises(ValueError):
+            asyncio.run(run(LENGTH_PREFIXED, struct.pack('>I', 10) + b'{}'))
+        self.assertIsNone(asyncio.run(run(NEWLINE, b'\n \n')))
+        self.assertEqual(asyncio.run(run(NEWLINE, b'{"pv": "tiip.3.0", "sig": "last"}')).sig, u'last')
+
+    def test004_framing(self):
+        with self.assertRaises(ValueError):
+            TIIPStreamReader(None, 'unknownFraming')
+        with self.assertRaises(ValueError):
+            TIIPStreamWriter(None, 'unknownFraming')
+
+
+if __name__ == "__main__":
+    unittest.main()
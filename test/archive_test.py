@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from datetime import datetime as dt
+
+from pytiip.archive import TIIPArchive
+from pytiip.ndjson import readMessages
+from pytiip.tiip import TIIPMessage
+
+
+class TestTIIPArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'archive.ndjson')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def generateMessage(self, second, sig=u'temp', **kwargs):
+        return TIIPMessage(ts=u'2000-01-01T00:00:%02d.000000Z' % second, sig=sig, pl=[second], **kwargs)
+
+    def fill(self, archive):
+        for second in range(0, 60, 2):
+            archive.append(self.generateMessage(second, sig=u'temp' if second % 4 else u'hum', ch=u'c%d' % (second % 3),
+                                                src=[u'dev', u'%d' % (second % 5)]))
+
+    def test000_query(self):
+        with TIIPArchive(self.path) as archive:
+            self.fill(archive)
+            self.assertEqual(len(archive), 30)
+            self.assertEqual([m.pl[0] for m in archive.query(u'2000-01-01T00:00:10.000000Z', dt(2000, 1, 1, 0, 0, 20))],
+                             [10, 12, 14, 16, 18])
+            self.assertEqual([m.pl[0] for m in archive.query(end=50)], [])  # Microseconds since the epoch
+            self.assertEqual([m.pl[0] for m in archive.query(end=u'2000-01-01T00:00:05.000000Z', sig=u'hum')], [0, 4])
+            self.assertEqual([m.pl[0] for m in archive.query(sig=u'temp', ch=u'c0', src=[u'dev', u'1'])], [6])
+            self.assertEqual(list(archive.query(sig=u'unknown')), [])
+            self.assertEqual(len(list(archive.query())), 30)
+
+    def test001_queryRaw(self):
+        with TIIPArchive(self.path) as archive:
+            self.fill(archive)
+            records = list(archive.queryRaw(sig=u'hum'))
+            self.assertIsInstance(records[0], memoryview)
+            self.assertEqual(dict(TIIPMessage(tiipStr=bytes(records[0]))), dict(next(iter(archive))))
+            del records
+
+    def test002_reopen(self):
+        with TIIPArchive(self.path) as archive:
+            self.fill(archive)
+        with TIIPArchive(self.path) as archive:
+            self.assertEqual(len(archive), 30)
+            self.assertEqual([m.pl[0] for m in archive.query(sig=u'hum', start=u'2000-01-01T00:00:50.000000Z')], [52, 56])
+            archive.append(self.generateMessage(59, sig=u'new'))
+            self.assertEqual([m.pl[0] for m in archive.query(sig=u'new')], [59])
+        # The record file is a plain NDJSON log
+        with open(self.path, 'rb') as f:
+            self.assertEqual(len(list(readMessages(f))), 31)
+
+    def test003_outOfOrder(self):
+        with TIIPArchive(self.path) as archive:
+            for second in [5, 1, 3, 2, 4]:
+                archive.append(self.generateMessage(second))
+            self.assertEqual([m.pl[0] for m in archive.query(start=u'2000-01-01T00:00:02.000000Z')], [2, 3, 4, 5])
+            self.assertEqual([m.pl[0] for m in archive], [5, 1, 3, 2, 4])
+        with TIIPArchive(self.path) as archive:
+            self.assertEqual([m.pl[0] for m in archive.query(end=u'2000-01-01T00:00:03.000000Z')], [1, 2])
+
+    def test004_empty(self):
+        with TIIPArchive(self.path) as archive:
+            self.assertEqual(len(archive), 0)
+            self.assertEqual(list(archive.query()), [])
+            self.assertEqual(list(archive), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
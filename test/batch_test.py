@@ -0,0 +1,96 @@
+import array
+import unittest
+
+from datetime import datetime as dt
+
+from pytiip.batch import TIIPBatch, numpy
+from pytiip.tiip import TIIPMessage
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class TestTIIPBatch(unittest.TestCase):
+
+    def generateMessages(self):
+        return [
+            TIIPMessage(ts=u'2000-01-01T00:00:03.000000Z', lat=0.5, sig=u'temp', ch=u'a', pl=[1.5, 2.0]),
+            TIIPMessage(ts=u'2000-01-01T00:00:01.000000Z', sig=u'temp', ch=u'b', ten=u't1', pl=[3.0, 4.0]),
+            TIIPMessage(ts=u'2000-01-01T00:00:02.500Z', sig=u'hum', type=u'pub', src=[u's1'], pl=[5.0, 6.0]),
+        ]
+
+    def test000_columns(self):
+        tiipMsgs = self.generateMessages()
+        batch = TIIPBatch([tiipMsgs[0], str(tiipMsgs[1]), str(tiipMsgs[2]).encode('utf-8')])
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(batch.ts.dtype, numpy.dtype('datetime64[us]'))
+        self.assertEqual(batch.ts[2], numpy.datetime64('2000-01-01T00:00:02.500000'))
+        self.assertEqual(batch.lat[0], 0.5)
+        self.assertTrue(numpy.isnan(batch.lat[1]))
+        self.assertEqual(batch.sig.categories, [u'temp', u'hum'])
+        self.assertEqual(batch.sig.codes.tolist(), [0, 0, 1])
+        self.assertEqual(batch.ten.codes.tolist(), [-1, 0, -1])
+        self.assertEqual(batch.pl.shape, (3, 2))
+        self.assertEqual(batch.pl.dtype, numpy.float64)
+
+    def test001_objectPayload(self):
+        tiipMsgs = self.generateMessages()
+        tiipMsgs[1].pl = [u'text']
+        tiipMsgs[2].pl = None
+        batch = TIIPBatch(tiipMsgs)
+        self.assertEqual(batch.pl.dtype, object)
+        self.assertEqual(batch.pl.tolist(), [[1.5, 2.0], [u'text'], None])
+
+    def test002_filter(self):
+        batch = TIIPBatch(self.generateMessages())
+        self.assertEqual(len(batch.filter(sig=u'temp')), 2)
+        self.assertEqual(len(batch.filter(sig=[u'temp', u'hum'], ch=u'b')), 1)
+        self.assertEqual(len(batch.filter(sig=u'unknown')), 0)
+        window = batch.filter(start=u'2000-01-01T00:00:02.000000Z', end=dt(2000, 1, 1, 0, 0, 3))
+        self.assertEqual(window.sig.tolist(), [u'hum'])
+        with self.assertRaises(TypeError):
+            batch.where(mid=u'x')
+
+    def test003_sortAndConvert(self):
+        tiipMsgs = self.generateMessages()
+        batch = TIIPBatch(tiipMsgs).sortByTime()
+        self.assertEqual(batch.ch.tolist(), [u'b', None, u'a'])
+        converted = batch.toMessages()
+        self.assertEqual([m.ts for m in converted], [
+            u'2000-01-01T00:00:01.000000Z', u'2000-01-01T00:00:02.500000Z', u'2000-01-01T00:00:03.000000Z'])
+        expected = dict(tiipMsgs[2], ts=u'2000-01-01T00:00:02.500000Z')
+        self.assertEqual(dict(converted[1]), expected)
+        self.assertEqual(dict(converted[2]), dict(tiipMsgs[0]))
+
+    def test004_slice(self):
+        batch = TIIPBatch(self.generateMessages())
+        self.assertEqual(batch[1:].sig.tolist(), [u'temp', u'hum'])
+        self.assertEqual(len(TIIPBatch()), 0)
+
+    def test005_arrayPayload(self):
+        tiipMsgs = self.generateMessages()
+        tiipMsgs[0].pl = numpy.array([1.5, 2.0], dtype=numpy.float32)
+        tiipMsgs[1].pl = array.array('d', [3.0, 4.0])
+        batch = TIIPBatch(tiipMsgs)
+        self.assertEqual(batch.pl.dtype, numpy.float64)
+        self.assertEqual(batch.pl.tolist(), [[1.5, 2.0], [3.0, 4.0], [5.0, 6.0]])
+
+    def test006_filterAbsentValue(self):
+        tiipMsgs = self.generateMessages()
+        tiipMsgs[1].sig = None
+        tiipMsgs[2].sig = None
+        batch = TIIPBatch(tiipMsgs)
+        self.assertEqual(batch.where(sig=u'doesNotExist').tolist(), [False, False, False])
+        self.assertEqual(len(batch.filter(sig=u'doesNotExist')), 0)
+        self.assertEqual(len(batch.filter(sig=[u'doesNotExist', u'temp'])), 1)
+        self.assertEqual(batch.where(sig=None).tolist(), [False, True, True])
+
+    def test007_integerPayload(self):
+        batch = TIIPBatch([TIIPMessage(pl=[1, 2]), TIIPMessage(pl=numpy.array([3, 4], dtype=numpy.int32))])
+        self.assertEqual(batch.pl.dtype, numpy.int64)
+        self.assertEqual(batch.toMessages()[0].pl, [1, 2])
+        self.assertIn('"pl":[1,2]', str(batch.toMessages()[0]).replace(' ', ''))
+        self.assertEqual(TIIPBatch([TIIPMessage(pl=[1, 2]), TIIPMessage(pl=[3, 4.5])]).pl.dtype, numpy.float64)
+        self.assertEqual(TIIPBatch([TIIPMessage(pl=[2 ** 64])]).pl.dtype, object)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import array
+import unittest
+
+from pytiip import binary
+from pytiip.tiip import TIIPMessage
+
+
+class TestBinary(unittest.TestCase):
+
+    def generateExampleTIIPMessage(self):
+        return TIIPMessage(
+            ts=u'2000-01-01T01:23:45.678901Z', lat=u'0.25', mid=u'testMid', sid=u'testSid', type=u'pub',
+            src=[u'testSource1', u'testSource2'], targ=[u'testTarget'], sig=u'testSignal', ch=u'testChannel',
+            arg={u'a': 1, u'b': [None, True, False, 1.5, u'åäö'], u'c': {u'd': -2 ** 70}},
+            pl=[1.0, 2, -3, u'x', [], {}], ok=False, ten=u'testTenant')
+
+    def test000_roundTrip(self):
+        tiipMsg = self.generateExampleTIIPMessage()
+        encoded = binary.encode(tiipMsg)
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual(dict(binary.decode(encoded)), dict(tiipMsg))
+        self.assertEqual(dict(binary.decode(bytearray(encoded))), dict(tiipMsg))
+        self.assertEqual(dict(binary.decode(memoryview(encoded))), dict(tiipMsg))
+
+    def test001_minimal(self):
+        tiipMsg = TIIPMessage()
+        self.assertEqual(dict(binary.decode(binary.encode(tiipMsg))), dict(tiipMsg))
+        self.assertEqual(len(binary.encode(tiipMsg)), 11)
+
+    def test002_nonCanonicalValues(self):
+        tiipMsg = TIIPMessage(ts=u'2000-01-01T01:23:45.678Z', lat=u'0.50', ok=True)
+        decoded = binary.decode(binary.encode(tiipMsg))
+        self.assertEqual(decoded.ts, u'2000-01-01T01:23:45.678Z')
+        self.assertEqual(decoded.lat, u'0.50')
+        self.assertEqual(decoded.ok, True)
+
+    def test003_smallerThanJson(self):
+        tiipMsg = self.generateExampleTIIPMessage()
+        self.assertLess(len(binary.encode(tiipMsg)), len(str(tiipMsg).encode('utf-8')))
+
+    def test004_floatList(self):
+        tiipMsg = TIIPMessage(pl=[0.1 * i for i in range(100)])
+        encoded = binary.encode(tiipMsg)
+        self.assertLess(len(encoded), 100 * 8 + 20)
+        self.assertEqual(binary.decode(encoded).pl, tiipMsg.pl)
+
+    def test005_incorrect(self):
+        encoded = binary.encode(self.generateExampleTIIPMessage())
+        with self.assertRaises(ValueError):
+            binary.decode(encoded[:-3])
+        with self.assertRaises(ValueError):
+            binary.decode(b'X' + encoded[1:])
+        with self.assertRaises(ValueError):
+            binary.decode(encoded[:2] + b'\xff')
+        with self.assertRaises(ValueError):
+            binary.decode(encoded + b'\x00')
+        tiipMsg = TIIPMessage(pl=[object()])
+        with self.assertRaises(TypeError):
+            binary.encode(tiipMsg)
+        # Values are validated by the setters
+        with self.assertRaises(TypeError):
+            binary.decode(binary.encode(TIIPMessage()) + b'\x0a\x03' + b'\x00' * 8)
+
+    def test006_arrayPayload(self):
+        values = array.array('i', range(-50, 50))
+        encoded = binary.encode(TIIPMessage(pl=values))
+        self.assertLess(len(encoded), 100 * values.itemsize + 20)
+        decoded = binary.decode(encoded)
+        self.assertEqual(decoded.pl, values)
+        self.assertEqual(decoded.pl.itemsize, values.itemsize)
+        self.assertEqual(binary.decode(binary.encode(TIIPMessage(pl=memoryview(values)))).pl, values)
+
+
+if __name__ == "__main__":
+    unittest.main()
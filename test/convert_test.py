@@ -0,0 +1,79 @@
+import io
+import json
+import unittest
+
+from datetime import datetime as dt
+
+from pytiip.convert import convert, convertMany, convertStream
+from pytiip.tiip import TIIPMessage
+from pytiip import tiip
+
+
+class TestConvert(unittest.TestCase):
+
+    def test000_fromVersion2(self):
+        tiip2Dict = {'pv': 'tiip.2.0', 'ts': '1556099778.77', 'ct': '1556099734.255', 'sig': 'testSignal'}
+        tiip3Dict = convert(tiip2Dict, 'tiip.3.0')
+        self.assertEqual(tiip2Dict['ts'], '1556099778.77')  # Input is not modified
+        self.assertEqual(tiip3Dict['pv'], tiip.__version__)
+        self.assertEqual(tiip3Dict['ts'], dt.utcfromtimestamp(1556099734.255).isoformat(timespec='microseconds') + 'Z')
+        self.assertAlmostEqual(float(tiip3Dict['lat']), 44.515, 5)
+        self.assertNotIn('ct', tiip3Dict)
+        self.assertEqual(tiip3Dict['sig'], 'testSignal')
+
+        self.assertEqual(convert({'pv': 'tiip.2.0', 'ts': 0.5}, 'tiip.3.0')['ts'], '1970-01-01T00:00:00.500000Z')
+        self.assertEqual(convert({'pv': 'tiip.2.0', 'ts': '-1.25'}, 'tiip.3.0')['ts'], '1969-12-31T23:59:58.750000Z')
+        self.assertEqual(convert({'pv': 'tiip.2.0', 'ts': '1e3'}, 'tiip.3.0')['ts'], '1970-01-01T00:16:40.000000Z')
+
+    def test001_toVersion2(self):
+        tiip3Dict = {'pv': tiip.__version__, 'ts': '2019-04-24T09:55:34.255000Z', 'lat': '44.515'}
+        tiip2Dict = convert(tiip3Dict, 'tiip.2.0')
+        self.assertEqual(tiip3Dict['ts'], '2019-04-24T09:55:34.255000Z')
+        self.assertEqual(tiip2Dict, {'pv': 'tiip.2.0', 'ct': '1556099734.255', 'ts': str(1556099734.255 + 44.515)})
+        self.assertEqual(convert(convert(tiip2Dict, 'tiip.3.0'), 'tiip.2.0')['ct'], '1556099734.255')
+
+    def test002_sameAsTIIPMessage(self):
+        tiip2String = '{"pv": "tiip.2.0", "ts": "1556099778.77", "ct": "1556099734.255"}'
+        tiipMessage = TIIPMessage(tiip2String, verifyVersion=False)
+        self.assertEqual(dict(tiipMessage), convert(json.loads(tiip2String), 'tiip.3.0'))
+        self.assertEqual(json.loads(tiipMessage.asVersion('tiip.2.0')), convert(dict(tiipMessage), 'tiip.2.0'))
+
+    def test003_convertMany(self):
+        tiipDicts = [{'pv': 'tiip.2.0', 'ts': '1.5'}, {'pv': tiip.__version__, 'ts': '1970-01-01T00:00:02.000000Z'}]
+        self.assertEqual([d['ts'] for d in convertMany(tiipDicts, 'tiip.2.0')], ['1.5', '2.0'])
+        self.assertEqual(
+            [d['ts'] for d in convertMany(tiipDicts, 'tiip.3.0')],
+            ['1970-01-01T00:00:01.500000Z', '1970-01-01T00:00:02.000000Z'])
+        with self.assertRaises(ValueError):
+            convertMany(tiipDicts, 'tiip.1.0')
+        with self.assertRaises(ValueError):
+            convert({'pv': 'tiip.1.0'}, 'tiip.3.0')
+
+    def test004_convertStream(self):
+        lines = [json.dumps({'pv': 'tiip.2.0', 'ts': str(1556099734 + i), 'sig': 's%d' % i}) for i in range(50)]
+        infile = io.BytesIO('\n'.join(lines).encode('utf-8'))
+        outfile = io.BytesIO()
+        self.assertEqual(convertStream(infile, outfile, 'tiip.3.0', chunkSize=64, bufferSize=128), 50)
+        tiipMsgs = [TIIPMessage(tiipStr=line) for line in outfile.getvalue().splitlines()]
+        self.assertEqual(tiipMsgs[1].ts, '2019-04-24T09:55:35.000000Z')
+        self.assertEqual(tiipMsgs[49].sig, 's49')
+
+    def test005_timeStampRange(self):
+        for ts in ('1e20', 'inf', '-inf', 'nan', '-1e13', 1e300):
+            with self.assertRaises(ValueError):
+                convert({'pv': 'tiip.2.0', 'ts': ts}, 'tiip.3.0')
+        with self.assertRaises(ValueError):
+            convert({'pv': 'tiip.2.0', 'ts': '1.0', 'ct': '1e20'}, 'tiip.3.0')
+        self.assertEqual(
+            convert({'pv': 'tiip.2.0', 'ts': '253402300799.5'}, 'tiip.3.0')['ts'], '9999-12-31T23:59:59.500000Z')
+        # A bad ts is reported like any other invalid message
+        lines = ['{"pv": "tiip.2.0", "ts": "1e20"}', '{"pv": "tiip.2.0", "ts": "1.0"}']
+        errors = []
+        tiipMsgs = TIIPMessage.decodeMany(lines, verifyVersion=False, errors=errors)
+        self.assertEqual([m.ts for m in tiipMsgs], ['1970-01-01T00:00:01.000000Z'])
+        self.assertEqual([index for index, _ in errors], [0])
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import unittest
+
+from pytiip.correlation import CorrelationTable
+from pytiip.tiip import TIIPMessage
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCorrelationTable(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.table = CorrelationTable(clock=self.clock)
+        self.completed = []
+
+    def callback(self, request, reply, roundTrip):
+        self.completed.append((request.mid, reply, roundTrip))
+
+    def test000_resolve(self):
+        request = TIIPMessage(type=u'req', mid=u'm1', sig=u'get')
+        self.assertEqual(self.table.register(request, 5.0, self.callback), 105.0)
+        self.assertIn(u'm1', self.table)
+        self.clock.now += 0.25
+        reply = TIIPMessage(type=u'rep', mid=u'm1', ok=True)
+        self.assertEqual(self.table.resolve(reply), 0.25)
+        self.assertEqual(self.completed, [(u'm1', reply, 0.25)])
+        self.assertIsNone(self.table.resolve(reply))
+        self.assertIsNone(self.table.resolve(TIIPMessage(mid=u'unknown')))
+        self.assertEqual((len(self.table), self.table.resolved, self.table.expired), (0, 1, 0))
+        self.clock.now += 10
+        self.assertEqual(self.table.expire(), 0)
+        self.assertEqual(len(self.completed), 1)
+
+    def test001_expire(self):
+        for i, timeout in enumerate([3.0, 1.0, 2.0, 1.0]):
+            self.table.register(TIIPMessage(mid=u'm%d' % i), timeout, self.callback)
+        self.table.resolve(TIIPMessage(mid=u'm1'))
+        self.assertEqual(self.table.nextDeadline(), 101.0)
+        self.assertEqual(self.table.expire(101.5), 1)
+        self.assertEqual(self.completed[-1], (u'm3', None, None))
+        self.assertEqual(self.table.nextDeadline(), 102.0)
+        self.clock.now = 103.0
+        self.assertEqual(self.table.expire(), 2)
+        self.assertEqual([mid for mid, _, _ in self.completed], [u'm1', u'm3', u'm2', u'm0'])
+        self.assertEqual((len(self.table), self.table.resolved, self.table.expired), (0, 1, 3))
+        self.assertIsNone(self.table.nextDeadline())
+
+    def test002_registerErrors(self):
+        with self.assertRaises(ValueError):
+            self.table.register(TIIPMessage(), 1.0)
+        self.table.register(TIIPMessage(mid=u'm'), 1.0)
+        with self.assertRaises(ValueError):
+            self.table.register(TIIPMessage(mid=u'm'), 1.0)
+        self.assertTrue(self.table.cancel(u'm'))
+        self.assertFalse(self.table.cancel(u'm'))
+        self.table.register(TIIPMessage(mid=u'm'), 1.0, self.callback)
+        self.clock.now += 2
+        self.assertEqual(self.table.expire(), 1)
+        self.assertEqual(self.completed, [(u'm', None, None)])
+
+    def test003_compaction(self):
+        count = 5000
+        for i in range(count):
+            self.table.register(TIIPMessage(mid=u'm%d' % i), 60.0 + i, self.callback)
+        for i in range(count - 1):
+            self.table.resolve(TIIPMessage(mid=u'm%d' % i))
+        self.assertLess(len(self.table._CorrelationTable__deadlines), 2 * 1024 + 2)
+        self.assertEqual(self.table.nextDeadline(), 100.0 + 60.0 + count - 1)
+
+    def test004_callbackDuringExpire(self):
+        # A callback completing other requests while expire pops the heap
+        def resolveAll(request, reply, roundTrip):
+            self.completed.append(request.mid)
+            for i in range(3000):
+                self.table.resolve(TIIPMessage(mid=u'm%d' % i))
+
+        self.table.register(TIIPMessage(mid=u'first'), 1.0, resolveAll)
+        for i in range(3000):
+            self.table.register(TIIPMessage(mid=u'm%d' % i), 2.0 + i)
+        self.table.register(TIIPMessage(mid=u'last'), 1.5, self.callback)
+        self.assertEqual(self.table.expire(102.0), 2)
+        self.assertEqual(self.completed, [u'first', (u'last', None, None)])
+        self.assertEqual(len(self.table), 0)
+
+    def test005_futures(self):
+        async def run():
+            table = CorrelationTable()
+            expiry = asyncio.ensure_future(table.runExpiry(resolution=0.01))
+            sent = []
+
+            async def send(request):
+                sent.append(request)
+                asyncio.get_running_loop().call_soon(table.resolve, TIIPMessage(type=u'rep', mid=request.mid))
+
+            reply, roundTrip = await table.request(TIIPMessage(type=u'req', mid=u'a'), 5.0, send)
+            self.assertEqual(reply.mid, u'a')
+            self.assertGreaterEqual(roundTrip, 0.0)
+            with self.assertRaises(asyncio.TimeoutError):
+                await table.registerFuture(TIIPMessage(mid=u'b'), 0.02)
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(table.registerFuture(TIIPMessage(mid=u'c'), 60.0), 0.01)
+            self.assertNotIn(u'c', table)
+            expiry.cancel()
+            return table
+
+        table = asyncio.run(run())
+        self.assertEqual((table.resolved, table.expired, len(table)), (1, 1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import array
+import io
+import json
+import unittest
+
+from pytiip import delta, ndjson
+from pytiip.tiip import TIIPMessage
+
+
+class TestDelta(unittest.TestCase):
+
+    def generateMessages(self, count=50):
+        tiipMsgs = []
+        for i in range(count):
+            tiipMsgs.append(TIIPMessage(
+                ts=u'2019-04-24T09:36:%02d.%06dZ' % (i // 10, (i % 10) * 100000), type=u'pub', src=[u'device42'],
+                sig=(u'temp', u'hum')[i % 2], ch=u'sensors', ten=u'acme', pl=[20.0 + i * 0.25, float(i)]))
+        tiipMsgs[3].ts = u'2019-04-24T09:36:00.5Z'
+        tiipMsgs[5].ten = None
+        tiipMsgs[7].arg = {u'unit': u'C'}
+        tiipMsgs[8].arg = {u'unit': u'C'}
+        tiipMsgs[9].pl = array.array('d', [1.0, 2.0])
+        tiipMsgs[10].ok = True
+        tiipMsgs[11].mid = u'm1'
+        tiipMsgs[12].lat = 0.25
+        return tiipMsgs
+
+    def assertSameMessages(self, decoded, tiipMsgs):
+        self.assertEqual([json.loads(str(m)) for m in decoded], [json.loads(str(m)) for m in tiipMsgs])
+
+    def test000_roundTrip(self):
+        tiipMsgs = self.generateMessages()
+        for compression in delta.COMPRESSIONS:
+            if compression == 'lzma' and delta.lzma is None:
+                continue
+            encoded = io.BytesIO()
+            self.assertEqual(delta.writeMessages(encoded, tiipMsgs, compression, resyncInterval=7), 50)
+            encoded.seek(0)
+            self.assertSameMessages(list(delta.readMessages(encoded, chunkSize=5)), tiipMsgs)
+            encoded.seek(0)
+            self.assertSameMessages(list(delta.readMessages(encoded, trusted=True)), tiipMsgs)
+
+    def test001_smallerThanNdjson(self):
+        tiipMsgs = self.generateMessages(500)
+        plain = io.BytesIO()
+        ndjson.writeMessages(plain, tiipMsgs)
+        encoded = io.BytesIO()
+        delta.writeMessages(encoded, tiipMsgs)
+        self.assertLess(len(encoded.getvalue()) * 3, len(plain.getvalue()))
+        compressed = io.BytesIO()
+        delta.writeMessages(compressed, tiipMsgs, 'zlib')
+        self.assertLess(len(compressed.getvalue()), len(encoded.getvalue()))
+
+    def test002_sharedValues(self):
+        # Decoded messages never share mutable values
+        decoder = delta.DeltaDecoder()
+        encoder = delta.DeltaEncoder()
+        first, second = decoder.feed(encoder.encode(TIIPMessage(src=[u'a'])) + encoder.encode(TIIPMessage(src=[u'a'])))
+        first.src.append(u'b')
+        self.assertEqual(second.src, [u'a'])
+
+    def test003_resync(self):
+        tiipMsgs = self.generateMessages()
+        encoder = delta.DeltaEncoder('zlib')
+        head = encoder.encode(tiipMsgs[0]) + encoder.encode(tiipMsgs[1])
+        encoder.resync()
+        rest = b''.join(encoder.encode(tiipMsg) for tiipMsg in tiipMsgs[2:]) + encoder.close()
+        # A new decoder can start at the resync point, given the stream header
+        decoder = delta.DeltaDecoder()
+        decoded = decoder.feed(head[:8] + rest[rest.index(b'\x00\x00\xff\xff') + 4:])
+        self.assertSameMessages(decoded, tiipMsgs[2:])
+
+    def test004_flush(self):
+        encoder = delta.DeltaEncoder('zlib')
+        decoder = delta.DeltaDecoder()
+        tiipMsg = self.generateMessages()[0]
+        self.assertEqual(decoder.feed(encoder.encode(tiipMsg)), [])
+        self.assertSameMessages(decoder.feed(encoder.flush()), [tiipMsg])
+        decoder.feed(encoder.close())
+        decoder.close()
+        with self.assertRaises(ValueError):
+            encoder.encode(tiipMsg)
+
+    def test005_incorrect(self):
+        encoded = io.BytesIO()
+        delta.writeMessages(encoded, self.generateMessages())
+        data = encoded.getvalue()
+        with self.assertRaises(ValueError):
+            delta.DeltaDecoder().feed(b'XX' + data[2:])
+        with self.assertRaises(ValueError):
+            delta.DeltaDecoder().feed(data[:3] + b'\x09' + data[4:])
+        decoder = delta.DeltaDecoder()
+        decoder.feed(data[:-3])
+        with self.assertRaises(ValueError):
+            decoder.close()
+        with self.assertRaises(ValueError):
+            delta.DeltaEncoder('bz2')
+        with self.assertRaises(ValueError):
+            delta.DeltaEncoder(dictionarySize=-1)
+
+    def test006_dictionarySize(self):
+        # More distinct values than the dictionaries hold, without resync records
+        tiipMsgs = [TIIPMessage(ts=u'2019-04-24T09:36:00.000000Z', sig=u'signal%d' % (i % 5), pl=[i])
+                    for i in range(40)]
+        encoded = io.BytesIO()
+        delta.writeMessages(encoded, tiipMsgs, resyncInterval=None, dictionarySize=2)
+        data = encoded.getvalue()
+        self.assertEqual(data[4:8], b'\x00\x00\x00\x02')
+        decoder = delta.DeltaDecoder()
+        self.assertSameMessages(decoder.feed(data), tiipMsgs)
+        self.assertEqual(len(decoder._DeltaDecoder__dictionaries['sig']), 2)
+        unlimited = io.BytesIO()
+        delta.writeMessages(unlimited, tiipMsgs, resyncInterval=None)
+        self.assertLess(len(unlimited.getvalue()), len(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import unittest
+
+from pytiip import convert, instrument
+from pytiip.lazy import LazyTIIPMessage
+from pytiip.tiip import TIIPMessage
+
+TS = '2016-01-01T12:00:00.000000Z'
+MSG = '{"pv":"tiip.3.0","ts":"' + TS + '","type":"pub","sig":"temp","pl":[1]}'
+
+
+class TestInstrument(unittest.TestCase):
+
+    def tearDown(self):
+        instrument.disable()
+
+    def test000_enableDisable(self):
+        setter = TIIPMessage.__dict__['ts']
+        loadFromStr = TIIPMessage.loadFromStr
+        sink = instrument.MemorySink()
+        instrument.enable(sink)
+        self.assertTrue(instrument.isEnabled())
+        self.assertIsNot(TIIPMessage.__dict__['ts'], setter)
+        instrument.enable(sink)
+        instrument.disable()
+        self.assertFalse(instrument.isEnabled())
+        self.assertIs(TIIPMessage.__dict__['ts'], setter)
+        self.assertIs(TIIPMessage.loadFromStr, loadFromStr)
+        TIIPMessage(MSG)
+        self.assertEqual(sink.snapshot(), {'counters': {}, 'histograms': {}})
+
+    def test001_decodeEncode(self):
+        sink = instrument.MemorySink()
+        instrument.enable(sink)
+        msg = TIIPMessage(MSG)
+        self.assertEqual(msg.sig, 'temp')
+        msgs = TIIPMessage.decodeMany([MSG, MSG])
+        self.assertEqual(len(msgs), 2)
+        msg.toStr()
+        msg.toBytes()
+        snapshot = sink.snapshot()
+        self.assertEqual(snapshot['counters'][('decoded_messages_total', ())], 3)
+        self.assertEqual(snapshot['histograms'][('decode_seconds', ())]['count'], 2)
+        self.assertEqual(snapshot['histograms'][('load_dict_seconds', ())]['count'], 3)
+        self.assertEqual(snapshot['histograms'][('encode_seconds', (('format', 'str'),))]['count'], 1)
+        self.assertEqual(snapshot['histograms'][('encode_seconds', (('format', 'bytes'),))]['count'], 1)
+        self.assertGreaterEqual(snapshot['histograms'][('validate_ts_seconds', ())]['count'], 3)
+
+    def test002_validationFailures(self):
+        sink = instrument.MemorySink()
+        instrument.enable(sink)
+        msg = TIIPMessage()
+        self.assertRaises(ValueError, setattr, msg, 'ts', 'yesterday')
+        self.assertRaises(TypeError, setattr, msg, 'pl', 'text')
+        self.assertRaises(TypeError, TIIPMessage.decodeMany, ['{"pv":"tiip.3.0","sig":5}'])
+        errors = []
+        TIIPMessage.decodeMany(['{"pv":"tiip.3.0","sig":5}', MSG], errors=errors)
+        self.assertEqual(len(errors), 1)
+        counters = sink.snapshot()['counters']
+        self.assertEqual(counters[('validation_failures_total', (('key', 'ts'),))], 1)
+        self.assertEqual(counters[('validation_failures_total', (('key', 'pl'),))], 1)
+        self.assertEqual(counters[('validation_failures_total', (('key', 'sig'),))], 2)
+
+    def test003_conversions(self):
+        sink = instrument.MemorySink()
+        instrument.enable(sink)
+        msg = TIIPMessage('{"pv":"tiip.2.0","ts":"1451649600.0","type":"pub"}', verifyVersion=False)
+        msg.asVersion('tiip.2.0')
+        msg.asVersion('tiip.3.0')
+        histograms = sink.snapshot()['histograms']
+        self.assertEqual(histograms[('version_conversion_seconds', (('to', 'tiip.3.0'),))]['count'], 1)
+        self.assertEqual(histograms[('version_conversion_seconds', (('to', 'tiip.2.0'),))]['count'], 1)
+        self.assertEqual(histograms[('convert_seconds', (('version', 'tiip.2.0'),))]['count'], 1)
+        self.assertEqual(histograms[('convert_seconds', (('version', 'tiip.3.0'),))]['count'], 1)
+
+    def test004_lazy(self):
+        sink = instrument.MemorySink()
+        instrument.enable(sink)
+        msg = LazyTIIPMessage(MSG)
+        self.assertRaises(TypeError, setattr, msg, 'sig', 5)
+        self.assertEqual(sink.snapshot()['counters'][('validation_failures_total', (('key', 'sig'),))], 1)
+
+    def test005_callbackSink(self):
+        counts = []
+        observed = []
+        instrument.enable(instrument.CallbackSink(
+            lambda name, value, labels: counts.append((name, value)),
+            lambda name, seconds, labels: observed.append(name)))
+        TIIPMessage(MSG)
+        self.assertIn(('decoded_messages_total', 1), counts)
+        self.assertIn('decode_seconds', observed)
+        self.assertIn('load_dict_seconds', observed)
+
+    def test006_prometheus(self):
+        sink = instrument.MemorySink(buckets=(0.5, 1.0))
+        sink.count('validation_failures_total', 2, {'key': 'ts'})
+        sink.observe('decode_seconds', 0.25)
+        sink.observe('decode_seconds', 0.75)
+        sink.observe('decode_seconds', 2.0)
+        self.assertEqual(sink.toPrometheus(), '\n'.join([
+            '# TYPE pytiip_validation_failures_total counter',
+            'pytiip_validation_failures_total{key="ts"} 2',
+            '# TYPE pytiip_decode_seconds histogram',
+            'pytiip_decode_seconds_bucket{le="0.5"} 1',
+            'pytiip_decode_seconds_bucket{le="1.0"} 2',
+            'pytiip_decode_seconds_bucket{le="+Inf"} 3',
+            'pytiip_decode_seconds_sum 3.0',
+            'pytiip_decode_seconds_count 3',
+        ]) + '\n')
+        sink.reset()
+        self.assertEqual(sink.toPrometheus(), '')
+
+    def test007_lazyAndConvert(self):
+        decode = LazyTIIPMessage.__dict__['_decode']
+        fromVersion2 = convert._fromVersion2
+        sink = instrument.MemorySink()
+        instrument.enable(sink)
+        self.assertEqual(LazyTIIPMessage(MSG).sig, 'temp')
+        LazyTIIPMessage(MSG).toStr()  # Decoded to verify the version, then emitted unchanged
+        msg = LazyTIIPMessage(MSG)
+        msg.sig = 'other'
+        msg.toBytes()  # Modified, encoded by TIIPMessage.toBytes
+        convert.convert({'pv': 'tiip.2.0', 'ts': '1451649600.0'}, 'tiip.3.0')
+        convert.convert({'pv': 'tiip.3.0', 'ts': TS}, 'tiip.2.0')
+        snapshot = sink.snapshot()
+        histograms = snapshot['histograms']
+        self.assertEqual(histograms[('decode_seconds', ())]['count'], 3)
+        self.assertEqual(snapshot['counters'][('decoded_messages_total', ())], 3)
+        self.assertEqual(histograms[('encode_seconds', (('format', 'str'),))]['count'], 1)
+        self.assertEqual(histograms[('encode_seconds', (('format', 'bytes'),))]['count'], 1)
+        self.assertEqual(histograms[('version_conversion_seconds', (('to', 'tiip.3.0'),))]['count'], 1)
+        self.assertEqual(histograms[('version_conversion_seconds', (('to', 'tiip.2.0'),))]['count'], 1)
+        instrument.disable()
+        self.assertIs(LazyTIIPMessage.__dict__['_decode'], decode)
+        self.assertIs(convert._fromVersion2, fromVersion2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import json
+import threading
+import unittest
+
+from pytiip.interning import InternPool
+from pytiip.tiip import TIIPMessage
+from pytiip import tiip
+
+
+class TestInternPool(unittest.TestCase):
+
+    def test000_intern(self):
+        pool = InternPool()
+        first = u''.join([u'test', u'Signal'])
+        second = u''.join([u'test', u'Signal'])
+        self.assertIsNot(first, second)
+        self.assertIs(pool.intern(first), first)
+        self.assertIs(pool.intern(second), first)
+        self.assertEqual(pool.internList([second, 1]), [first, 1])
+        self.assertIs(pool.intern(None), None)
+        stats = pool.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (2, 1, 1))
+        self.assertAlmostEqual(pool.hitRate, 2 / 3.0)
+        self.assertGreater(stats['bytesSaved'], 0)
+        pool.clear()
+        self.assertEqual(pool.stats()['hits'], 0)
+        self.assertEqual(len(pool), 0)
+
+    def test001_eviction(self):
+        pool = InternPool(maxSize=2)
+        pool.intern(u'a')
+        pool.intern(u'b')
+        pool.intern(u'a')  # b is now least recently used
+        pool.intern(u'c')
+        self.assertEqual(len(pool), 2)
+        self.assertEqual(pool.stats()['evictions'], 1)
+        pool.intern(u'a')
+        self.assertEqual(pool.stats()['hits'], 2)
+        with self.assertRaises(ValueError):
+            InternPool(maxSize=0)
+
+    def test002_threads(self):
+        pool = InternPool(maxSize=10)
+
+        def work():
+            for i in range(2000):
+                pool.intern(u'value%d' % (i % 20))
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = pool.stats()
+        self.assertEqual(stats['hits'] + stats['misses'], 8000)
+        self.assertLessEqual(len(pool), 10)
+
+    def test003_decode(self):
+        tiipStr = json.dumps({
+            'pv': tiip.__version__, 'ts': '2000-01-01T01:23:45.678901Z', 'sig': 'testSignal', 'src': ['dev', 'x'],
+            'mid': 'testMid'})
+        pool = InternPool()
+        tiip.setInternPool(pool)
+        try:
+            self.assertIs(tiip.getInternPool(), pool)
+            first = TIIPMessage(tiipStr=tiipStr)
+            second = TIIPMessage.decodeMany([tiipStr])[0]
+            tiipDict = json.loads(tiipStr)
+            third = TIIPMessage(tiipDict=tiipDict, trusted=True)
+        finally:
+            tiip.setInternPool(None)
+        self.assertIs(second.sig, first.sig)
+        self.assertIs(third.sig, first.sig)
+        self.assertIs(second.src[0], first.src[0])
+        self.assertIsNot(second.mid, first.mid)
+        self.assertIsNot(third.src, tiipDict['src'])  # The caller's dict is not modified
+        self.assertEqual(dict(third), dict(first))
+        self.assertIsNot(TIIPMessage(tiipStr=tiipStr).sig, first.sig)
+
+
+if __name__ == "__main__":
+    unittest.main()
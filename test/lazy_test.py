@@ -0,0 +1,229 @@
+import json
+import unittest
+
+from pytiip.lazy import LazyTIIPMessage, ROUTING_KEYS, HEADER_KEYS_MIN_SIZE, scanTopLevel
+from pytiip.tiip import TIIPMessage
+from pytiip import lazy, tiip
+
+
+class TestLazyTIIPMessage(unittest.TestCase):
+
+    def __init__(self, methodName='runTest'):
+        unittest.TestCase.__init__(self, methodName)
+        self.tiipDict = {
+            'pv': tiip.__version__,
+            'ts': u'2000-01-01T01:23:45.678901Z',
+            'lat': u'0.5',
+            'mid': u'testMid',
+            'type': u'pub',
+            'src': [u'testSource1', u'testSource2'],
+            'targ': [u'testTarget1', u'testTarget2'],
+            'sig': u'testSignal',
+            'ch': u'testChannel',
+            'arg': {u'testArgument1': u'testArgumentValue1'},
+            'pl': [1.0, 2.5, 3],
+            'ok': True,
+            'ten': u'testTenant'
+        }
+        # Deliberately not in the separators json.dumps would produce
+        self.tiipStr = json.dumps(self.tiipDict, separators=(',', ':'))
+
+    def setUp(self):
+        # Scan the small test messages with headerKeys too
+        lazy.HEADER_KEYS_MIN_SIZE = 0
+
+    def tearDown(self):
+        lazy.HEADER_KEYS_MIN_SIZE = HEADER_KEYS_MIN_SIZE
+
+    def test000_passThrough(self):
+        tiipMsg = LazyTIIPMessage(self.tiipStr)
+        self.assertEqual(tiipMsg.sig, self.tiipDict['sig'])
+        self.assertEqual(tiipMsg.ch, self.tiipDict['ch'])
+        self.assertEqual(tiipMsg.targ, self.tiipDict['targ'])
+        self.assertFalse(tiipMsg.modified)
+        self.assertIs(str(tiipMsg), self.tiipStr)
+
+    def test001_passThroughBytes(self):
+        raw = self.tiipStr.encode('utf-8')
+        tiipMsg = LazyTIIPMessage(raw)
+        self.assertEqual(tiipMsg.sig, self.tiipDict['sig'])
+        self.assertIs(tiipMsg.raw, raw)
+        self.assertEqual(str(tiipMsg), self.tiipStr)
+
+    def test002_sameAsEager(self):
+        self.assertEqual(dict(LazyTIIPMessage(self.tiipStr)), dict(TIIPMessage(tiipStr=self.tiipStr)))
+
+    def test003_modified(self):
+        tiipMsg = LazyTIIPMessage(self.tiipStr)
+        tiipMsg.sig = u'otherSignal'
+        self.assertTrue(tiipMsg.modified)
+        self.assertEqual(json.loads(str(tiipMsg)), dict(self.tiipDict, sig=u'otherSignal'))
+
+    def test004_validatedOnAccess(self):
+        tiipMsg = LazyTIIPMessage(json.dumps(dict(self.tiipDict, ts=u'incorrectTimestampString')))
+        self.assertEqual(tiipMsg.sig, self.tiipDict['sig'])
+        with self.assertRaises(ValueError):
+            tiipMsg.ts
+        tiipMsg = LazyTIIPMessage(json.dumps(dict(self.tiipDict, sig=1)))
+        with self.assertRaises(TypeError):
+            tiipMsg.sig
+        with self.assertRaises(TypeError):
+            LazyTIIPMessage('[1]').sig
+
+    def test005_verifyVersion(self):
+        tiip2String = '{"pv": "tiip.2.0", "ts": "1556099778.77", "ct": "1556099734.255"}'
+        with self.assertRaises(ValueError):
+            LazyTIIPMessage(tiip2String).sig
+        tiipMsg = LazyTIIPMessage(tiip2String, verifyVersion=False)
+        self.assertAlmostEqual(float(tiipMsg.lat), 44.514999866485596, 5)
+        self.assertEqual(json.loads(str(tiipMsg))['pv'], tiip.__version__)
+        # Encoding an unread message checks the version too
+        for headerKeys in (None, ROUTING_KEYS):
+            with self.assertRaises(ValueError):
+                str(LazyTIIPMessage(tiip2String, headerKeys=headerKeys))
+            with self.assertRaises(ValueError):
+                LazyTIIPMessage(tiip2String.encode('utf-8'), headerKeys=headerKeys).toBytes()
+            tiipMsg = LazyTIIPMessage(tiip2String, verifyVersion=False, headerKeys=headerKeys)
+            self.assertEqual(json.loads(str(tiipMsg))['pv'], tiip.__version__)
+            self.assertTrue(tiipMsg.modified)
+
+    def test006_resetReload(self):
+        tiipMessage = LazyTIIPMessage(self.tiipStr)
+        self.assertEqual(tiipMessage.sig, u'testSignal')
+        other = json.dumps(dict(self.tiipDict, sig=u'other'))
+        self.assertIs(tiipMessage.reload(other), tiipMessage)
+        self.assertFalse(tiipMessage.modified)
+        self.assertEqual(tiipMessage.sig, u'other')
+        self.assertEqual(str(tiipMessage), other)
+        tiipMessage.reset()
+        self.assertIsNone(tiipMessage.sig)
+        self.assertEqual(set(json.loads(str(tiipMessage))), set([u'pv', u'ts']))
+        self.assertEqual(set(dict(LazyTIIPMessage())), set([u'pv', u'ts']))
+        # The same arguments as TIIPMessage.reload
+        tiipMessage.reload(tiipDict=self.tiipDict, verifyVersion=True, trusted=True)
+        self.assertEqual(json.loads(str(tiipMessage)), self.tiipDict)
+        tiipMessage.reload(self.tiipStr, {'pv': tiip.__version__, 'sig': u'other'})
+        self.assertEqual(json.loads(str(tiipMessage)), dict(self.tiipDict, sig=u'other'))
+        with self.assertRaises(TypeError):
+            tiipMessage.reload(tiipDict={'pv': tiip.__version__, 'sig': 5})
+
+    def test007_numericTimeStamp(self):
+        tiipMessage = LazyTIIPMessage(self.tiipStr)
+        self.assertEqual(tiipMessage.tsMicros, 946689825678901)
+        self.assertEqual(tiipMessage.tsDatetime.microsecond, 678901)
+        self.assertFalse(tiipMessage.modified)
+        tiipMessage.tsMicros = 0
+        self.assertTrue(tiipMessage.modified)
+        self.assertEqual(json.loads(str(tiipMessage))['ts'], u'1970-01-01T00:00:00.000000Z')
+
+    def test008_scanTopLevel(self):
+        text = u' { "a" : [1, {"b": "]}"}, [2]] , "c\\u0064":"x\\"y", "e": -1.5e3,"f":null, "g": {} } '
+        for tiipStr in (text, text.encode('utf-8')):
+            spans = scanTopLevel(tiipStr)
+            self.assertEqual(sorted(spans), [u'a', u'cd', u'e', u'f', u'g'])
+            self.assertEqual(dict((key, json.loads(tiipStr[start:end])) for key, (start, end) in spans.items()),
+                             json.loads(text))
+        self.assertEqual(scanTopLevel(u'{}'), {})
+        for incorrect in (u'[1]', u'{"a": [1}', u'{"a" 1}', u'{"a": 1 "b": 2}', u'{"a": "x'):
+            with self.assertRaises(ValueError):
+                scanTopLevel(incorrect)
+
+    def test009_headerKeys(self):
+        for raw in (self.tiipStr, self.tiipStr.encode('utf-8')):
+            tiipMsg = LazyTIIPMessage(raw, headerKeys=ROUTING_KEYS)
+            self.assertEqual(tiipMsg.sig, self.tiipDict['sig'])
+            self.assertEqual(tiipMsg.targ, self.tiipDict['targ'])
+            self.assertEqual(sorted(tiipMsg._slices), [u'arg', u'lat', u'ok', u'pl', u'src', u'ten', u'ts'])
+            self.assertEqual(tiipMsg.pl, self.tiipDict['pl'])
+            self.assertNotIn(u'pl', tiipMsg._slices)
+            argText = json.dumps(self.tiipDict['arg'], separators=(',', ':'))
+            self.assertEqual(tiipMsg.rawField(u'arg'), argText.encode('utf-8') if isinstance(raw, bytes) else argText)
+            self.assertIsNone(tiipMsg.rawField(u'sid'))
+            self.assertEqual(dict(tiipMsg), dict(TIIPMessage(tiipStr=self.tiipStr)))
+
+    def test010_headerKeysForwarding(self):
+        raw = json.dumps(dict(self.tiipDict, arg={u'nested': [1, u'"]'], u'x': None}), separators=(',', ':'))
+        tiipMsg = LazyTIIPMessage(raw, headerKeys=ROUTING_KEYS)
+        tiipMsg.targ = [u'otherTarget']
+        encoded = str(tiipMsg)
+        # Undecoded keys are copied from raw, so their text is unchanged
+        self.assertIn(u'"arg":' + tiipMsg.rawField(u'arg'), encoded)
+        self.assertEqual(json.loads(encoded), dict(json.loads(raw), targ=[u'otherTarget']))
+        self.assertEqual(json.loads(tiipMsg.toBytes().decode('utf-8')), json.loads(encoded))
+        self.assertIn(u'arg', tiipMsg._slices)
+        tiipMsg.arg = None
+        self.assertNotIn(u'arg', json.loads(str(tiipMsg)))
+
+    def test011_headerKeysValidation(self):
+        tiipMsg = LazyTIIPMessage(json.dumps(dict(self.tiipDict, pl=u'text')), headerKeys=ROUTING_KEYS)
+        self.assertEqual(tiipMsg.sig, self.tiipDict['sig'])
+        with self.assertRaises(TypeError):
+            tiipMsg.pl
+        with self.assertRaises(ValueError):
+            LazyTIIPMessage(json.dumps(dict(self.tiipDict, pv=u'tiip.2.0')), headerKeys=ROUTING_KEYS).sig
+        tiip2String = '{"pv": "tiip.2.0", "ts": "1556099778.77", "ct": "1556099734.255", "sig": "s"}'
+        tiipMsg = LazyTIIPMessage(tiip2String, verifyVersion=False, headerKeys=ROUTING_KEYS)
+        self.assertEqual(tiipMsg.sig, u's')
+        self.assertEqual(json.loads(str(tiipMsg))['pv'], tiip.__version__)
+
+    def test012_bufferInput(self):
+        buffer = bytearray(b'  ' + self.tiipStr.encode('utf-8'))
+        for data in [buffer[2:], memoryview(buffer)[2:]]:
+            tiipMsg = LazyTIIPMessage(data, headerKeys=ROUTING_KEYS)
+            buffer[2:3] = b'['  # The caller may reuse its buffer
+            self.assertEqual(tiipMsg.sig, self.tiipDict['sig'])
+            self.assertEqual(tiipMsg.toBytes(), self.tiipStr.encode('utf-8'))
+            self.assertEqual(tiipMsg.rawField(u'pl'), b'[1.0,2.5,3]')
+            out = bytearray(len(self.tiipStr))
+            self.assertEqual(tiipMsg.writeInto(out), len(out))
+            self.assertEqual(bytes(out), self.tiipStr.encode('utf-8'))
+            buffer[2:3] = b'{'
+
+    def test013_validate(self):
+        tiipMsg = LazyTIIPMessage(self.tiipStr)
+        tiipMsg.validate()
+        self.assertFalse(tiipMsg.modified)
+        self.assertIs(str(tiipMsg), self.tiipStr)
+        self.assertEqual(dict(tiipMsg), dict(TIIPMessage(tiipStr=self.tiipStr)))
+        tiipMsg = LazyTIIPMessage(self.tiipStr, headerKeys=ROUTING_KEYS)
+        tiipMsg.validate()
+        self.assertFalse(tiipMsg.modified)
+        self.assertIs(str(tiipMsg), self.tiipStr)
+        tiipMsg.sig = u'otherSignal'
+        tiipMsg.validate()
+        self.assertTrue(tiipMsg.modified)
+        self.assertEqual(json.loads(str(tiipMsg)), dict(self.tiipDict, sig=u'otherSignal'))
+        with self.assertRaises(TypeError):
+            LazyTIIPMessage(json.dumps(dict(self.tiipDict, pl=u'text')), headerKeys=ROUTING_KEYS).validate()
+
+    def test014_decodeMany(self):
+        errors = []
+        tiipMsgs = LazyTIIPMessage.decodeMany([self.tiipStr, '{"pv":"tiip.2.0"}', self.tiipStr.encode('utf-8')],
+                                              errors=errors)
+        self.assertEqual([index for index, _ in errors], [1])
+        self.assertEqual(len(tiipMsgs), 2)
+        for tiipMsg in tiipMsgs:
+            self.assertIsInstance(tiipMsg, LazyTIIPMessage)
+            self.assertEqual(dict(tiipMsg), dict(TIIPMessage(tiipStr=self.tiipStr)))
+        with self.assertRaises(TypeError):
+            LazyTIIPMessage.decodeMany([json.dumps(dict(self.tiipDict, sig=5))])
+        tiipMsg = LazyTIIPMessage.decodeMany([json.dumps(dict(self.tiipDict, sig=5))], trusted=True)[0]
+        with self.assertRaises(TypeError):
+            tiipMsg.validate()
+
+    def test015_headerKeysMinSize(self):
+        lazy.HEADER_KEYS_MIN_SIZE = HEADER_KEYS_MIN_SIZE
+        tiipMsg = LazyTIIPMessage(self.tiipStr, headerKeys=ROUTING_KEYS)
+        self.assertEqual(tiipMsg.sig, self.tiipDict['sig'])
+        self.assertIsNone(tiipMsg._slices)  # Small, decoded whole
+        large = json.dumps(dict(self.tiipDict, pl=list(range(HEADER_KEYS_MIN_SIZE))))
+        tiipMsg = LazyTIIPMessage(large, headerKeys=ROUTING_KEYS)
+        self.assertEqual(tiipMsg.sig, self.tiipDict['sig'])
+        self.assertIn('pl', tiipMsg._slices)
+        tiipMsg.targ = [u'other']
+        self.assertEqual(json.loads(str(tiipMsg)), dict(json.loads(large), targ=[u'other']))
+
+
+
+if __name__ == "__main__":
+    unittest.main()
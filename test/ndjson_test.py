@@ -0,0 +1,70 @@
+import io
+import json
+import unittest
+
+from pytiip.ndjson import readMessages, writeMessages, writeMessagesInto
+from pytiip.tiip import TIIPMessage
+from pytiip import tiip
+
+
+class TestNDJSON(unittest.TestCase):
+
+    def generateMessages(self, count):
+        return [TIIPMessage(
+            ts=u'2000-01-01T01:23:45.%06dZ' % i, mid=u'mid%d' % i, sig=u'testSignal', pl=[i, u'åäö'])
+            for i in range(count)]
+
+    def test000_roundTrip(self):
+        tiipMsgs = self.generateMessages(100)
+        fileobj = io.BytesIO()
+        self.assertEqual(writeMessages(fileobj, iter(tiipMsgs), bufferSize=256), 100)
+        fileobj.seek(0)
+        readMsgs = list(readMessages(fileobj, chunkSize=7))
+        self.assertEqual([dict(m) for m in readMsgs], [dict(m) for m in tiipMsgs])
+
+    def test001_lines(self):
+        tiipMsgs = self.generateMessages(3)
+        fileobj = io.BytesIO()
+        writeMessages(fileobj, tiipMsgs)
+        lines = fileobj.getvalue().split(b'\n')
+        self.assertEqual(lines[-1], b'')
+        self.assertEqual([json.loads(line.decode('utf-8')) for line in lines[:-1]], [dict(m) for m in tiipMsgs])
+
+    def test002_blankLinesAndMissingNewline(self):
+        line = str(self.generateMessages(1)[0]).encode('utf-8')
+        fileobj = io.BytesIO(b'\n' + line + b'\r\n\n  \n' + line)
+        self.assertEqual(len(list(readMessages(fileobj, chunkSize=5))), 2)
+        self.assertEqual(list(readMessages(io.BytesIO(b''))), [])
+
+    def test003_errors(self):
+        line = str(self.generateMessages(1)[0]).encode('utf-8')
+        tiip2Line = b'{"pv": "tiip.2.0", "ts": "1556099778.77"}'
+        data = b'\n'.join([line, tiip2Line, line, b'notJson', line])
+        with self.assertRaises(ValueError):
+            list(readMessages(io.BytesIO(data)))
+        errors = []
+        self.assertEqual(len(list(readMessages(io.BytesIO(data), chunkSize=16, errors=errors))), 3)
+        self.assertEqual([index for index, _ in errors], [1, 3])
+        readMsgs = list(readMessages(io.BytesIO(data), verifyVersion=False, errors=errors))
+        self.assertEqual(readMsgs[1].pv, tiip.__version__)
+
+    def test004_writeMessagesInto(self):
+        tiipMsgs = self.generateMessages(10)
+        lineSize = len(tiipMsgs[0].toBytes()) + 1
+        buffer = bytearray(lineSize * 4 + lineSize // 2)
+        sent = []
+        while tiipMsgs:
+            count, end = writeMessagesInto(memoryview(buffer), tiipMsgs)
+            self.assertEqual(end, count * lineSize)
+            sent.append(bytes(buffer[:end]))
+            tiipMsgs = tiipMsgs[count:]
+        self.assertEqual([len(data) // lineSize for data in sent], [4, 4, 2])
+        readMsgs = list(readMessages(io.BytesIO(b''.join(sent))))
+        self.assertEqual([dict(m) for m in readMsgs], [dict(m) for m in self.generateMessages(10)])
+        self.assertEqual(writeMessagesInto(buffer, self.generateMessages(1), offset=len(buffer) - 1), (0, len(buffer) - 1))
+        with self.assertRaises(TypeError):
+            writeMessagesInto(bytes(buffer), tiipMsgs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import json
+import operator
+import os
+import shutil
+import tempfile
+import unittest
+
+from pytiip import parallel
+from pytiip.parallel import decodeFile, splitRanges
+from pytiip.tiip import TIIPMessage
+from pytiip import tiip
+
+
+def countSignals(counts, tiipMsg):
+    counts[tiipMsg.sig] = counts.get(tiipMsg.sig, 0) + 1
+    return counts
+
+
+def mergeCounts(countsA, countsB):
+    for key, count in countsB.items():
+        countsA[key] = countsA.get(key, 0) + count
+    return countsA
+
+
+def countMessages(count, tiipMsg):
+    return count + 1
+
+
+class TestParallel(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'messages.ndjson')
+        self.lines = [json.dumps({'pv': tiip.__version__, 'mid': 'mid%d' % i, 'sig': 's%d' % (i % 3), 'pl': [i]})
+                      for i in range(500)]
+        with open(self.path, 'wb') as f:
+            f.write('\n'.join(self.lines[:250]).encode('utf-8') + b'\n\n')
+            f.write('\n'.join(self.lines[250:]).encode('utf-8'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test000_splitRanges(self):
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        for parts in [1, 2, 7, 1000, 100000]:
+            ranges = splitRanges(self.path, parts)
+            self.assertLessEqual(len(ranges), parts)
+            self.assertEqual(ranges[0][0], 0)
+            self.assertEqual(ranges[-1][1], len(data))
+            for (_, end), (start, _) in zip(ranges, ranges[1:]):
+                self.assertEqual(end, start)
+                self.assertEqual(data[end - 1:end], b'\n')
+
+    def test001_decodeFile(self):
+        expected = [json.loads(line) for line in self.lines]
+        tiipMsgs = decodeFile(self.path, processes=2)
+        self.assertEqual([dict(m, ts=None) for m in tiipMsgs], [dict(d, ts=None) for d in expected])
+        self.assertEqual(len(decodeFile(self.path, processes=1)), 500)
+
+    def test002_reduce(self):
+        counts = decodeFile(self.path, processes=3, reduce=countSignals, initial={}, combine=mergeCounts)
+        self.assertEqual(counts, {'s0': 167, 's1': 167, 's2': 166})
+        chunkCounts = decodeFile(self.path, processes=2, reduce=countMessages, initial=0)
+        self.assertGreater(len(chunkCounts), 1)
+        self.assertEqual(sum(chunkCounts), 500)
+        self.assertEqual(decodeFile(self.path, processes=2, reduce=countMessages, initial=0, combine=operator.add), 500)
+
+    def test003_smallBlocks(self):
+        blockSize = parallel.BLOCK_SIZE
+        parallel.BLOCK_SIZE = 10  # Smaller than a line
+        try:
+            self.assertEqual(len(decodeFile(self.path, processes=1)), 500)
+        finally:
+            parallel.BLOCK_SIZE = blockSize
+
+    def test004_emptyAndIncorrect(self):
+        emptyPath = os.path.join(self.directory, 'empty.ndjson')
+        open(emptyPath, 'wb').close()
+        self.assertEqual(splitRanges(emptyPath, 4), [])
+        self.assertEqual(decodeFile(emptyPath, processes=2), [])
+        self.assertEqual(decodeFile(emptyPath, processes=2, reduce=countMessages, initial=0, combine=operator.add), 0)
+        with open(self.path, 'ab') as f:
+            f.write(b'\n{"pv": "tiip.2.0", "ts": "1.0"}\n')
+        with self.assertRaises(ValueError):
+            decodeFile(self.path, processes=2)
+        self.assertIsInstance(decodeFile(self.path, processes=2, verifyVersion=False)[-1], TIIPMessage)
+
+    def test005_reduceInProcess(self):
+        # Chunks decoded in this process must not share a mutable initial value
+        initial = {}
+        for processes, chunksPerProcess in ((1, 4), (1, 1)):
+            counts = decodeFile(self.path, processes=processes, reduce=countSignals, initial=initial,
+                                combine=mergeCounts, chunksPerProcess=chunksPerProcess)
+            self.assertEqual(counts, {'s0': 167, 's1': 167, 's2': 166})
+        chunkCounts = decodeFile(self.path, processes=1, reduce=countSignals, initial=initial)
+        self.assertEqual(sum(sum(counts.values()) for counts in chunkCounts), 500)
+        self.assertEqual(initial, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
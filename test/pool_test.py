@@ -0,0 +1,96 @@
+import io
+import json
+import unittest
+
+from pytiip import ndjson
+from pytiip.lazy import LazyTIIPMessage
+from pytiip.pool import MessagePool
+from pytiip.tiip import TIIPMessage
+
+MSG = '{"pv":"tiip.3.0","ts":"2016-01-01T12:00:00.000000Z","type":"pub","sig":"temp","pl":[1]}'
+
+
+class TestMessagePool(unittest.TestCase):
+
+    def test000_acquireRelease(self):
+        pool = MessagePool(maxSize=2)
+        first = pool.acquire()
+        second = pool.acquire()
+        third = pool.acquire()
+        self.assertEqual(pool.created, 3)
+        first.sig = u'temp'
+        for tiipMsg in (first, second, third):
+            pool.release(tiipMsg)
+        self.assertEqual(len(pool), 2)
+        self.assertIs(pool.acquire(), second)
+        self.assertIs(pool.acquire(), first)
+        self.assertIsNone(first.sig)
+        self.assertIsNot(pool.acquire(), third)
+        self.assertEqual(pool.created, 4)
+
+    def test001_decode(self):
+        pool = MessagePool()
+        tiipMsg = pool.decode(MSG)
+        self.assertEqual(tiipMsg.sig, u'temp')
+        pool.release(tiipMsg)
+        self.assertIs(pool.decode(MSG.encode('utf-8'), trusted=True), tiipMsg)
+        with self.assertRaises(ValueError):
+            pool.decode('{"pv":"tiip.3.0","ts":"yesterday"}')
+        # The message taken for the failed decode went back to the pool
+        self.assertEqual(len(pool), 1)
+        self.assertEqual(pool.created, 2)
+        for tiipStr in ('[]', '"text"'):
+            with self.assertRaises(TypeError):
+                pool.decode(tiipStr)
+        self.assertEqual(len(pool), 1)
+        self.assertEqual(pool.created, 2)
+
+    def test002_decodeMany(self):
+        pool = MessagePool()
+        tiipMsgs = TIIPMessage.decodeMany([MSG, MSG], pool=pool)
+        for tiipMsg in tiipMsgs:
+            pool.release(tiipMsg)
+        reused = TIIPMessage.decodeMany([MSG, MSG, '{"pv":"tiip.3.0"}'], pool=pool)
+        self.assertEqual(set(map(id, reused[:2])), set(map(id, tiipMsgs)))
+        self.assertEqual([json.loads(str(m))['sig'] for m in reused[:2]], [u'temp', u'temp'])
+        self.assertNotIn('sig', dict(reused[2]))
+        self.assertEqual(pool.created, 3)
+
+    def test003_readMessages(self):
+        pool = MessagePool()
+        fileobj = io.BytesIO(((MSG + '\n') * 10).encode('utf-8'))
+        for tiipMsg in ndjson.readMessages(fileobj, chunkSize=len(MSG) + 1, pool=pool):
+            self.assertEqual(tiipMsg.sig, u'temp')
+            pool.release(tiipMsg)
+        self.assertEqual(pool.created, 1)
+
+    def test004_lazy(self):
+        pool = MessagePool(cls=LazyTIIPMessage)
+        tiipMsg = pool.acquire()
+        self.assertEqual(set(dict(tiipMsg)), set([u'pv', u'ts']))
+        pool.release(tiipMsg)
+        self.assertIs(pool.decode(MSG), tiipMsg)
+        self.assertIsInstance(tiipMsg, LazyTIIPMessage)
+        self.assertEqual(str(tiipMsg), MSG)
+        self.assertEqual(tiipMsg.sig, u'temp')
+        pool.release(tiipMsg)
+        tiipMsgs = TIIPMessage.decodeMany([MSG, MSG], pool=pool)
+        self.assertIs(tiipMsgs[0], tiipMsg)
+        self.assertEqual([dict(m) for m in tiipMsgs], [dict(TIIPMessage(MSG))] * 2)
+        self.assertEqual(pool.created, 2)
+
+    def test005_decodeManyError(self):
+        pool = MessagePool()
+        pool.release(pool.acquire())
+        with self.assertRaises(TypeError):
+            TIIPMessage.decodeMany(['{"pv":"tiip.3.0","sig":5}'], pool=pool)
+        errors = []
+        TIIPMessage.decodeMany(['{"pv":"tiip.3.0","sig":5}', MSG], errors=errors, pool=pool)
+        # Messages taken for failed decodes went back to the pool
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(len(pool), 0)
+        self.assertEqual(pool.created, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
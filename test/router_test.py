@@ -0,0 +1,65 @@
+import unittest
+
+from pytiip.router import TIIPRouter
+from pytiip.tiip import TIIPMessage
+
+
+class TestTIIPRouter(unittest.TestCase):
+
+    def setUp(self):
+        self.router = TIIPRouter()
+        self.calls = []
+
+    def handler(self, name):
+        return lambda tiipMsg: self.calls.append(name)
+
+    def test000_scalarPatterns(self):
+        self.router.subscribe(self.handler('all'))
+        self.router.subscribe(self.handler('sig'), sig=u'temp')
+        self.router.subscribe(self.handler('sigCh'), sig=u'temp', ch=u'a')
+        self.router.subscribe(self.handler('type'), type=u'pub', sig=u'*')
+        self.router.subscribe(self.handler('other'), sig=u'hum')
+        self.assertEqual(self.router.dispatch(TIIPMessage(type=u'pub', sig=u'temp', ch=u'a')), 4)
+        self.assertEqual(self.calls, ['all', 'sig', 'sigCh', 'type'])
+        self.calls = []
+        self.router.dispatch(TIIPMessage(sig=u'temp', ch=u'b'))
+        self.assertEqual(self.calls, ['all', 'sig'])
+        self.calls = []
+        self.router.dispatch(TIIPMessage())
+        self.assertEqual(self.calls, ['all'])
+
+    def test001_pathPatterns(self):
+        self.router.subscribe(self.handler('prefix'), targ=[u'backend'])
+        self.router.subscribe(self.handler('exact'), targ=[u'backend', u'store'])
+        self.router.subscribe(self.handler('wildcard'), targ=[u'*', u'store'])
+        self.router.subscribe(self.handler('src'), targ=[u'backend'], src=[u'dev', u'*', u'x'])
+        self.router.subscribe(self.handler('longer'), targ=[u'backend', u'store', u'deep'])
+        self.router.dispatch(TIIPMessage(targ=[u'backend', u'store'], src=[u'dev', u'1', u'x', u'y']))
+        self.assertEqual(self.calls, ['prefix', 'exact', 'wildcard', 'src'])
+        self.calls = []
+        self.router.dispatch(TIIPMessage(targ=[u'frontend', u'store'], src=[u'dev', u'1']))
+        self.assertEqual(self.calls, ['wildcard'])
+        self.calls = []
+        self.router.dispatch(TIIPMessage(src=[u'dev']))
+        self.assertEqual(self.calls, [])
+
+    def test002_unsubscribe(self):
+        first = self.router.subscribe(self.handler('first'), sig=u'temp')
+        self.router.subscribe(self.handler('second'), sig=u'temp')
+        self.assertEqual(len(self.router), 2)
+        self.assertTrue(self.router.unsubscribe(first))
+        self.assertFalse(self.router.unsubscribe(first))
+        self.router.dispatch(TIIPMessage(sig=u'temp'))
+        self.assertEqual(self.calls, ['second'])
+        self.assertEqual(len(self.router), 1)
+
+    def test003_incorrect(self):
+        with self.assertRaises(TypeError):
+            self.router.subscribe(None)
+        with self.assertRaises(TypeError):
+            self.router.subscribe(self.handler('x'), targ=u'backend')
+        self.assertEqual(self.router.match(TIIPMessage()), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
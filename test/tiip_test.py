@@ -1,7 +1,15 @@
+import array
 import json
+import math
+import pickle
 import unittest
+import weakref
 import dateutil.parser as parser
 
+from datetime import datetime as dt
+from datetime import timedelta as td
+from datetime import timezone
+
 from pytiip.tiip import TIIPMessage
 from pytiip import tiip
 import sys
@@ -337,6 +345,332 @@ class TestTIIPMessage(unittest.TestCase):
         self.assertAlmostEqual(float(tiipMessage.lat), 44.514999866485596, 5)
         self.assertAlmostEqual(parser.parse(tiipMessage.ts).timestamp(), 1556099734.255, 5)
 
+    def test024_parseTimeStamp(self):
+        # Canonical format
+        self.assertEqual(tiip.parseTimeStamp(self.timestamp), parser.parse(self.timestamp).replace(tzinfo=None))
+        # Non-canonical format falls back to dateutil
+        self.assertEqual(
+            tiip.parseTimeStamp(u'2000-01-01T01:23:45.678Z'),
+            parser.parse(u'2000-01-01T01:23:45.678Z').replace(tzinfo=None))
+
+        # Incorrect
+        with self.assertRaises(ValueError):
+            tiip.parseTimeStamp(u'2000-13-01T01:23:45.678901Z')
+        with self.assertRaises(ValueError):
+            tiip.parseTimeStamp(u'2000-01-01T01:23:45+01:00')
+        with self.assertRaises(ValueError):
+            tiip.parseTimeStamp(u'2000-01-01T01:23:45Z')
+        with self.assertRaises(ValueError):
+            tiip.parseTimeStamp(u'2000-01-01')
+
+    def test025_parseTimeStampCache(self):
+        tiip.parseTimeStamp.cache_clear()
+        tiip.parseTimeStamp(self.timestamp)
+        tiip.parseTimeStamp(self.timestamp)
+        self.assertEqual(tiip.parseTimeStamp.cache_info().hits, 1)
+
+    def test026_slots(self):
+        tiipMessage = self.generateExampleTIIPMessage()
+        self.assertFalse(hasattr(tiipMessage, '__dict__'))
+        with self.assertRaises(AttributeError):
+            tiipMessage.unknownKey = 1
+        self.assertEqual(dict(pickle.loads(pickle.dumps(tiipMessage))), dict(tiipMessage))
+        self.assertIs(weakref.ref(tiipMessage)(), tiipMessage)
+
+    def test027_decodeMany(self):
+        tiip2String = '{"pv": "tiip.2.0", "ts": "1556099778.77", "ct": "1556099734.255"}'
+        tiipStrs = [self.tiipStr, self.tiipStr.encode('utf-8'), json.dumps({'pv': self.tiipVersion})]
+        tiipMsgs = TIIPMessage.decodeMany(iter(tiipStrs))
+        self.assertEqual(len(tiipMsgs), 3)
+        self.verifyKeys(tiipMsgs[0])
+        self.verifyKeys(tiipMsgs[1])
+        parser.parse(tiipMsgs[2].ts)  # Default timestamp when missing
+
+        tiipMsgs = TIIPMessage.decodeMany([tiip2String], verifyVersion=False)
+        self.assertAlmostEqual(float(tiipMsgs[0].lat), 44.514999866485596, 5)
+
+        # Incorrect
+        with self.assertRaises(ValueError):
+            TIIPMessage.decodeMany([self.tiipStr, tiip2String])
+        with self.assertRaises(TypeError):
+            TIIPMessage.decodeMany([json.dumps(dict(self.tiipDict, sig=1))])
+
+    def test028_decodeManyErrors(self):
+        errors = []
+        tiipStrs = [self.tiipStr, 'notJson', json.dumps(dict(self.tiipDict, sig=1)), '[]', self.tiipStr]
+        tiipMsgs = TIIPMessage.decodeMany(tiipStrs, errors=errors)
+        self.assertEqual(len(tiipMsgs), 2)
+        self.assertEqual([index for index, _ in errors], [1, 2, 3])
+        self.assertIsInstance(errors[0][1], ValueError)
+        self.assertIsInstance(errors[1][1], TypeError)
+
+    def test029_jsonBackends(self):
+        self.assertIn('json', tiip.availableJSONBackends())
+        tiipMessage = self.generateExampleTIIPMessage()
+        tiipMessage.pl = [1, 2.5, -3, u'åäö', None, {u'1': [True, False]}]
+        expected = dict(tiipMessage)
+        for backend in tiip.availableJSONBackends():
+            self.assertEqual(json.loads(tiipMessage.toStr(backend)), expected)
+            self.assertEqual(json.loads(tiipMessage.toBytes(backend).decode('utf-8')), expected)
+            encoded = json.dumps(expected).encode('utf-8')
+            for tiipStr in [json.dumps(expected), encoded, bytearray(encoded), memoryview(encoded)]:
+                loaded = TIIPMessage()
+                loaded.loadFromStr(tiipStr, backend=backend)
+                self.assertEqual(dict(loaded), expected)
+            self.assertEqual(
+                json.loads(tiipMessage.asVersion('tiip.2.0', backend)), json.loads(tiipMessage.asVersion('tiip.2.0', 'json')))
+            self.assertEqual(dict(TIIPMessage.decodeMany([encoded], backend=backend)[0]), expected)
+            # Non-finite floats round-trip like with the standard library, which also reads existing logs
+            nonFinite = TIIPMessage(pl=[float('nan'), float('inf'), -float('inf'), None], arg={u'x': float('inf')})
+            for tiipStr in [nonFinite.toStr(backend), nonFinite.toBytes(backend), str(nonFinite).encode('utf-8'),
+                            json.dumps(dict(nonFinite))]:
+                loaded = TIIPMessage.decodeMany([tiipStr], backend=backend)[0]
+                self.assertTrue(math.isnan(loaded.pl[0]))
+                self.assertEqual(loaded.pl[1:], [float('inf'), -float('inf'), None])
+                self.assertEqual(loaded.arg, {u'x': float('inf')})
+
+    def test030_setJSONBackend(self):
+        current = tiip.getJSONBackend()
+        try:
+            tiip.setJSONBackend('json')
+            tiipMessage = self.generateExampleTIIPMessage()
+            self.assertEqual(str(tiipMessage), json.dumps(dict(tiipMessage)))
+        finally:
+            tiip.setJSONBackend(current.name)
+        with self.assertRaises(ValueError):
+            tiip.setJSONBackend('unknownBackend')
+        with self.assertRaises(ValueError):
+            TIIPMessage().toStr('unknownBackend')
+
+    def test031_cachedRepresentation(self):
+        # Off by default, so in place modifications are always encoded
+        self.assertFalse(tiip.getEncodingCache())
+        tiipMessage = self.generateExampleTIIPMessage()
+        tiipMessage.targ = list(self.target)
+        tiipMessage.pl = list(self.payload)
+        str(tiipMessage)
+        tiipMessage.targ.pop(0)
+        tiipMessage.pl.append(u'added')
+        self.assertEqual(json.loads(str(tiipMessage)), dict(tiipMessage))
+        self.assertEqual(json.loads(tiipMessage.asVersion('tiip.2.0'))['pl'], tiipMessage.pl)
+
+        tiip.setEncodingCache(True)
+        try:
+            tiipMessage = self.generateExampleTIIPMessage()
+            self.assertIs(str(tiipMessage), str(tiipMessage))
+            self.assertIs(tiipMessage.toBytes(), tiipMessage.toBytes())
+            tiip2Str = tiipMessage.asVersion('tiip.2.0')
+            self.assertIs(tiipMessage.asVersion('tiip.2.0'), tiip2Str)
+
+            # Setters invalidate
+            tiipMessage.sig = u'otherSignal'
+            self.assertEqual(json.loads(str(tiipMessage))['sig'], u'otherSignal')
+            self.assertEqual(json.loads(tiipMessage.toBytes().decode('utf-8'))['sig'], u'otherSignal')
+            self.assertEqual(json.loads(tiipMessage.asVersion('tiip.2.0'))['sig'], u'otherSignal')
+            tiipMessage.loadFromDict({'pv': self.tiipVersion, 'ch': u'otherChannel'})
+            self.assertEqual(json.loads(str(tiipMessage))['ch'], u'otherChannel')
+
+            # In place modifications require clearCache
+            tiipMessage.pl = list(self.payload)
+            str(tiipMessage)
+            tiipMessage.pl.append(u'added')
+            self.assertNotIn(u'added', json.loads(str(tiipMessage))['pl'])
+            tiipMessage.clearCache()
+            self.assertIn(u'added', json.loads(str(tiipMessage))['pl'])
+        finally:
+            tiip.setEncodingCache(False)
+        # Representations cached before are not used once the cache is off
+        tiipMessage.pl.append(u'again')
+        self.assertIn(u'again', json.loads(str(tiipMessage))['pl'])
+
+    def test032_trusted(self):
+        self.verifyKeys(TIIPMessage(tiipStr=self.tiipStr, trusted=True))
+        self.verifyKeys(TIIPMessage(tiipDict=self.tiipDict, trusted=True))
+        self.verifyKeys(TIIPMessage.decodeMany([self.tiipStr], trusted=True)[0])
+
+        # No checks, until validate is called
+        tiipMessage = TIIPMessage()
+        tiipMessage.loadFromDict(dict(self.tiipDict, sig=1, lat=0.5), trusted=True)
+        self.assertEqual(tiipMessage.sig, 1)
+        self.assertEqual(tiipMessage.mid, self.mid)
+        with self.assertRaises(TypeError):
+            tiipMessage.validate()
+        tiipMessage.sig = self.signal
+        tiipMessage.validate()
+        self.assertEqual(tiipMessage.lat, '0.5')
+        tiipMessage.loadFromStr(json.dumps(dict(self.tiipDict, ts=u'incorrectTimestampString')), trusted=True)
+        with self.assertRaises(ValueError):
+            tiipMessage.validate()
+
+        # Version is still verified
+        with self.assertRaises(ValueError):
+            TIIPMessage(tiipDict=dict(self.tiipDict, pv=u'tiip.1.0'), trusted=True)
+
+    def test033_arrayPayload(self):
+        values = array.array('d', [0.5, 1.5, -2.25])
+        tiipMessage = TIIPMessage(pl=values)
+        self.assertIs(tiipMessage.pl, values)
+        view = memoryview(values)
+        tiipMessage.pl = view
+        self.assertIs(tiipMessage.pl, view)
+        # Plain json lists by default
+        self.assertEqual(json.loads(str(tiipMessage))['pl'], [0.5, 1.5, -2.25])
+        self.assertEqual(json.loads(tiipMessage.asVersion('tiip.2.0'))['pl'], [0.5, 1.5, -2.25])
+        with self.assertRaises(TypeError):
+            tiipMessage.pl = memoryview(b'ab').cast('c')
+        with self.assertRaises(TypeError):
+            tiipMessage.pl = array.array('u', u'ab')
+
+    def test034_arrayEncoding(self):
+        values = array.array('h', [1, -2, 3])
+        tiipMessage = TIIPMessage(pl=values)
+        self.assertEqual(json.loads(str(tiipMessage))['pl'], [1, -2, 3])
+        tiip.setArrayEncoding(tiip.ARRAY_BASE64)
+        try:
+            self.assertEqual(tiip.getArrayEncoding(), tiip.ARRAY_BASE64)
+            packed = json.loads(str(tiipMessage))['pl']
+            self.assertEqual(packed, {u'@array': u'<i2', u'b64': u'AQD+/wMA'})
+            # Lists are unaffected
+            self.assertEqual(json.loads(str(TIIPMessage(pl=[1, 2])))['pl'], [1, 2])
+        finally:
+            tiip.setArrayEncoding(tiip.ARRAY_LIST)
+        for trusted in (False, True):
+            decoded = TIIPMessage(tiipDict=dict(self.tiipDict, pl=packed), trusted=trusted)
+            self.assertEqual(decoded.pl, values)
+            self.assertEqual(decoded.pl.itemsize, 2)
+        with self.assertRaises(ValueError):
+            TIIPMessage(tiipDict=dict(self.tiipDict, pl={u'@array': u'<f3', u'b64': u''}))
+        with self.assertRaises(ValueError):
+            TIIPMessage(tiipDict=dict(self.tiipDict, pl={u'@array': u'<f8', u'b64': u'AQD+/wMA'}))
+        with self.assertRaises(TypeError):
+            TIIPMessage(tiipDict=dict(self.tiipDict, pl={u'values': []}))
+        with self.assertRaises(ValueError):
+            tiip.setArrayEncoding(u'hex')
+
+    def test035_numpyPayload(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest('numpy is not installed')
+        values = numpy.arange(4, dtype='>f4')
+        tiipMessage = TIIPMessage(pl=values)
+        self.assertIs(tiipMessage.pl, values)
+        self.assertEqual(json.loads(str(tiipMessage))['pl'], [0.0, 1.0, 2.0, 3.0])
+        tiip.setArrayEncoding(tiip.ARRAY_BASE64)
+        try:
+            decoded = TIIPMessage(str(tiipMessage))
+        finally:
+            tiip.setArrayEncoding(tiip.ARRAY_LIST)
+        self.assertEqual(decoded.pl.typecode, 'f')
+        self.assertEqual(decoded.pl.tolist(), [0.0, 1.0, 2.0, 3.0])
+        with self.assertRaises(TypeError):
+            tiipMessage.pl = numpy.zeros((2, 2))
+
+    def test036_resetReload(self):
+        tiipMessage = TIIPMessage(tiipStr=self.tiipStr)
+        self.assertIs(tiipMessage.reload(tiipDict={'pv': tiip.__version__, 'sig': u'other'}), tiipMessage)
+        self.assertEqual(tiipMessage.sig, u'other')
+        self.assertIsNone(tiipMessage.mid)
+        self.assertIsNotNone(parser.parse(tiipMessage.ts))
+        tiipMessage.reload(self.tiipStr.encode('utf-8'), trusted=True)
+        self.verifyKeys(tiipMessage)
+        tiipMessage.reset()
+        self.assertEqual(set(dict(tiipMessage)), set([u'pv', u'ts']))
+        with self.assertRaises(ValueError):
+            tiipMessage.reload(tiipDict={'pv': u'tiip.1.0'})
+
+    def test037_timeStampOnlyWhenMissing(self):
+        calls = []
+
+        def currentMicros():
+            calls.append(1)
+            return 946684800000000
+
+        original = tiip.currentMicros
+        tiip.currentMicros = currentMicros
+        try:
+            TIIPMessage(tiipStr=self.tiipStr)
+            TIIPMessage(ts=self.timestamp)
+            TIIPMessage().reload(self.tiipStr)
+            TIIPMessage.decodeMany([self.tiipStr])
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(TIIPMessage(sig=self.signal).ts, u'2000-01-01T00:00:00.000000Z')
+        finally:
+            tiip.currentMicros = original
+
+    def test038_currentMicros(self):
+        values = [tiip.currentMicros() for _ in range(1000)]
+        self.assertEqual(values, sorted(set(values)))
+        self.assertEqual(tiip.timeStampToMicros(tiip.formatTimeStamp(values[0])), values[0])
+        ts = TIIPMessage.getTimeStamp()
+        self.assertIsNotNone(tiip._TS_PATTERN.match(ts))
+        self.assertLess(abs(parser.parse(ts[:-1]) - dt.utcnow()), td(seconds=5))
+
+    def test039_numericTimeStamp(self):
+        tiipMessage = TIIPMessage(ts=self.timestamp)
+        self.assertEqual(tiipMessage.tsMicros, 946689825678901)
+        self.assertEqual(tiipMessage.tsDatetime, dt(2000, 1, 1, 1, 23, 45, 678901, tzinfo=timezone.utc))
+        str(tiipMessage)
+        tiipMessage.tsMicros = 946689825000000
+        self.assertEqual(tiipMessage.ts, u'2000-01-01T01:23:45.000000Z')
+        self.assertEqual(json.loads(str(tiipMessage))['ts'], u'2000-01-01T01:23:45.000000Z')
+        with self.assertRaises(TypeError):
+            tiipMessage.tsMicros = u'946689825000000'
+        tiipMessage.ts = dt(2000, 1, 1, 0, 0, 1, tzinfo=timezone.utc)
+        self.assertEqual(tiipMessage.tsMicros, 946684801000000)
+        self.assertEqual(tiipMessage.ts, u'2000-01-01T00:00:01.000000Z')
+        # Non canonical strings are kept as they are
+        tiipMessage.ts = u'2000-01-01T00:00:01.5Z'
+        self.assertEqual(tiipMessage.ts, u'2000-01-01T00:00:01.5Z')
+        self.assertEqual(tiipMessage.tsMicros, 946684801500000)
+        self.assertEqual(TIIPMessage.decodeMany([self.tiipStr], trusted=True)[0].tsMicros, 946689825678901)
+
+    def test040_writeInto(self):
+        tiipMessage = self.generateExampleTIIPMessage()
+        encoded = tiipMessage.toBytes()
+        self.assertEqual(bytes(tiipMessage), encoded)
+        buffer = bytearray(len(encoded) + 4)
+        self.assertEqual(tiipMessage.writeInto(buffer, 2), len(encoded))
+        self.assertEqual(bytes(buffer[2:-2]), encoded)
+        view = memoryview(bytearray(len(encoded)))
+        tiipMessage.writeInto(view)
+        self.assertEqual(view.tobytes(), encoded)
+        with self.assertRaises(ValueError):
+            tiipMessage.writeInto(buffer, 5)
+        with self.assertRaises(TypeError):
+            tiipMessage.writeInto(bytes(buffer))
+        loaded = TIIPMessage(tiipStr=memoryview(buffer)[2:-2])
+        self.assertEqual(dict(loaded), dict(tiipMessage))
+
+    def test041_timeStampMicrosRange(self):
+        tiipMessage = TIIPMessage()
+        for value in (10 ** 20, -10 ** 20, tiip._MAX_MICROS + 1, tiip._MIN_MICROS - 1):
+            with self.assertRaises(ValueError):
+                tiipMessage.tsMicros = value
+        tiipMessage.tsMicros = tiip._MIN_MICROS
+        self.assertEqual(tiipMessage.ts, u'0001-01-01T00:00:00.000000Z')
+        tiipMessage.tsMicros = tiip._MAX_MICROS
+        self.assertEqual(tiipMessage.ts, u'9999-12-31T23:59:59.999999Z')
+        self.assertEqual(tiip.timeStampToMicros(tiipMessage.ts), tiip._MAX_MICROS)
+
+    def test042_notAnObject(self):
+        for tiipStr in ('[1]', '[]', '1', 'null'):
+            with self.assertRaises(TypeError):
+                TIIPMessage(tiipStr=tiipStr)
+            with self.assertRaises(TypeError):
+                TIIPMessage().reload(tiipStr, verifyVersion=False)
+        with self.assertRaises(TypeError):
+            TIIPMessage().loadFromDict([('pv', tiip.__version__)])
+
+    def test043_failedReload(self):
+        tiipMessage = TIIPMessage(sig=u'signal')
+        for tiipStr in ('{"pv":"tiip.1.0"}', '{"pv":"tiip.3.0","ts":"yesterday"}', '[]', '{'):
+            with self.assertRaises((TypeError, ValueError)):
+                tiipMessage.reload(tiipStr)
+            self.assertIsNone(tiipMessage.sig)
+            self.assertIsNotNone(tiip._TS_PATTERN.match(tiipMessage.ts))
+            self.assertEqual(tiip.timeStampToMicros(json.loads(str(tiipMessage))['ts']), tiipMessage.tsMicros)
+
 
 if __name__ == "__main__":
     unittest.main()